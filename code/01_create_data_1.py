@@ -21,6 +21,10 @@
 ##    2) csvRowsLimit :: how many rows to process and create that many output files,
 ##                       valid values: 0 < csvRowsLimit < 129971
 ##                       default value=20
+##    3) csvChunkSize :: how many rows to read from the CSV at a time, 0 means all rows at once
+##                       default value=10000
+##    4) outFormat :: files = one .txt file per review in 'inData', shards = packed corpus shards in 'inCorpus', both = both
+##                       default value=files
 ## Examples of running the script:   
 ##    python3 script-name -wineFileLoc <<'/path/to/input/csv/raw/file.csv'>> -csvRowsLimit <<limit_as_interger>>
 ##    e.g. python3 01_create_data_1.py -wineFileLoc '/home/rohit/PyWDUbuntu/generic/dockerUseCase2/code/winemag-data-130k-v2.csv' -csvRowsLimit 10
@@ -31,14 +35,53 @@ import os
 import argparse
 import logging
 import shutil
+import time
 
 ## custom packages
 from utils.util_functions_1 import my_print_and_log
+from utils.util_corpus_shards_1 import c_corpus_shard_writer, CORPUS_INDEX_FILE
+
+def write_review_files_streaming(_csv_path, _rows_limit, _op_dir, _op_dir_extra, _chunk_size, _num_extra=5, _write_files=True, _corpus_writer=None):
+    """
+    Goal: Read the description column of the CSV in chunks and write each description to its own text file,
+          so that only one chunk of rows is in memory at a time.
+          All except the last few files go to the output folder, the last few go to the extra folder.
+          If a corpus writer is given, the rows for the output folder are also (or only) packed into the corpus shards.
+    Accepts: CSV file path, number of rows to process, output folder, extra output folder, rows per chunk, number of extra files,
+             flag to write the output folder files, optional corpus shard writer
+    Return: count of rows written for output folder, count of files written to extra folder
+    """
+    limit_op_dir = _rows_limit - _num_extra
+    cnt_files_out, cnt_op_dir, cnt_op_dir_extra = 0, 0, 0
+    time_start = time.perf_counter()
+    for df_chunk in pd.read_csv(_csv_path, usecols=['description'], nrows=_rows_limit, chunksize=_chunk_size):
+        time_chunk_start = time.perf_counter()
+        for description in df_chunk['description'].tolist():
+            cnt_files_out += 1
+            review_name = 'f' + str(cnt_files_out).zfill(4)
+            if cnt_files_out <= limit_op_dir:
+                cnt_op_dir += 1
+                if _corpus_writer is not None:
+                    _corpus_writer.add(review_name, description)
+                if not _write_files:
+                    continue
+                f_path = _op_dir + review_name + '.txt'
+            else:
+                f_path = _op_dir_extra + review_name + '.txt'
+                cnt_op_dir_extra += 1
+            with open(f_path, 'w') as f:
+                f.write(description)
+        time_chunk = time.perf_counter() - time_chunk_start
+        my_print_and_log(f"Written {cnt_files_out} of {_rows_limit} files :: {len(df_chunk)/max(time_chunk, 1e-9):.1f} rows/sec", _only_log=True)
+    time_total = time.perf_counter() - time_start
+    my_print_and_log(f"\nStreaming split of {cnt_files_out} rows with chunk size {_chunk_size} took {time_total:.2f} secs :: {cnt_files_out/max(time_total, 1e-9):.1f} rows/sec\n")
+    return cnt_op_dir, cnt_op_dir_extra
 
 def main():
     HOME = os.getcwd()
     OP_DIR = os.path.join(HOME, 'inData') + r'/' ## where the all the individual files will be saved - except the last 5!
     OP_DIR_EXTRA = os.path.join(HOME, 'extraUserInput') + r'/' ## where 5 individual files will be saved
+    OP_DIR_CORPUS = os.path.join(HOME, 'inCorpus') + r'/' ## where the corpus shards and index are saved if that output format is chosen
     TEMP_DIR = os.path.join(HOME, 'tempDir') + r'/' ## log files and any temporary files
 
     ## create temp folder if does not exist
@@ -66,11 +109,25 @@ def main():
         type=int,
         default=20,
         help='Number of csv file rows to process and create the individual files. Valid values: integer in the range 9 < value < 129970.')
+    argparser.add_argument(
+        '-csvChunkSize',
+        '--csv_chunk_size',
+        type=int,
+        default=10000,
+        help='Number of csv file rows read at a time. Enter 0 to read all the rows at once.')
+    argparser.add_argument(
+        '-outFormat',
+        '--output_format',
+        default='files',
+        choices=['files', 'shards', 'both'],
+        help='Write one .txt file per review to inData, pack them into corpus shards in inCorpus, or both. Extra user input files are always .txt files.')
     args = argparser.parse_args()
 
     ## extract cla args
     wineFileLoc = args.wine_file_location               ## -wineFileLoc      parameter
     CSV_FILES_LIMIT = args.csv_rows_limit_processing    ## -csvRowsLimit     parameter
+    CSV_CHUNK_SIZE = args.csv_chunk_size                ## -csvChunkSize     parameter
+    OUT_FORMAT = args.output_format                     ## -outFormat        parameter
 
     ## check input file exists else throw error
     if not os.path.exists(wineFileLoc):
@@ -88,6 +145,14 @@ def main():
             ])
         my_print_and_log(myStr, "error")
         exit(55)
+    ## check value for csv chunk size
+    if CSV_CHUNK_SIZE < 0:
+        myStr = "\n".join([
+            f"\nFATAL ERROR: Invalid input for csvChunkSize, enter 0 or a positive integer.",
+            f"EXITING with error code 57\n",
+            ])
+        my_print_and_log(myStr, "error")
+        exit(57)
     ## create output directory if does not exist else delete all files in the directory
     if not os.path.exists(OP_DIR):
         os.mkdir(OP_DIR)
@@ -130,30 +195,47 @@ def main():
         f"\nCommand line arguments checked. Proceeding with these values:",
         f"wineFileLoc: {wineFileLoc}",
         f"CSV_FILES_LIMIT: {CSV_FILES_LIMIT}",
+        f"CSV_CHUNK_SIZE: {CSV_CHUNK_SIZE}",
+        f"OUT_FORMAT: {OUT_FORMAT}",
         ])
     my_print_and_log(myStr, "info")
 
     ## load the csv to dataframe and process
     try:
-        df = pd.read_csv(wineFileLoc, usecols=['description'], nrows=CSV_FILES_LIMIT)
-        my_print_and_log(f"\nLoaded dataframe from file: {wineFileLoc}\nTotal rows in dataframe = {len(df)}\n")
+        if OUT_FORMAT != 'files':
+            ## pack the reviews into corpus shards, the csv is read in chunks (all rows as one chunk if chunk size is 0)
+            with c_corpus_shard_writer(OP_DIR_CORPUS) as corpus_writer:
+                cnt_op_dir, cnt_op_dir_extra = write_review_files_streaming(wineFileLoc, CSV_FILES_LIMIT, OP_DIR, OP_DIR_EXTRA, CSV_CHUNK_SIZE or CSV_FILES_LIMIT,
+                    _write_files=(OUT_FORMAT == 'both'), _corpus_writer=corpus_writer)
+            cnt_shards = corpus_writer.shard_no + 1
+        elif CSV_CHUNK_SIZE:
+            ## read the csv in chunks so that only one chunk of rows is in memory at a time
+            cnt_op_dir, cnt_op_dir_extra = write_review_files_streaming(wineFileLoc, CSV_FILES_LIMIT, OP_DIR, OP_DIR_EXTRA, CSV_CHUNK_SIZE)
+        else:
+            df = pd.read_csv(wineFileLoc, usecols=['description'], nrows=CSV_FILES_LIMIT)
+            my_print_and_log(f"\nLoaded dataframe from file: {wineFileLoc}\nTotal rows in dataframe = {len(df)}\n")
 
-        cnt_files_out = 1
-        limit_op_dir = CSV_FILES_LIMIT - 5 # all except last 5 files to the op_dir, last 5 files to op_dir_extra
-        for idx, row in df.iterrows():
-            if cnt_files_out > CSV_FILES_LIMIT:
-                break
-            elif cnt_files_out <= limit_op_dir:
-                with open(OP_DIR + 'f' + str(cnt_files_out).zfill(4) + '.txt', 'w') as f:
-                    f.write(row[0])
-            else:
-                with open(OP_DIR_EXTRA + 'f' + str(cnt_files_out).zfill(4) + '.txt', 'w') as f:
-                    f.write(row[0])
-            cnt_files_out += 1
-        myStr = "\n".join([
-            f"\nCreated ** {cnt_files_out -1 - 5} ** files here: {OP_DIR}",
-            f"Created ** {5} ** files here: {OP_DIR_EXTRA}",
-            ])
+            cnt_files_out = 1
+            limit_op_dir = CSV_FILES_LIMIT - 5 # all except last 5 files to the op_dir, last 5 files to op_dir_extra
+            for idx, row in df.iterrows():
+                if cnt_files_out > CSV_FILES_LIMIT:
+                    break
+                elif cnt_files_out <= limit_op_dir:
+                    with open(OP_DIR + 'f' + str(cnt_files_out).zfill(4) + '.txt', 'w') as f:
+                        f.write(row[0])
+                else:
+                    with open(OP_DIR_EXTRA + 'f' + str(cnt_files_out).zfill(4) + '.txt', 'w') as f:
+                        f.write(row[0])
+                cnt_files_out += 1
+            cnt_op_dir, cnt_op_dir_extra = cnt_files_out -1 - 5, 5
+        ## in shards mode the reviews for the input folder are only packed into the shards, no .txt files are written there
+        myStr = [""]
+        if OUT_FORMAT != 'shards':
+            myStr.append(f"Created ** {cnt_op_dir} ** files here: {OP_DIR}")
+        if OUT_FORMAT != 'files':
+            myStr.append(f"Packed ** {cnt_op_dir} ** reviews into ** {cnt_shards} ** shard files and {CORPUS_INDEX_FILE} here: {OP_DIR_CORPUS}")
+        myStr.append(f"Created ** {cnt_op_dir_extra} ** files here: {OP_DIR_EXTRA}")
+        myStr = "\n".join(myStr)
         my_print_and_log(myStr, "info")
     except Exception as load_or_process_error:
         myStr = "\n".join([
@@ -11,11 +11,11 @@
 ##    Downloaded data from https://www.kaggle.com/zynicide/wine-reviews
 ##    Using only the description column, wrote each description to individual file to a folder called 'inData'.
 ## 1) Expects all the input files to be in folder called 'inData' with only .txt files.
-## 2) If flag to reload to Neo4j is True, will first process the specified number of these files and extract the features into a json file.
-##    This json file is saved to the folder 'outData'.
+## 2) If flag to reload to Neo4j is True, will first process the specified number of these files and extract the features into a jsonl file
+##    (one json entry per line, written as the features are extracted). This jsonl file is saved to the folder 'outData'.
 ##    The number of input files processed depends on the value of the run time parameter.
 ##    Note: Before reloading, the entire Neo4j graph will first be cleared.
-## 3) The saved json file is used for loading data to Neo4j graph.
+## 3) The saved jsonl file is streamed entry by entry for loading data to Neo4j graph. Older json array files can also be loaded.
 ## 4) Graphical user interface (using Tkinter) shown with option:
 ##    - extract features from a new input file and upload to Neo4j; and/ or
 ##    - run pre-set queries based on user input
@@ -25,7 +25,7 @@
 ##       1) Processing of the raw description text: lowercase, remove stop words and punctuations, lemmatize
 ##       2) Name-Entity-Recognition (NER) with Spacy
 ##       3) Word count, sentence count
-##       4) Flavor names using pre-defined list
+##       4) Flavor names using the flavor lexicon file (compiled once into hashed lookups, multi-word flavors supported)
 ##       5) Sentiment score with spacytextblob
 ## -------------------------------------------------------------------------------------------------------------------------------------------------
 ## Versions of packages:
@@ -34,6 +34,8 @@
 ##       1) spacytextblob:  3.0.1
 ## -------------------------------------------------------------------------------------------------------------------------------------------------
 ## Neo4j graph schema:
+##   Constraints and indexes (created automatically, see utils/util_functions_1.py):
+##       Review.name unique, Sequence.name unique, GraphStat.name unique, GraphStat.kind, Flavor.name unique, Entity (name, label_) key, Entity.name, Review.count_words, Review.senti_score
 ##   Nodes and Relationship schema:
 ##       1) (REVIEW node) - HAS_FLAVOR -> (FLAVOR node)
 ##       2) (REVIEW node) - RELATES_TO_ENTITY -> (ENTITY node)
@@ -43,6 +45,10 @@
 ##             e.g. name=2020, label=391, label_=DATE
 ##       3) Flavor node: name
 ##             e.g. name=cherry
+##       4) Sequence node: name, value - last number given to a typed text review node, not linked to other nodes
+##             e.g. name=review_r, value=12
+##       5) GraphStat node: name, kind, key, value - one graph statistic kept up to date by the loader, not linked to other nodes
+##             e.g. name=flavor:cherry, kind=flavor, key=cherry, value=139
 ## -------------------------------------------------------------------------------------------------------------------------------------------------
 ## Notes on running this script:
 ##    1) Expects the input files to be in a folder called 'inData'. It should contain .txt files created earlier in the pipeline.
@@ -54,22 +60,73 @@
 ##    1) None
 ##    Optional:
 ##    1) reloadNeo :: Flag to upload data to Neo4j first - will also clear out the graph before loading
-##                    Valid values Y or N in lower or upper case
+##                    Valid values Y or N or I in lower or upper case
+##                    I = incremental reload: graph is not cleared, only inputs that are new, changed or removed since the
+##                        last reload (per the manifest 'outData/input_manifest.json') are extracted, upserted or deleted.
+##                        Inputs past the uploadLimit are left as they are, only inputs gone from the input folder are deleted
 ##    2) uploadLimit :: how many input files to process and load to Neo4j,
 ##                       valid values: 0 < uploadLimit < 129971
 ##                       default value=100
+##    3) neoBatchSize :: number of entries sent to Neo4j per UNWIND transaction during reload,
+##                       valid values: 0 <= neoBatchSize, 0 means one transaction per entry
+##                       default value=500
+##    4) nlpBatchSize :: number of texts per nlp.pipe batch during feature extraction,
+##                       valid values: 0 <= nlpBatchSize, 0 means one document at a time
+##                       default value=50
+##    5) nlpProcesses :: number of processes used by nlp.pipe during feature extraction,
+##                       valid values: 0 < nlpProcesses
+##                       default value=1
+##    6) featureCache :: Flag to reuse features extracted in earlier runs from the cache file in 'outData'
+##                       Valid values Y or N in lower or upper case, default value=Y
+##    7) featureCacheMaxMB :: size limit of the feature cache in MB, least recently used entries are evicted above it
+##                       default value=512
+##    8) inputFormat :: files = individual .txt files in 'inData', shards = packed corpus shards in 'inCorpus'
+##                       (see utils/util_corpus_shards_1.py, which also converts an existing 'inData' folder)
+##                       default value=files
+##    9) clearMode :: how the graph is cleared before a full reload
+##                       single = one transaction, batched = bounded batches of relationships then nodes,
+##                       drop = drop and recreate the database (NEO4J_DATABASE, default neo4j) if permissions allow, else batched
+##                       default value=batched
+##   10) clearBatchSize :: relationships or nodes deleted per transaction for batched clearing
+##                       default value=10000
+##   11) flavorLexicon :: file with one flavor per line (multi-word flavors allowed) used for flavor matching
+##                       default value='flavor_lexicon.txt' in the current folder, built-in list used if not found
+##   12) nlpProfile :: spacy components loaded for feature extraction (see utils/util_nlp_profiles_1.py)
+##                       full = whole model, fast = parser excluded and senter used for sentence counts,
+##                       stats-only = as fast and NER and sentiment skipped
+##                       default value=full
+##   13) loadPipeline :: Flag to overlap extraction and loading: batches of entries go through a bounded queue to a graph writer
+##                       thread that loads them while the remaining inputs are still extracted (needs neoBatchSize > 0)
+##                       Valid values Y or N in lower or upper case, default value=N
+##   14) extractWorkers :: number of worker processes for sharded extraction, 0 means extract without shards
+##                       every finished shard is saved in 'outData/extract_checkpoint' and a rerun after a failure
+##                       only extracts the shards not done yet (the feature cache is not used in this mode)
+##                       default value=0
+##   15) extractShardSize :: number of input files per shard for sharded extraction
+##                       default value=1000
+##   16) graphBackend :: graph store used for loading and the queries (see utils/util_graph_store_1.py)
+##                       neo4j = the Neo4j database, memory = in-process indexed store without a database, nothing is
+##                       persisted so it starts empty on every run - for offline testing and comparing overheads
+##                       default value=neo4j
+##   17) profileStages :: Flag to time the extraction stages (spacy, sentences, preprocessing, sentiment, NER, flavors) and the
+##                       load sub-steps. A summary table is written to the log when the run ends and the stage times of every
+##                       document to 'tempDir/stage_trace.jsonl'. Valid values Y or N in lower or upper case, default value=N
+##   18) rebuildStats :: Flag to count the graph again and rebuild the graph statistics (node counts per label, reviews per flavor,
+##                       Entity nodes per entity label) used by Query 1 and the Top Flavors view. They are kept up to date by
+##                       every load and delete, so this is only needed to check them. Valid values Y or N, default value=N
 ## Examples of running the script:   
-##    python3 script-name -reloadNeo <<Y or N>> -uploadLimit <<limit_as_interger>>
-##    e.g. python3 02_load_neo_show_gui_3.py -reloadNeo Y -uploadLimit 50
+##    python3 script-name -reloadNeo <<Y or N>> -uploadLimit <<limit_as_interger>> -neoBatchSize <<batch_size_as_integer>>
+##    e.g. python3 02_load_neo_show_gui_3.py -reloadNeo Y -uploadLimit 50 -neoBatchSize 500
 ## -------------------------------------------------------------------------------------------------------------------------------------------------
 
 ## general
-import pandas as pd
 import glob
 import os
 import string
 from copy import deepcopy
+from itertools import islice, chain
 import json
+import hashlib
 import argparse
 import logging
 from tqdm import tqdm
@@ -78,10 +135,15 @@ import time
 ## gui
 import tkinter as tk
 from functools import partial
+import threading
+import queue
+from itertools import count
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import multiprocessing
+import shutil
 
 ##   imports for neo4j
 import sys
-from py2neo import Graph
 
 ## imports for data extraction for neo4j
 from spacytextblob.spacytextblob import SpacyTextBlob
@@ -90,10 +152,234 @@ from spacy.lang.en.stop_words import STOP_WORDS
 from spacy.lang.en import English
 
 ## custom packages
-from utils.util_functions_1 import my_print_and_log, make_neo4j_connection
+from utils.util_functions_1 import my_print_and_log, log_neo4j_transaction_stats
+from utils.util_graph_store_1 import GRAPH_BACKENDS, build_neo_batch_params, get_graph_store, set_graph_backend
+from utils.util_feature_cache_1 import c_feature_cache, make_feature_cache_context
+from utils.util_neo_data_io_1 import c_neo_jsonl_writer, iter_neo_entries
+from utils.util_corpus_shards_1 import c_corpus_shard_reader
+from utils.util_flavor_matcher_1 import c_flavor_matcher
+from utils.util_text_preprocess_1 import preprocess_tokens
+from utils.util_nlp_profiles_1 import NLP_PROFILES, load_nlp_for_profile, get_profile_flags
+from utils.util_stage_profiler_1 import stage_profiler
+from utils.util_review_snapshot_1 import c_review_snapshot, get_review_scalars_from_rows
+from utils.util_flavor_index_1 import c_flavor_index
+from utils.util_query_cache_1 import c_query_result_cache
+from utils.util_input_manifest_1 import load_manifest, save_manifest, manifest_entry_for_file, manifest_entry_for_text, compare_manifests, c_manifest_text_recorder, get_input_name, make_input_fingerprint
 #from utils.util_functions_1 import *
 
-def load_neo4j_from_json(_data_file=None, _clear_graph=False):
+# number of input files read and extracted at a time during reload (per nlp.pipe process), bounds the memory used
+#    kept large as nlp.pipe starts its worker processes again for every chunk
+EXTRACT_CHUNK_SIZE = 5000
+
+# number of batches of neo entries the extract and load pipeline holds between extraction and the graph writer,
+#    extraction blocks once it is this far ahead of loading
+PIPELINE_QUEUE_BATCHES = 4
+
+# model and settings used by the sharded extraction workers, filled in before the workers are forked
+EXTRACT_WORKER_STATE = dict()
+
+# number of worker threads running GUI queries and uploads, and how often the GUI checks for their results
+GUI_WORKER_THREADS = 4
+GUI_POLL_INTERVAL_MS = 100
+
+# number of flavors shown by the Top Flavors view when no number is entered
+TOP_FLAVORS_DEFAULT = 10
+
+# results of Query 1, 2 and 3 kept by the GUI: how many, and for how long before they are read from the graph again
+QUERY_CACHE_MAX_ENTRIES = 256
+QUERY_CACHE_TTL_SECS = 300.0
+
+# master list of flavor names that should be extracted - only used if the flavor lexicon file is not found
+FLAVOR_NAMES_MASTER = 'wood,oak,spices,spice,pepper,blackberry,hicoky,cigar,menthol,smoky,forest,raspberry,berry,berries,currant,currants,licorice,coconut,leather,coconut,plum,chocolate,orange,honey,gooseberry,fruit,fruity,strawberry,cherry,oily,coffee,expresso,cranberry,pineapple,tangerine,testflavor1,testflavor2,testflavor3,testflavor4'
+DEFAULT_FLAVOR_MATCHER = c_flavor_matcher(FLAVOR_NAMES_MASTER.split(','))
+
+def load_neo4j_batched(_store, _neo_data, _batch_size, _show_progress=True):
+    """
+    Goal: Load the neo entries to the graph store, sending each group of entries as one transaction
+          (one parameter list per kind of row through UNWIND for Neo4j)
+    Accepts: graph store object, iterable of neo entries, number of entries per transaction, flag to show a progress bar
+    Return: count of Review, Entity and Flavor rows sent
+    """
+    neo_data_iter = iter(_neo_data)
+    cnt_rev, cnt_ent, cnt_flav = 0, 0, 0
+    batch_start = 0
+    time_load_start = time.perf_counter()
+    pbar = tqdm(disable=not _show_progress)
+    while True:
+        ## only one batch of entries is held in memory at a time
+        with stage_profiler.stage('load_read_entries'):
+            batch_entries = list(islice(neo_data_iter, _batch_size))
+        if not batch_entries:
+            break
+        with stage_profiler.stage('load_build_params'):
+            rev_rows, ent_rows, flav_rows = build_neo_batch_params(batch_entries)
+        time_batch_start = time.perf_counter()
+        with stage_profiler.stage('load_transaction_batch'):
+            _store.load_batch(rev_rows, ent_rows, flav_rows)
+        time_batch = time.perf_counter() - time_batch_start
+        cnt_rev, cnt_ent, cnt_flav = cnt_rev + len(rev_rows), cnt_ent + len(ent_rows), cnt_flav + len(flav_rows)
+        my_print_and_log(f"Completed batch of entries {batch_start+1} to {batch_start+len(batch_entries)} :: {len(batch_entries)/max(time_batch, 1e-9):.1f} rows/sec", _only_log=True)
+        batch_start += len(batch_entries)
+        pbar.update(len(batch_entries))
+    pbar.close()
+    time_load = time.perf_counter() - time_load_start
+    my_print_and_log(f"\nBatched load of {batch_start} entries with batch size {_batch_size} took {time_load:.2f} secs :: {batch_start/max(time_load, 1e-9):.1f} rows/sec\n")
+    return cnt_rev, cnt_ent, cnt_flav
+
+class c_graph_writer_error(RuntimeError):
+    """
+    Goal: Raised to the producer by c_neo_load_pipeline when its graph writer thread failed, so that errors of the load
+          are told apart from errors of the extraction
+    """
+    pass
+
+class c_neo_load_pipeline:
+    """
+    Goal: Overlap feature extraction with loading to Neo4j. Entries appended by the extraction (the producer) are grouped
+          into batches and put on a bounded queue, a graph writer thread (the consumer) drains it with batched
+          transactions. A full queue blocks the producer, so memory stays bounded when Neo4j is the slower stage.
+          Has append and extend so it can be passed wherever a list of neo entries is built.
+    Accepts: graph store object, number of entries per transaction, number of batches the queue holds,
+             optional writer every entry is also appended to (e.g. the intermediate jsonl file)
+    """
+    def __init__(self, _store, _batch_size, _queue_batches=PIPELINE_QUEUE_BATCHES, _also_write_to=None):
+        self.store = _store
+        self.batch_size = _batch_size
+        self.also_write_to = _also_write_to
+        self.batch_queue = queue.Queue(maxsize=_queue_batches)
+        self.pending = list()
+        self.writer_error = None
+        self.load_counts = (0, 0, 0)
+        self.time_producer_blocked = 0.0
+        self.time_writer_waiting = 0.0
+        self.time_start = time.perf_counter()
+        self.writer_thread = threading.Thread(target=self.run_graph_writer, name='neo_graph_writer', daemon=True)
+        self.writer_thread.start()
+
+    def iter_queued_entries(self):
+        while True:
+            time_wait_start = time.perf_counter()
+            batch_entries = self.batch_queue.get()
+            self.time_writer_waiting += time.perf_counter() - time_wait_start
+            if batch_entries is None:
+                return
+            yield from batch_entries
+
+    def run_graph_writer(self):
+        try:
+            self.load_counts = load_neo4j_batched(self.store, self.iter_queued_entries(), self.batch_size, _show_progress=False)
+        except BaseException as graph_writer_error:
+            self.writer_error = graph_writer_error
+            ## keep draining so that the producer is never left blocked on a full queue
+            while self.batch_queue.get() is not None:
+                pass
+
+    def put_pending(self):
+        if self.writer_error is not None:
+            raise c_graph_writer_error(f"Graph writer stopped :: {self.writer_error}") from self.writer_error
+        time_put_start = time.perf_counter()
+        self.batch_queue.put(self.pending)
+        self.time_producer_blocked += time.perf_counter() - time_put_start
+        self.pending = list()
+
+    def append(self, _neo_entry):
+        if self.also_write_to is not None:
+            self.also_write_to.append(_neo_entry)
+        self.pending.append(_neo_entry)
+        if len(self.pending) >= self.batch_size:
+            self.put_pending()
+
+    def extend(self, _neo_entries):
+        for neo_entry in _neo_entries:
+            self.append(neo_entry)
+
+    def close(self):
+        """
+        Goal: Send the last partial batch, wait for the graph writer to finish and log how much the stages overlapped
+        Accepts: Nothing
+        Return: count of Review, Entity and Flavor rows sent
+        """
+        if self.pending:
+            self.put_pending()
+        self.batch_queue.put(None)
+        self.writer_thread.join()
+        if self.writer_error is not None:
+            raise c_graph_writer_error(f"Graph writer stopped :: {self.writer_error}") from self.writer_error
+        time_total = time.perf_counter() - self.time_start
+        myStr = "\n".join([
+            f"\nExtract and load pipeline took {time_total:.2f} secs",
+            f"extraction blocked on a full queue for {self.time_producer_blocked:.2f} secs (loading is the slower stage if large)",
+            f"graph writer waited on an empty queue for {self.time_writer_waiting:.2f} secs (extraction is the slower stage if large)\n",
+            ])
+        my_print_and_log(myStr)
+        return self.load_counts
+
+def delete_review_nodes_from_neo4j(_rev_names):
+    """
+    Goal: Delete the named Review nodes with their relationships, and any Entity or Flavor nodes left without relationships
+    Accepts: list of review node names
+    Return: Nothing
+    """
+    if not _rev_names:
+        return
+    my_print_and_log(f"\nDeleting {len(_rev_names)} Review nodes from the graph...\n")
+
+    ## get graph store object - but exit program if problem
+    store, _ = get_graph_store(_on_fail_return=False)
+    try:
+        with stage_profiler.stage('load_delete_reviews'):
+            store.delete_reviews(_rev_names)
+    except Exception as neo_delete_error:
+        myStr = "\n".join([
+            f"\nFATAL ERROR: Problem deleting Review nodes from neo4j.",
+            f"Error message :: {neo_delete_error}",
+            f"EXITING with error code 125",
+            ])
+        my_print_and_log(myStr, "error")
+        exit(125)
+
+def rebuild_graph_stats():
+    """
+    Goal: Count the graph again and replace the graph statistics, then log them
+    Accepts: Nothing
+    Return: Nothing
+    """
+    my_print_and_log(f"\nRebuilding the graph statistics...\n")
+
+    ## get graph store object - but exit program if problem
+    store, _ = get_graph_store(_on_fail_return=False)
+    try:
+        time_rebuild_start = time.perf_counter()
+        store.rebuild_stats()
+        label_counts = store.get_stats('label')
+        entity_label_counts = store.get_stats('entity_label')
+        flavor_counts = store.get_stats('flavor')
+    except Exception as neo_stats_error:
+        myStr = "\n".join([
+            f"\nFATAL ERROR: Problem rebuilding the graph statistics.",
+            f"Error message :: {neo_stats_error}",
+            f"EXITING with error code 135",
+            ])
+        my_print_and_log(myStr, "error")
+        exit(135)
+    top_flavors = sorted(flavor_counts.items(), key=lambda item: (-item[1], item[0]))[:TOP_FLAVORS_DEFAULT]
+    myStr = "\n".join([
+        f"\nRebuilt the graph statistics in {time.perf_counter() - time_rebuild_start:.2f} secs",
+        f"Nodes per label: {', '.join(f'{key}={value}' for key, value in sorted(label_counts.items()))}",
+        f"Entity nodes per entity label: {', '.join(f'{key}={value}' for key, value in sorted(entity_label_counts.items()))}",
+        f"Reviews per flavor, top {TOP_FLAVORS_DEFAULT} of {len(flavor_counts)}: {', '.join(f'{key}={value}' for key, value in top_flavors)}\n",
+        ])
+    my_print_and_log(myStr)
+
+def load_neo4j_from_json(_data_file=None, _clear_graph=False, _batch_size=None, _clear_mode='batched', _clear_batch_size=10000):
+    """
+    Goal: Load the neo entries saved in the file to Neo4j, reading them one at a time.
+          File can be JSON-Lines (one entry per line) or the older single json array.
+    Accepts: json or jsonl file path, flag to clear the graph first,
+             number of entries per UNWIND transaction (None or 0 to send one transaction per entry),
+             how to clear the graph and how many relationships or nodes to delete per transaction (see clear in utils/util_graph_store_1.py)
+    Return: Nothing
+    """
     my_print_and_log(f"\nIn load_neo4j function, attempting to load file and make entries to database\n")
 
     neo_data = None
@@ -106,9 +392,11 @@ def load_neo4j_from_json(_data_file=None, _clear_graph=False):
         exit(110)
     
     try:
-        with open(_data_file, "r") as f:
-            neo_data = json.load(f)
-        my_print_and_log(f"\nSuccessfully loaded json data from file: {_data_file}\n", "info")
+        ## read the first entry now so that a bad file is reported before touching the graph
+        neo_data = iter_neo_entries(_data_file)
+        neo_data_first = list(islice(neo_data, 1))
+        neo_data = chain(neo_data_first, neo_data)
+        my_print_and_log(f"\nSuccessfully opened json data from file: {_data_file}\n", "info")
     except Exception as reload_neo_file_error:
         myStr = "\n".join([
             f"\nFATAL ERROR: Could not reload data from json file.",
@@ -118,66 +406,31 @@ def load_neo4j_from_json(_data_file=None, _clear_graph=False):
         my_print_and_log(myStr, "error")
         exit(114)
     
-    ## setup the cypher queries for neo4j
-    stmt0_clear_graph = r'MATCH (n) DETACH DELETE n'
-    stmt1_rev_node = r'MERGE (:Review {name: $_in_rev_name, count_sent: $_in_cnt_sents, count_words: $_in_cnt_words, senti_score: $_in_senti_polarity, raw_text: $_in_raw_text, proc_text: $_in_proc_text})'
-    stmt2_ent_node = r'MERGE (:Entity {name: $_in_ent_text, label: $_in_ent_label, label_: $_in_ent_label_})'
-    stmt3_flav_node = r'MERGE (:Flavor {name: $_in_flav_name})'
-    stmt10 = r'MATCH (rn1:Review{name: $_in_rev_name}) MATCH (e1:Entity{name: $_in_ent_text}) CREATE (rn1)-[:RELATES_TO_ENTITY]->(e1)'
-    stmt11 = r'MATCH (rn1:Review{name: $_in_rev_name}) MATCH (f1:Flavor{name: $_in_flav_name}) CREATE (rn1)-[:HAS_FLAVOR]->(f1)'
-    
-    ## get graph object - but exit program if problem
-    graph, _ = make_neo4j_connection(_on_fail_return=False)
+    ## get graph store object - but exit program if problem
+    store, _ = get_graph_store(_on_fail_return=False)
     try:
         ## clear the entire graph if flag is set
         if _clear_graph:
-            tx = graph.begin()
-            tx.run(stmt0_clear_graph, parameters={})
-            tx.commit()
-            while not tx.finished():
-                pass # tx.finished return True if the commit is complete
-            my_print_and_log(f"\nCleared the graph...\n")
+            with stage_profiler.stage('load_clear_graph'):
+                store.clear(_clear_mode, _clear_batch_size)
 
         ## load data
-        len_neo_data = len(neo_data)
-        my_print_and_log(f"\nTotal entries to process = {len_neo_data}\n")
+        neo_entry = None
+        if _batch_size:
+            idx1, idx2, idx3 = load_neo4j_batched(store, neo_data, _batch_size)
+            my_print_and_log(f"\nUpdated Neo4j: Review rows={idx1}, Entity rows={idx2}, Flavor rows={idx3}\n\n")
+            return
         idx1, idx2, idx3 = 0,0,0
+        cnt_entries = 0
+        time_load_start = time.perf_counter()
         for idx1, neo_entry in enumerate(tqdm(neo_data)):
-            my_print_and_log(f"Attempting to update of entry {idx1+1} of {len_neo_data}....", _only_log=True)
-            tx = graph.begin()
-            # create Review node if not already existing
-            tx.run(stmt1_rev_node, parameters={
-                '_in_rev_name': neo_entry['Review']['name'],
-                '_in_cnt_sents': neo_entry['Review']['cnt_sents'],
-                '_in_cnt_words': neo_entry['Review']['cnt_words'],
-                '_in_senti_polarity': neo_entry['Review']['sentiment']['polarity'],
-                '_in_raw_text': neo_entry['RevText']['raw'],
-                '_in_proc_text': neo_entry['RevText']['processed'],
-                })
-            # create Enttity node and relationship if not already existing
-            for idx2, ent in enumerate(neo_entry['Entities']):
-                tx.run(stmt2_ent_node, parameters={
-                    '_in_ent_text': ent['text'],
-                    '_in_ent_label': ent['label'],
-                    '_in_ent_label_': ent['label_'],
-                    })
-                tx.run(stmt10, parameters={
-                    '_in_rev_name': neo_entry['Review']['name'],
-                    '_in_ent_text': ent['text'],
-                    })
-            # create flavor note and relationship if not already existing
-            for idx3, flav in enumerate(neo_entry['Flavors']):
-                tx.run(stmt3_flav_node, parameters={
-                    '_in_flav_name': flav,
-                    })
-                tx.run(stmt11, parameters={
-                    '_in_rev_name': neo_entry['Review']['name'],
-                    '_in_flav_name': flav,
-                    })
-            tx.commit()
-            while not tx.finished():
-                pass # tx.finished return True if the commit is complete
-            my_print_and_log(f"\nCompleted updating entry {idx1+1} of {len_neo_data}.", _only_log=True)
+            my_print_and_log(f"Attempting to update of entry {idx1+1}....", _only_log=True)
+            with stage_profiler.stage('load_transaction_entry'):
+                idx2, idx3 = store.load_entry(neo_entry)
+            cnt_entries += 1
+            my_print_and_log(f"\nCompleted updating entry {idx1+1}.", _only_log=True)
+        time_load = time.perf_counter() - time_load_start
+        my_print_and_log(f"\nPer entry load of {cnt_entries} entries took {time_load:.2f} secs :: {cnt_entries/max(time_load, 1e-9):.1f} rows/sec\n")
         my_print_and_log(f"\nUpdated Neo4j: Review nodes={idx1}, Entity nodes={idx2}, Flavor nodes={idx3}\n\n")
     except Exception as neo_update_error:
         myStr = "\n".join([
@@ -192,38 +445,34 @@ def load_neo4j_from_json(_data_file=None, _clear_graph=False):
 def preprocess_text(_in_tokens, _in_punc, _in_stop_words):
     """
     Goal: Preprocess the raw text - lemmatize and remove stop words
-    Accepts: input tokens, punctuation and stopwords
+    Accepts: input tokens, punctuation and stopwords (pass a frozenset so the hashed filter set is compiled only once)
     Return: processed string
     """
-    _in_tokens = [ word.lemma_.lower().strip() if word.lemma_ != "-PRON-" else word.lower_ for word in _in_tokens ]
-    _in_tokens = [ word for word in _in_tokens if word not in _in_stop_words and word not in _in_punc ]
-    _in_tokens = " ".join([i for i in _in_tokens])
-    return _in_tokens
+    return preprocess_tokens(_in_tokens, _in_punc, _in_stop_words)
 
-def get_review_node_text_number_from_neo4j():
+def read_text_file(_path):
+    """
+    Goal: Read the whole text of one input file
+    Accepts: file path
+    Return: file text
     """
-    Goal: Read Neo4j to get highest numbered review node of user input text type and return the number
+    with open(_path, 'r') as f:
+        return f.read()
+
+def allocate_review_node_text_number():
+    """
+    Goal: Get the next number for a review node of user input text type from the review name sequence of the graph store.
+          Concurrent uploads never get the same number, and no review nodes are scanned.
     Accepts: Nothing
-    Return: Higest number or None
+    Return: Next number, 0 for the first one
     """
-    my_print_and_log(f"\nGetting review node raw text number from neo4j...\n")
-    stmt15_get_raw_text_review_node = r"MATCH (rn1:Review) WHERE rn1.name STARTS WITH 'r' RETURN rn1.name ORDER BY rn1.name DESC LIMIT 1"
+    my_print_and_log(f"\nGetting review node raw text number from the graph store...\n")
     
-    ## get graph object - but exit program if problem
-    graph, _ = make_neo4j_connection(_on_fail_return=False)
+    ## get graph store object - but exit program if problem
+    store, _ = get_graph_store(_on_fail_return=False)
     try:
-        tx = graph.begin()
-        res_q15 = tx.run(stmt15_get_raw_text_review_node, parameters={})
-        tx.commit()
-        while not tx.finished():
-            pass # tx.finished return True if the commit is complete
-        my_print_and_log(f"\nQuery to get raw text review node complete...\n")
-        res_q15 = list(res_q15)
-        if res_q15:
-            res_q15 = res_q15[0]['rn1.name']
-            res_q15 = int(res_q15[1:]) # remove leading character i.e. r
-        else:
-            res_q15 = None
+        node_number = store.allocate_review_number('r')
+        my_print_and_log(f"\nAllocated raw text review node number {node_number}...\n")
     except Exception as neo_get_raw_text_review_error:
         myStr = "\n".join([
             f"\nFATAL ERROR: Problem reading neo4j.",
@@ -232,17 +481,80 @@ def get_review_node_text_number_from_neo4j():
             ])
         my_print_and_log(myStr, "error")
         exit(130)
-    return res_q15
+    return node_number
 
-def get_features_set1(_fname, _text, _all_neo, _nlp, _punctuations, _stopwords, _do_ner=False, _do_topic=False, _do_sentiment=False):
+def get_features_set1(_fname, _text, _all_neo, _nlp, _punctuations, _stopwords, _do_ner=False, _do_topic=False, _do_sentiment=False, _cache=None, _flavor_matcher=None):
     """
     Goal: Preprocess the raw text and extract features for neo4j
-    Accepts: filename, review text, data structure for neo, and other required variables
+    Accepts: filename, review text, data structure for neo, other required variables,
+             optional feature cache - extraction is skipped on a cache hit, optional flavor matcher
     Return: text after preprocessing
     """
-    # master list of flavor names that should be extracted
-    flavor_names_master = 'wood,oak,spices,spice,pepper,blackberry,hicoky,cigar,menthol,smoky,forest,raspberry,berry,berries,currant,currants,licorice,coconut,leather,coconut,plum,chocolate,orange,honey,gooseberry,fruit,fruity,strawberry,cherry,oily,coffee,expresso,cranberry,pineapple,tangerine,testflavor1,testflavor2,testflavor3,testflavor4'
-    flavor_names_master = flavor_names_master.split(',')
+    # For File input, use file name as the node name. But parameter will be None then its raw text input,
+    #    so take the next number of the review name sequence and name the node 'rxxxx'.
+    if _fname is not None:
+        node_name = _fname.split('.')[0] # user adding data through file, so extract file number
+    else:
+        # user entering typed text as input
+        node_name = 'r' + f"{allocate_review_node_text_number():04d}" # format as r9999, the first one is r0000
+    
+    stage_profiler.begin_document(node_name)
+    with stage_profiler.stage('feature_cache_get'):
+        neo_entry = _cache.get(_text, node_name) if _cache is not None else None
+    if neo_entry is None:
+        with stage_profiler.stage('spacy_nlp'):
+            doc = _nlp(_text)
+        neo_entry = get_features_from_doc(node_name, _text, doc, _punctuations, _stopwords, _do_ner, _do_topic, _do_sentiment, _flavor_matcher)
+        if _cache is not None:
+            with stage_profiler.stage('feature_cache_put'):
+                _cache.put(_text, neo_entry)
+    stage_profiler.end_document()
+    
+    # add entry built to the final data structure
+    _all_neo.append(neo_entry)
+
+    return neo_entry['RevText']['processed']
+
+def get_features_batch(_fnames, _texts, _all_neo, _nlp, _punctuations, _stopwords, _do_ner=False, _do_topic=False, _do_sentiment=False, _batch_size=50, _n_process=1, _cache=None, _flavor_matcher=None, _show_progress=True):
+    """
+    Goal: Same as get_features_set1 for many input files, but the texts are run through nlp.pipe in batches
+          and optionally over several processes. Entries are appended in the same order as the inputs.
+    Accepts: list of filenames, list of review texts, data structure for neo, other required variables,
+             number of texts per nlp.pipe batch, number of processes for nlp.pipe,
+             optional feature cache - only the texts missing from the cache are sent to nlp.pipe, optional flavor matcher,
+             flag to show a progress bar
+    Return: list of texts after preprocessing
+    """
+    node_names = [fname.split('.')[0] for fname in _fnames]
+    neo_entries = [None] * len(_texts)
+    if _cache is not None:
+        for idx, (node_name, text) in enumerate(zip(node_names, _texts)):
+            with stage_profiler.stage('feature_cache_get'):
+                neo_entries[idx] = _cache.get(text, node_name)
+    miss_idxs = [idx for idx, neo_entry in enumerate(neo_entries) if neo_entry is None]
+    docs = _nlp.pipe((_texts[idx] for idx in miss_idxs), batch_size=_batch_size, n_process=_n_process)
+    docs = iter(docs)
+    for idx in tqdm(miss_idxs, disable=not _show_progress):
+        stage_profiler.begin_document(node_names[idx])
+        ## nlp.pipe works on whole batches, so the wait for each doc is the pipe time spread over the batch
+        with stage_profiler.stage('spacy_nlp_pipe'):
+            doc = next(docs)
+        neo_entries[idx] = get_features_from_doc(node_names[idx], _texts[idx], doc, _punctuations, _stopwords, _do_ner, _do_topic, _do_sentiment, _flavor_matcher)
+        if _cache is not None:
+            with stage_profiler.stage('feature_cache_put'):
+                _cache.put(_texts[idx], neo_entries[idx])
+        stage_profiler.end_document()
+    _all_neo.extend(neo_entries)
+    return [neo_entry['RevText']['processed'] for neo_entry in neo_entries]
+
+def get_features_from_doc(_node_name, _text, _doc, _punctuations, _stopwords, _do_ner=False, _do_topic=False, _do_sentiment=False, _flavor_matcher=None):
+    """
+    Goal: Extract features for neo4j from an already processed spacy doc
+    Accepts: review node name, review text, spacy doc of the text, other required variables,
+             flavor matcher compiled from the lexicon (default is the built-in master list)
+    Return: neo entry built for the review
+    """
+    flavor_matcher = _flavor_matcher if _flavor_matcher is not None else DEFAULT_FLAVOR_MATCHER
     # basic setup for one entry
     neo_entry = {
         'Review': {
@@ -260,41 +572,33 @@ def get_features_set1(_fname, _text, _all_neo, _nlp, _punctuations, _stopwords,
         'Varietals': list(),
     }
     
-    # For File input, use file name as the node name. But parameter will be None then its raw text input,
-    #    so query Neo4j to find highest number for review node named 'rxxxx', increment by 1 and use it
-    #    as the new name.
-    if _fname is not None:
-        node_name = _fname.split('.')[0] # user adding data through file, so extract file number
-    else:
-        # user entering typed text as input
-        node_name = get_review_node_text_number_from_neo4j()
-        if node_name is not None:
-            node_name = 'r' + f"{node_name+1:04d}" # format as r9999 where 9999 is the incremented number
-        else:
-            node_name = 'r0000' # no such review node exists already so set as r0000
-    neo_entry['Review']['name'] = node_name
+    neo_entry['Review']['name'] = _node_name
     neo_entry['RevText']['raw'] = _text
     
-    doc = _nlp(_text)
+    doc = _doc
     
     # count words
-    tokens = [token.text for token in doc]
-    neo_entry['Review']['cnt_words'] = len(tokens)
+    with stage_profiler.stage('count_words'):
+        tokens = [token.text for token in doc]
+        neo_entry['Review']['cnt_words'] = len(tokens)
     
     # count sentences
-    sentences = list(doc.sents)
-    #print(sentences)
-    neo_entry['Review']['cnt_sents'] = len(sentences)
+    with stage_profiler.stage('sentence_split'):
+        sentences = list(doc.sents)
+        #print(sentences)
+        neo_entry['Review']['cnt_sents'] = len(sentences)
     
     # preprocess text
-    neo_entry['RevText']['processed'] = preprocess_text(doc, _punctuations, _stopwords)
+    with stage_profiler.stage('preprocess_text'):
+        neo_entry['RevText']['processed'] = preprocess_text(doc, _punctuations, _stopwords)
     
     # sentiment analysis
     if _do_sentiment:
-        neo_entry['Review']['sentiment'] = dict()
-        neo_entry['Review']['sentiment']['polarity'] = doc._.polarity
-        neo_entry['Review']['sentiment']['subjectivity'] = doc._.subjectivity
-        neo_entry['Review']['sentiment']['assessments'] = doc._.assessments
+        with stage_profiler.stage('sentiment'):
+            neo_entry['Review']['sentiment'] = dict()
+            neo_entry['Review']['sentiment']['polarity'] = doc._.polarity
+            neo_entry['Review']['sentiment']['subjectivity'] = doc._.subjectivity
+            neo_entry['Review']['sentiment']['assessments'] = doc._.assessments
     
     # topic modeling
     if _do_topic:
@@ -302,36 +606,127 @@ def get_features_set1(_fname, _text, _all_neo, _nlp, _punctuations, _stopwords,
     
     # name entity
     if _do_ner:
-        if doc.ents:
-            for ent in doc.ents:
-                one_entity = {
-                    'text': None,
-                    'label_': None,
-                    'label': None,
-                }
-                #print(f"\ntext = {ent.text}\nlabel_ = {ent.label_} \
-                #\nlabel = {ent.label} \
-                #\nspacy.explain(label_) = {str(spacy.explain(ent.label_))} \
-                #")
-                one_entity['text'] = ent.text
-                one_entity['label'] = ent.label
-                one_entity['label_'] = ent.label_
-                neo_entry['Entities'].append(one_entity)
+        with stage_profiler.stage('ner'):
+            if doc.ents:
+                for ent in doc.ents:
+                    one_entity = {
+                        'text': None,
+                        'label_': None,
+                        'label': None,
+                    }
+                    #print(f"\ntext = {ent.text}\nlabel_ = {ent.label_} \
+                    #\nlabel = {ent.label} \
+                    #\nspacy.explain(label_) = {str(spacy.explain(ent.label_))} \
+                    #")
+                    one_entity['text'] = ent.text
+                    one_entity['label'] = ent.label
+                    one_entity['label_'] = ent.label_
+                    neo_entry['Entities'].append(one_entity)
     
     # check flavors
     #print(f"\nprocessed text=\n{neo_entry['RevText']['processed']}\n")
-    for word in neo_entry['RevText']['processed'].split(" "):
-        if word in flavor_names_master:
-            neo_entry['Flavors'].append(word)
+    with stage_profiler.stage('flavor_match'):
+        neo_entry['Flavors'] = flavor_matcher.find_flavors(neo_entry['RevText']['processed'].split(" "))
     
-    # add entry built to the final data structure
-    _all_neo.append(neo_entry)
+    return neo_entry
 
-    return neo_entry['RevText']['processed']
+def extract_shard(_shard_files, _shard_path):
+    """
+    Goal: Extract features for one shard of input files and save them as a checkpoint file. Runs in a worker process, the
+          model and settings come from EXTRACT_WORKER_STATE set up in the parent before the workers were forked.
+          Written to a temporary file first, so a shard file only exists once it is complete.
+    Accepts: list of input files in the shard, checkpoint file path for the shard
+    Return: number of entries extracted
+    """
+    st = EXTRACT_WORKER_STATE
+    texts = [st['read_input_text'](fname) for fname in _shard_files]
+    fnames = [os.path.basename(fname) for fname in _shard_files]
+    tmp_path = _shard_path + '.tmp'
+    with c_neo_jsonl_writer(tmp_path) as shard_neo:
+        if st['nlp_batch_size']:
+            get_features_batch(
+                fnames, texts, shard_neo,
+                st['nlp'], st['punctuations'], st['stopwords'], st['do_ner'], st['do_topic'], st['do_sentiment'],
+                _batch_size=st['nlp_batch_size'], _n_process=1, _flavor_matcher=st['flavor_matcher'], _show_progress=False,
+                )
+        else:
+            for fname, review_text in zip(fnames, texts):
+                get_features_set1(fname, review_text, shard_neo, st['nlp'], st['punctuations'], st['stopwords'],
+                    st['do_ner'], st['do_topic'], st['do_sentiment'], _flavor_matcher=st['flavor_matcher'])
+    os.replace(tmp_path, _shard_path)
+    return len(fnames)
+
+def extract_features_sharded(_input_files, _all_neo, _checkpoint_dir, _checkpoint_key, _shard_size, _num_workers, _worker_state):
+    """
+    Goal: Split the input files into shards and extract them in a pool of worker processes. Every finished shard is saved
+          in the checkpoint folder, so a rerun with the same inputs and settings only extracts the shards not done yet.
+          Workers are forked so the loaded model is shared copy-on-write instead of being loaded again in every worker,
+          without fork (or with one worker) the shards are extracted one after the other in this process.
+          Entries are appended to the data structure for neo shard by shard in input order.
+    Accepts: list of input files, data structure for neo, checkpoint folder, key of the inputs and extraction settings,
+             number of input files per shard, number of worker processes, dict of model and settings used by the workers
+    Return: number of shards extracted now, number of shards resumed from the checkpoint
+    """
+    EXTRACT_WORKER_STATE.clear()
+    EXTRACT_WORKER_STATE.update(_worker_state)
+    os.makedirs(_checkpoint_dir, exist_ok=True)
+    checkpoint_info_path = os.path.join(_checkpoint_dir, 'checkpoint.json')
+    checkpoint_info = dict()
+    if os.path.exists(checkpoint_info_path):
+        with open(checkpoint_info_path, 'r', encoding='utf-8') as f:
+            checkpoint_info = json.load(f)
+    ## shards saved for other inputs or settings can not be reused
+    if checkpoint_info.get('key') != _checkpoint_key or checkpoint_info.get('shard_size') != _shard_size:
+        for old_shard_path in glob.glob(os.path.join(_checkpoint_dir, 'shard_*.jsonl*')):
+            os.remove(old_shard_path)
+        with open(checkpoint_info_path, 'w', encoding='utf-8') as f:
+            json.dump({'key': _checkpoint_key, 'shard_size': _shard_size, 'num_inputs': len(_input_files)}, f)
+
+    shards = [_input_files[shard_start : shard_start + _shard_size] for shard_start in range(0, len(_input_files), _shard_size)]
+    shard_paths = [os.path.join(_checkpoint_dir, f"shard_{shard_no:05d}.jsonl") for shard_no in range(len(shards))]
+    todo_shard_nos = [shard_no for shard_no in range(len(shards)) if not os.path.exists(shard_paths[shard_no])]
+    cnt_resumed = len(shards) - len(todo_shard_nos)
+    my_print_and_log(f"\nSharded extraction: {len(shards)} shards of up to {_shard_size} inputs, {cnt_resumed} already done in checkpoint folder {_checkpoint_dir}\n")
+
+    executor = None
+    futures = dict()
+    if _num_workers > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        executor = ProcessPoolExecutor(max_workers=_num_workers, mp_context=multiprocessing.get_context('fork'))
+        futures = {shard_no: executor.submit(extract_shard, shards[shard_no], shard_paths[shard_no]) for shard_no in todo_shard_nos}
+    elif _num_workers > 1:
+        my_print_and_log(f"\nWARNING: fork is not available, extracting the shards in this process\n", "warning")
+    try:
+        with tqdm(total=len(shards), initial=cnt_resumed) as pbar:
+            for shard_no in range(len(shards)):
+                try:
+                    if shard_no in futures:
+                        futures[shard_no].result()
+                    elif not os.path.exists(shard_paths[shard_no]):
+                        extract_shard(shards[shard_no], shard_paths[shard_no])
+                except Exception as shard_extract_error:
+                    myStr = "\n".join([
+                        f"\nFATAL ERROR: Problem extracting features for shard {shard_no+1} of the input files.",
+                        f"Error message :: {shard_extract_error}",
+                        f"Completed shards are kept in {_checkpoint_dir}, run again with the same inputs to resume",
+                        f"EXITING with error code 52",
+                        ])
+                    my_print_and_log(myStr, "error")
+                    exit(52)
+                _all_neo.extend(iter_neo_entries(shard_paths[shard_no]))
+                if shard_no in todo_shard_nos:
+                    pbar.update(1)
+                my_print_and_log(f"Shard {shard_no+1} of {len(shards)} extracted", _only_log=True)
+    finally:
+        if executor is not None:
+            for future in futures.values():
+                future.cancel()
+            executor.shutdown(wait=True)
+    return len(todo_shard_nos), cnt_resumed
 
 class c_wine_tool_window:
-    def __init__(self, _nlp, _punctuations, _stopwords, _flag_ner, _flag_topic, _flag_sentiment, _op_dir):
+    def __init__(self, _nlp, _punctuations, _stopwords, _flag_ner, _flag_topic, _flag_sentiment, _op_dir, _flavor_matcher=None):
         self.nlp = _nlp
+        self.flavor_matcher = _flavor_matcher
         self.punctuations = _punctuations
         self.stopwords = _stopwords
         self.flag_ner = _flag_ner
@@ -339,6 +734,19 @@ class c_wine_tool_window:
         self.flag_sentiment = _flag_sentiment
         self.OP_DIR = _op_dir
 
+        ## neo4j and spacy work runs on worker threads, results come back through the queue polled from the Tk main loop
+        self.executor = ThreadPoolExecutor(max_workers=GUI_WORKER_THREADS, thread_name_prefix="wine_gui_worker")
+        self.result_queue = queue.Queue()
+        self.jobs = dict() # job id -> (job name, future, cancel event) for every job in flight
+        self.job_counter = count(1)
+        self.nlp_lock = threading.Lock()
+        ## Query 2 is answered from this snapshot of the review scalar properties once it is loaded, from the graph until then
+        self.review_snapshot = c_review_snapshot()
+        ## Query 3 is answered from this flavor index once it is loaded, from the graph until then (only for ANY flavors)
+        self.flavor_index = c_flavor_index()
+        ## results of Query 1, 2 and 3 by normalized input, dropped when an upload could change them
+        self.query_cache = c_query_result_cache(QUERY_CACHE_MAX_ENTRIES, QUERY_CACHE_TTL_SECS)
+
         self.root = tk.Tk()
         self.root.title(f"Wine Reviews Interaction Tool - demo version")
         self.root.geometry("1200x900")
@@ -354,10 +762,16 @@ class c_wine_tool_window:
             f"Query 1: Count nodes of a particular type. Enter either Review OR Flavor OR Entity, e.g. <<Review>>",
             f"Query 2: Count Review nodes with minimum specified values for number of words and sentiment score. Enter values separated by comma e.g. <<20,0.15>>",       
             f"Query 3: Get a list of Review nodes with 'HAS_FLAVOR' relationship to specified flavors. e.g. <<pepper,strawberry>>",
+            f"         Review needs one or more of the plain flavors, every flavor marked + and none marked -, e.g. <<pepper,strawberry,+oak,-coffee>>",
+            f"Top Flavors: Flavors with the most Review nodes. Enter how many to show, e.g. <<5>>, or leave empty for {TOP_FLAVORS_DEFAULT}",
         ])
         self.query_1_msg = f"Run Query 1"
         self.query_2_msg = f"Run Query 2"
         self.query_3_msg = f"Run Query 3"
+        self.top_flavors_msg = f"Top Flavors"
+        self.cancel_msg = f"Cancel"
+        self.in_flight_msg = tk.StringVar()
+        self.in_flight_msg.set(f"Idle")
         self.result_fixed_text = "Result :"
         self.result = "---------------"
 
@@ -462,6 +876,32 @@ class c_wine_tool_window:
                 self.do_query_3_processing,
             )
             )
+        ## button top flavors
+        self.but_top_flavors = tk.Button(
+            master=self.root,
+            text=self.top_flavors_msg,
+            bg="green", fg="white",
+            relief=tk.RAISED,
+            width=(len(self.top_flavors_msg) + 4),
+            height=1,
+            borderwidth=7,
+            command=partial(
+                self.do_top_flavors_processing,
+            )
+            )
+        ## button cancel jobs in flight
+        self.but_cancel = tk.Button(
+            master=self.root,
+            text=self.cancel_msg,
+            bg="red", fg="white",
+            relief=tk.RAISED,
+            width=(len(self.cancel_msg) + 4),
+            height=1,
+            borderwidth=7,
+            command=partial(
+                self.do_cancel_processing,
+            )
+            )
         ## label for results fixed
         self.lbl_result_fixed = tk.Label(
             master=self.root,
@@ -488,6 +928,14 @@ class c_wine_tool_window:
             width=60,
             height=1
             )
+        ## label for jobs in flight
+        self.lbl_in_flight = tk.Label(
+            master=self.root,
+            textvariable=self.in_flight_msg,
+            bg="grey", fg="black",
+            width=30,
+            height=1
+            )
 
         ## setup the grid
         ## button upload File to Neo
@@ -553,6 +1001,20 @@ class c_wine_tool_window:
             sticky="nsew",
             padx=5, pady=5,
         )
+        ## button top flavors
+        self.but_top_flavors.grid(
+            row=3, column=4,
+            rowspan=1, columnspan=1,
+            sticky="nsew",
+            padx=5, pady=5,
+        )
+        ## button cancel jobs in flight
+        self.but_cancel.grid(
+            row=3, column=7,
+            rowspan=1, columnspan=1,
+            sticky="nsew",
+            padx=5, pady=5,
+        )
         ## label for results fixed
         self.lbl_result_fixed.grid(
             row=4, column=0,
@@ -570,12 +1032,147 @@ class c_wine_tool_window:
         ## label for status
         self.lbl_status.grid(
             row=5, column=0,
-            rowspan=1, columnspan=8,
+            rowspan=1, columnspan=6,
+            sticky="nsew",
+            padx=5, pady=5,
+        )
+        ## label for jobs in flight
+        self.lbl_in_flight.grid(
+            row=5, column=6,
+            rowspan=1, columnspan=2,
             sticky="nsew",
             padx=5, pady=5,
         )
+
+        ## start polling for results of the worker threads
+        self.root.after(GUI_POLL_INTERVAL_MS, self.poll_result_queue)
+        self.submit_job(f"Load review snapshot", self.run_load_review_snapshot)
+        self.submit_job(f"Load flavor index", self.run_load_flavor_index)
         return
 
+    def submit_job(self, _job_name, _func, *_args):
+        """
+        Run the function on a worker thread so that the Tk main loop stays responsive.
+        The function must not touch any Tk widget - it returns (status message, result text or None)
+        and poll_result_queue shows that on the main thread.
+        """
+        job_id = next(self.job_counter)
+        cancel_event = threading.Event()
+        future = self.executor.submit(self.run_job, job_id, _job_name, cancel_event, _func, *_args)
+        self.jobs[job_id] = (_job_name, future, cancel_event)
+        self.status_msg.set(f"{_job_name} started....")
+        self.update_in_flight()
+        return job_id
+
+    def run_job(self, _job_id, _job_name, _cancel_event, _func, *_args):
+        ## runs on a worker thread
+        if _cancel_event.is_set():
+            ## still report back, a job cancelled after the worker picked it up is only removed by poll_result_queue
+            self.result_queue.put((_job_id, None, None))
+            return
+        try:
+            status, result = _func(*_args)
+        except BaseException as job_error:
+            ## BaseException as the loader and feature extraction call exit() on fatal errors, which must not end the GUI
+            my_print_and_log(f"\nERROR: {_job_name} failed.\nError message :: {job_error}\n", "error")
+            status, result = f"{_job_name} failed. Error:: {job_error}.", f"---------------"
+        self.result_queue.put((_job_id, status, result))
+
+    def poll_result_queue(self, ):
+        while True:
+            try:
+                job_id, status, result = self.result_queue.get_nowait()
+            except queue.Empty:
+                break
+            job_name, _, cancel_event = self.jobs.pop(job_id, (None, None, None))
+            if cancel_event is None or cancel_event.is_set():
+                my_print_and_log(f"\nResult of cancelled job discarded: {job_name}\n", _only_log=True)
+                continue
+            self.status_msg.set(status)
+            if result is not None:
+                self.result = result
+                self.lbl_results.configure(
+                    text=self.result,
+                )
+        self.update_in_flight()
+        self.root.after(GUI_POLL_INTERVAL_MS, self.poll_result_queue)
+
+    def update_in_flight(self, ):
+        if self.jobs:
+            job_names = ", ".join([job_name for job_name, _, _ in self.jobs.values()])
+            self.in_flight_msg.set(f"In flight ({len(self.jobs)}): {job_names}")
+            self.lbl_in_flight.configure(bg="orange")
+        else:
+            self.in_flight_msg.set(f"Idle")
+            self.lbl_in_flight.configure(bg="grey")
+
+    def do_cancel_processing(self, ):
+        ## jobs not started yet are dropped, for running ones the result is discarded as a neo4j call cannot be interrupted
+        cnt_cancelled = 0
+        for job_id, (job_name, future, cancel_event) in list(self.jobs.items()):
+            cancel_event.set()
+            cnt_cancelled += 1
+            if future.cancel():
+                self.jobs.pop(job_id, None)
+        my_print_and_log(f"\nCancel pressed, cancelled {cnt_cancelled} jobs\n", _only_log=True)
+        self.status_msg.set(f"Cancelled {cnt_cancelled} jobs. Ready for more input.")
+        self.update_in_flight()
+
+    def shutdown(self, ):
+        for _, future, cancel_event in self.jobs.values():
+            cancel_event.set()
+            future.cancel()
+        self.executor.shutdown(wait=False)
+        my_print_and_log(f"\nQuery result cache: {self.query_cache.cnt_hits} hits, {self.query_cache.cnt_misses} misses\n", _only_log=True)
+
+    def run_load_review_snapshot(self, ):
+        ## runs on a worker thread
+        ## get graph store object - but do not exit program if problem
+        store, gph_msg = get_graph_store(_on_fail_return=True)
+        if store is None:
+            myStr = "\n".join([
+                f"\nERROR: For the review snapshot, could not eastablish connnection to neo4j.",
+                f"Error message :: {gph_msg}",
+                ])
+            my_print_and_log(myStr)
+            return f"Review snapshot not loaded, Query 2 will read Neo4j. Ready for more input.", None
+        try:
+            time_load_start = time.perf_counter()
+            cnt_reviews = self.review_snapshot.load_from_store(store)
+            my_print_and_log(f"\nLoaded snapshot of {cnt_reviews} Review nodes for Query 2 in {time.perf_counter() - time_load_start:.2f} secs\n")
+            return f"Review snapshot loaded. Ready for more input.", None
+        except Exception as neo_snapshot_error:
+            myStr = "\n".join([
+                f"\nERROR: Problem loading the review snapshot, Query 2 will read Neo4j.",
+                f"Error message :: {neo_snapshot_error}",
+                ])
+            my_print_and_log(myStr)
+            return f"Review snapshot not loaded, Query 2 will read Neo4j. Ready for more input.", None
+
+    def run_load_flavor_index(self, ):
+        ## runs on a worker thread
+        ## get graph store object - but do not exit program if problem
+        store, gph_msg = get_graph_store(_on_fail_return=True)
+        if store is None:
+            myStr = "\n".join([
+                f"\nERROR: For the flavor index, could not eastablish connnection to neo4j.",
+                f"Error message :: {gph_msg}",
+                ])
+            my_print_and_log(myStr)
+            return f"Flavor index not loaded, Query 3 will read Neo4j. Ready for more input.", None
+        try:
+            time_load_start = time.perf_counter()
+            cnt_reviews = self.flavor_index.load_from_store(store)
+            my_print_and_log(f"\nLoaded flavor index of {cnt_reviews} Review nodes for Query 3 in {time.perf_counter() - time_load_start:.2f} secs\n")
+            return f"Flavor index loaded. Ready for more input.", None
+        except Exception as neo_flavor_index_error:
+            myStr = "\n".join([
+                f"\nERROR: Problem loading the flavor index, Query 3 will read Neo4j.",
+                f"Error message :: {neo_flavor_index_error}",
+                ])
+            my_print_and_log(myStr)
+            return f"Flavor index not loaded, Query 3 will read Neo4j. Ready for more input.", None
+
     def do_query_1_processing(self, ):
         #print(f"\n\nQuery 1 processing started\n\n")
         my_print_and_log(f"\nQuery 1 processing started\n", _only_log=True)
@@ -583,57 +1180,50 @@ class c_wine_tool_window:
         node_requested = self.query_input_data
         #print(f"\nNode requested: {node_requested}\n")
         my_print_and_log(f"\nNode requested: {node_requested}\n", _only_log=True)
-
-        ## get graph object - but do not exit program if problem
-        graph, gph_msg = make_neo4j_connection(_on_fail_return=True)
-        if graph is None:
-            myStr = "\n".join([
-                f"\nERROR: For Query 1, could not eastablish connnection to neo4j.",
-                f"Error message :: {gph_msg}",
-                ])
-            my_print_and_log(myStr)
-            self.status_msg.set(f"Failed to connect to Neo4j for Query 1.")
-            self.lbl_results.configure(
-                text=self.result,
-            )
-            self.root.update_idletasks()
-            return
-        ## query neo4j
-        stmt20_query_1 = r'MATCH (n1:xxxxxxx) WITH COUNT (DISTINCT n1) as node_count RETURN node_count'
         for possible_node in ['Review', 'Entity', 'Flavor']:
             if possible_node.lower() == node_requested.lower():
-                stmt20_query_1 = stmt20_query_1.replace('xxxxxxx', possible_node)
-                #my_print_and_log(f"\nstmt20_query_1 updated to: {stmt20_query_1}\n")
-                try:
-                    tx = graph.begin()
-                    # run the query 1
-                    res_q1 = tx.run(stmt20_query_1, parameters={
-                        '_node_type_label': node_requested,
-                        })
-                    res_q1 = list(res_q1)
-                    res_q1 = res_q1[0]['node_count']
-                    self.result = f"Found {res_q1} nodes of Label={node_requested}"
-                    #my_print_and_log(f"\nQuery 1 run successfully. Result =\n{type(res_q1)},\n{res_q1}\n")
-                    self.status_msg.set(f"Query 1 run successfully. Ready for more input.")
-                except Exception as neo_query_error:
-                    myStr = "\n".join([
-                        f"\nERROR: Problem running Query 1.",
-                        f"Error message :: {neo_query_error}",
-                        ])
-                    my_print_and_log(myStr)
-                    self.status_msg.set(f"Query 1 failed. Error:: {neo_query_error}.")
-                    self.result = f"---------------"
+                self.submit_job(f"Query 1", self.run_query_1, possible_node, node_requested)
                 ## break to ensure the else of the for loop is not executed
                 break
         else:
             ## will be executed only if all entries of the for loop are cyceld through without a break
             self.status_msg.set(f"Query 1 - invalid Label provided.")
             self.result = f"---------------"
-        self.lbl_results.configure(
-            text=self.result,
-        )
-        self.root.update_idletasks()
+            self.lbl_results.configure(
+                text=self.result,
+            )
         return
+
+    def run_query_1(self, _node_label, _node_requested):
+        ## runs on a worker thread
+        cache_key = ('query_1', _node_label)
+        res_q1, cache_generation = self.query_cache.get(cache_key)
+        if res_q1 is not None:
+            return f"Query 1 run successfully (cached result). Ready for more input.", f"Found {res_q1} nodes of Label={_node_requested}"
+        
+        ## get graph store object - but do not exit program if problem
+        store, gph_msg = get_graph_store(_on_fail_return=True)
+        if store is None:
+            myStr = "\n".join([
+                f"\nERROR: For Query 1, could not eastablish connnection to neo4j.",
+                f"Error message :: {gph_msg}",
+                ])
+            my_print_and_log(myStr)
+            return f"Failed to connect to Neo4j for Query 1.", None
+        ## query neo4j
+        try:
+            # run the query 1
+            res_q1 = store.count_nodes(_node_label)
+            self.query_cache.put(cache_key, res_q1, cache_generation)
+            #my_print_and_log(f"\nQuery 1 run successfully. Result =\n{type(res_q1)},\n{res_q1}\n")
+            return f"Query 1 run successfully. Ready for more input.", f"Found {res_q1} nodes of Label={_node_requested}"
+        except Exception as neo_query_error:
+            myStr = "\n".join([
+                f"\nERROR: Problem running Query 1.",
+                f"Error message :: {neo_query_error}",
+                ])
+            my_print_and_log(myStr)
+            return f"Query 1 failed. Error:: {neo_query_error}.", f"---------------"
     
     def do_query_2_processing(self, ):
         #print(f"\n\nQuery 2 processing started\n\n")
@@ -649,52 +1239,45 @@ class c_wine_tool_window:
             self.lbl_results.configure(
                 text=self.result,
             )
-            self.root.update_idletasks()
             return
+        self.submit_job(f"Query 2", self.run_query_2, reqd_min_words, reqd_min_senti_score)
+        return
+
+    def run_query_2(self, _reqd_min_words, _reqd_min_senti_score):
+        ## runs on a worker thread
+        cache_key = ('query_2', _reqd_min_words, _reqd_min_senti_score)
+        res_q2, cache_generation = self.query_cache.get(cache_key)
+        if res_q2 is not None:
+            return f"Query 2 run successfully (cached result). Ready for more input.", f"Found {res_q2} Review nodes with mininum words={_reqd_min_words} and minimum sentiment score={_reqd_min_senti_score}"
+        if self.review_snapshot.ready:
+            res_q2 = self.review_snapshot.count_min_words_senti(_reqd_min_words, _reqd_min_senti_score)
+            self.query_cache.put(cache_key, res_q2, cache_generation)
+            return f"Query 2 run successfully. Ready for more input.", f"Found {res_q2} Review nodes with mininum words={_reqd_min_words} and minimum sentiment score={_reqd_min_senti_score}"
         
-        ## get graph object - but do not exit program if problem
-        graph, gph_msg = make_neo4j_connection(_on_fail_return=True)
-        if graph is None:
+        ## get graph store object - but do not exit program if problem
+        store, gph_msg = get_graph_store(_on_fail_return=True)
+        if store is None:
             myStr = "\n".join([
                 f"\nERROR: For Query 2, could not eastablish connnection to neo4j.",
                 f"Error message :: {gph_msg}",
                 ])
             my_print_and_log(myStr)
-            self.status_msg.set(f"Failed to connect to Neo4j for Query 2.")
-            self.result = f"---------------"
-            self.lbl_results.configure(
-                text=self.result,
-            )
-            self.root.update_idletasks()
-            return
+            return f"Failed to connect to Neo4j for Query 2.", f"---------------"
         
         ## query neo4j
-        stmt21_query_2 = r"MATCH (rv1:Review) WHERE rv1['count_words'] > $_in_min_words AND rv1['senti_score'] > $_in_min_senti_score WITH COUNT (rv1) AS review_node_count RETURN review_node_count"
         try:
-            tx = graph.begin()
             # run the query 2
-            res_q2 = tx.run(stmt21_query_2, parameters={
-                '_in_min_words': reqd_min_words,
-                '_in_min_senti_score': reqd_min_senti_score,
-            })
+            res_q2 = store.count_reviews_min_words_senti(_reqd_min_words, _reqd_min_senti_score)
+            self.query_cache.put(cache_key, res_q2, cache_generation)
             #print(f"\nQuery 2 run successfully. Result =\n{type(res_q2)},\n{res_q2}\n\n")
-            res_q2 = list(res_q2)
-            res_q2 = res_q2[0]['review_node_count']
-            self.result = f"Found {res_q2} Review nodes with mininum words={reqd_min_words} and minimum sentiment score={reqd_min_senti_score}"
-            self.status_msg.set(f"Query 2 run successfully. Ready for more input.")
+            return f"Query 2 run successfully. Ready for more input.", f"Found {res_q2} Review nodes with mininum words={_reqd_min_words} and minimum sentiment score={_reqd_min_senti_score}"
         except Exception as neo_query_error:
             myStr = "\n".join([
                 f"\nERROR: Problem running Query 2.",
                 f"Error message :: {neo_query_error}",
                 ])
             my_print_and_log(myStr)
-            self.status_msg.set(f"Query 2 failed. Error:: {neo_query_error}.")
-            self.result = f"---------------"
-        self.lbl_results.configure(
-            text=self.result,
-        )
-        self.root.update_idletasks()
-        return
+            return f"Query 2 failed. Error:: {neo_query_error}.", f"---------------"
     
     def do_query_3_processing(self, ):
         #print(f"\n\nQuery 3 processing started\n\n")
@@ -703,99 +1286,146 @@ class c_wine_tool_window:
         try:
             reqd_flavors_list = [flav.strip() for flav in self.query_input_data.split(',')]
             my_print_and_log(f"\nUser input required flavors=\n{reqd_flavors_list}\n")
+            ## + marks a flavor the review must have, - one it must not have, the others are any of
+            ##    sorted and without repeats, so that the same query typed differently has the same cache key
+            reqd_all_flavors = sorted(set(flav[1:].strip() for flav in reqd_flavors_list if flav.startswith('+')))
+            reqd_not_flavors = sorted(set(flav[1:].strip() for flav in reqd_flavors_list if flav.startswith('-')))
+            reqd_any_flavors = sorted(set(flav for flav in reqd_flavors_list if not flav.startswith(('+', '-'))))
+            if not all(reqd_all_flavors + reqd_not_flavors + reqd_any_flavors):
+                raise ValueError(f"empty flavor name in {reqd_flavors_list}")
         except Exception as query2_invalid_data:
-            self.status_msg.set(f"Query 3 - invalid data provided. Expected names of flavors separated by comma e.g. cherry,coffee")
+            self.status_msg.set(f"Query 3 - invalid data provided. Expected names of flavors separated by comma e.g. cherry,coffee or cherry,+oak,-coffee")
             self.result = f"---------------"
             self.lbl_results.configure(
                 text=self.result,
             )
-            self.root.update_idletasks()
             return
+        self.submit_job(f"Query 3", self.run_query_3, reqd_any_flavors, reqd_all_flavors, reqd_not_flavors)
+        return
+
+    def run_query_3(self, _reqd_any_flavors, _reqd_all_flavors, _reqd_not_flavors):
+        ## runs on a worker thread
+        conditions = list()
+        if _reqd_any_flavors:
+            conditions.append(f"one or more flavors of {','.join(_reqd_any_flavors)}")
+        if _reqd_all_flavors:
+            conditions.append(f"all flavors of {','.join(_reqd_all_flavors)}")
+        if _reqd_not_flavors:
+            conditions.append(f"none of the flavors {','.join(_reqd_not_flavors)}")
+        
+        cache_key = ('query_3', tuple(_reqd_any_flavors), tuple(_reqd_all_flavors), tuple(_reqd_not_flavors))
+        rev_nodes_names, cache_generation = self.query_cache.get(cache_key)
+        if rev_nodes_names is not None:
+            final_res = "\n".join([
+                f"Count of Review nodes found with {' and '.join(conditions)} = {len(rev_nodes_names)}",
+                f"Name of the Review nodes: {', '.join(rev_nodes_names)}",
+            ])
+            return f"Query 3 run successfully (cached result). Ready for more input.", final_res
+        
+        ## the flavor index gives the exact count and the names without reading the (flavor, review) rows
+        if self.flavor_index.ready:
+            rev_nodes_bitmap = self.flavor_index.match(_reqd_all_flavors, _reqd_any_flavors, _reqd_not_flavors)
+            rev_nodes_names = self.flavor_index.get_review_names(rev_nodes_bitmap)
+            self.query_cache.put(cache_key, rev_nodes_names, cache_generation)
+            final_res = "\n".join([
+                f"Count of Review nodes found with {' and '.join(conditions)} = {len(rev_nodes_names)}",
+                f"Name of the Review nodes: {', '.join(rev_nodes_names)}",
+            ])
+            my_print_and_log(f"final_res =\n{final_res}\n")
+            my_print_and_log(f"\nQuery 3 run successfully.")
+            return f"Query 3 run successfully. Ready for more input.", final_res
+        if _reqd_all_flavors or _reqd_not_flavors:
+            return f"Query 3 with + or - flavors needs the flavor index, which is not loaded yet. Try again shortly.", f"---------------"
         
-        ## get graph object - but do not exit program if problem
-        graph, gph_msg = make_neo4j_connection(_on_fail_return=True)
-        if graph is None:
+        ## get graph store object - but do not exit program if problem
+        store, gph_msg = get_graph_store(_on_fail_return=True)
+        if store is None:
             myStr = "\n".join([
                 f"\nERROR: For Query 3, could not eastablish connnection to neo4j.",
                 f"Error message :: {gph_msg}",
                 ])
             my_print_and_log(myStr)
-            self.status_msg.set(f"Failed to connect to Neo4j for Query 3.")
-            self.result = f"---------------"
-            self.lbl_results.configure(
-                text=self.result,
-            )
-            self.root.update_idletasks()
-            return
+            return f"Failed to connect to Neo4j for Query 3.", f"---------------"
         
         ## query neo4j
-        stmt22_query_3 = r"MATCH (rv1:Review)-[rel1:HAS_FLAVOR]-(f1:Flavor) WHERE f1['name'] in $_in_flav_list RETURN f1['name'], rv1['name']"
         try:
-            tx = graph.begin()
-            # run the query 3
-            res_q3 = tx.run(stmt22_query_3, parameters={
-                '_in_flav_list': reqd_flavors_list,
-            })
+            # run the query 3 - pairs of flavor name, review name
+            res_q3 = store.get_flavor_review_pairs(_reqd_any_flavors)
             #print(f"\nQuery 3 run successfully. Result =\n{type(res_q3)},\n{res_q3}\n\n")
-            res_q3 = list(res_q3)
             #final_res = ""
             #final_res = "\n".join([f'Review node {res[1]} -HAS_FLAVOR- {res[0]}' for res in res_q3])
             
             rev_nodes_set = set([res[1] for res in res_q3])
+            self.query_cache.put(cache_key, list(rev_nodes_set), cache_generation)
             rev_nodes_names = ", ".join(list(rev_nodes_set))
             final_res = "\n".join([
-                f"Count of Review nodes found with one or more flavors of {self.query_input_data} = {len(rev_nodes_set)}",
+                f"Count of Review nodes found with {' and '.join(conditions)} = {len(rev_nodes_set)}",
                 f"Name of the Review nodes: {rev_nodes_names}",
             ])
 
             my_print_and_log(f"final_res =\n{final_res}\n")
-            self.result = final_res
             #print(f"\nQuery 3 run successfully. Result =\n{type(res_q3)},\n{res_q3}\n\n")
             my_print_and_log(f"\nQuery 3 run successfully.")
-            self.status_msg.set(f"Query 3 run successfully. Ready for more input.")
+            return f"Query 3 run successfully. Ready for more input.", final_res
         except Exception as neo_query_error:
             myStr = "\n".join([
                 f"\nERROR: Problem running Query 3.",
                 f"Error message :: {neo_query_error}",
                 ])
             my_print_and_log(myStr)
-            self.status_msg.set(f"Query 3 failed. Error:: {neo_query_error}.")
+            return f"Query 3 failed. Error:: {neo_query_error}.", f"---------------"
+    
+    def do_top_flavors_processing(self, ):
+        my_print_and_log(f"\nTop Flavors processing started\n", _only_log=True)
+        self.query_input_data = self.txt_editable_query_input.get('1.0','end-1c').strip()
+        try:
+            reqd_num_flavors = int(self.query_input_data) if self.query_input_data else TOP_FLAVORS_DEFAULT
+            if reqd_num_flavors <= 0:
+                raise ValueError(f"not a positive number: {reqd_num_flavors}")
+        except Exception as top_flavors_invalid_data:
+            self.status_msg.set(f"Top Flavors - invalid data provided. Expected a positive integer e.g. 5, or nothing")
             self.result = f"---------------"
-        self.lbl_results.configure(
-            text=self.result,
-        )
-        self.root.update_idletasks()
+            self.lbl_results.configure(
+                text=self.result,
+            )
+            return
+        self.submit_job(f"Top Flavors", self.run_top_flavors, reqd_num_flavors)
         return
+
+    def run_top_flavors(self, _reqd_num_flavors):
+        ## runs on a worker thread
+        ## get graph store object - but do not exit program if problem
+        store, gph_msg = get_graph_store(_on_fail_return=True)
+        if store is None:
+            myStr = "\n".join([
+                f"\nERROR: For Top Flavors, could not eastablish connnection to neo4j.",
+                f"Error message :: {gph_msg}",
+                ])
+            my_print_and_log(myStr)
+            return f"Failed to connect to Neo4j for Top Flavors.", f"---------------"
+        
+        ## read the reviews per flavor from the graph statistics
+        try:
+            flavor_counts = store.get_stats('flavor')
+            top_flavors = sorted(flavor_counts.items(), key=lambda item: (-item[1], item[0]))[:_reqd_num_flavors]
+            final_res = "\n".join(
+                [f"Top {len(top_flavors)} of {len(flavor_counts)} flavors by number of Review nodes:"] +
+                [f"{flav_name} = {cnt_reviews}" for flav_name, cnt_reviews in top_flavors])
+            my_print_and_log(f"\nTop Flavors run successfully.", _only_log=True)
+            return f"Top Flavors run successfully. Ready for more input.", final_res
+        except Exception as neo_query_error:
+            myStr = "\n".join([
+                f"\nERROR: Problem running Top Flavors.",
+                f"Error message :: {neo_query_error}",
+                ])
+            my_print_and_log(myStr)
+            return f"Top Flavors failed. Error:: {neo_query_error}.", f"---------------"
     
     def do_upload_text_neo_processing(self, ):
         self.path_text_editable = self.txt_editable_file_or_text.get('1.0','end-1c').strip()
         my_print_and_log(f"\nButton to upload TEXT pressed\n")
-        self.status_msg.set(f"Processing input text....")
-        self.root.update_idletasks()
-
-        ## get features into the data structure to populate for neo4j flat files
-        extracted_text = self.path_text_editable
-        data_neo_one_file = list()
-        get_features_set1(
-            None,
-            extracted_text, data_neo_one_file,
-            self.nlp, self.punctuations, self.stopwords,
-            self.flag_ner, self.flag_topic, self.flag_sentiment,
-            )
-        my_print_and_log(f"\nUser input processed and data structure is:\n{data_neo_one_file}\n", _only_log=True)
-        ## write as json file
-        try:
-            json_path = self.OP_DIR + 'user_input_temp_neo_data.json'
-            with open(json_path, "w") as f:
-                json.dump(data_neo_one_file, f)
-            my_print_and_log(f"\nUser input processed data successfully dumped to json file: {json_path}\n")
-        except Exception as neo_data_save_error:
-            my_print_and_log(f"\n\nERROR: User data not saved to json file after feature extraction.\nError message: {neo_data_save_error}\n")
-            self.status_msg = f"Error saving user input to json file."
-        ## do actual upload to neo4j db
-        load_neo4j_from_json(json_path, _clear_graph=False)
-        self.status_msg.set(f"Processed input raw text and uploaded to Neo4j successfully.")
-        self.root.update_idletasks()
+        self.submit_job(f"Upload Text", self.run_upload_neo, None, self.path_text_editable,
+            f"Processed input raw text and uploaded to Neo4j successfully.")
         return
     
     def do_upload_file_neo_processing(self, ):
@@ -803,14 +1433,11 @@ class c_wine_tool_window:
         #my_print_and_log(f"\nButton to upload file pressed\nFile to upload: {self.path_editable}\n")
         self.path_text_editable = self.txt_editable_file_or_text.get('1.0','end-1c').strip()
         my_print_and_log(f"\nButton to upload FILE pressed\nFile to upload: {self.path_text_editable}\n")
-        self.status_msg.set(f"Processing input file....")
-        self.root.update_idletasks()
         ## check file exists
         #if not os.path.isfile(self.path_editable):
         if not os.path.isfile(self.path_text_editable):
             my_print_and_log(f"\nERROR: User specified file does not exist.\n")
             self.status_msg.set(f"Input file not found, re-enter please....")
-            self.root.update_idletasks()
             return
         
         ## attempt loading
@@ -821,35 +1448,83 @@ class c_wine_tool_window:
         except Exception as upload_file_error:
             my_print_and_log(f"\nERROR: User specified file could not be opened\nError message: {upload_file_error}")
             self.status_msg.set(f"Error accessing the upload file, recheck.")
-            self.root.update_idletasks()
             return
-        
+        self.submit_job(f"Upload File", self.run_upload_neo,
+            os.path.basename(self.path_text_editable).split(".")[0], #self.path_editable).split(".")[0]
+            extracted_text,
+            f"Processed input file and uploaded to Neo4j successfully.")
+        return
+
+    def run_upload_neo(self, _fname, _extracted_text, _success_msg):
+        ## runs on a worker thread
         ## get features into the data structure to populate for neo4j flat files
         data_neo_one_file = list()
-        get_features_set1(
-            os.path.basename(self.path_text_editable).split(".")[0], #self.path_editable).split(".")[0]
-            extracted_text, data_neo_one_file,
-            self.nlp, self.punctuations, self.stopwords,
-            self.flag_ner, self.flag_topic, self.flag_sentiment,
-            )
+        ## spacy pipelines are not guaranteed to be thread safe, so only one upload runs the model at a time
+        with self.nlp_lock:
+            get_features_set1(
+                _fname,
+                _extracted_text, data_neo_one_file,
+                self.nlp, self.punctuations, self.stopwords,
+                self.flag_ner, self.flag_topic, self.flag_sentiment,
+                _flavor_matcher=self.flavor_matcher,
+                )
         my_print_and_log(f"\nUser input processed and data structure is:\n{data_neo_one_file}\n", _only_log=True)
-        ## write as json file
+        ## write as json file - each upload gets its own file as several uploads can be in flight, deleted after the load
+        json_path = self.OP_DIR + f"user_input_temp_neo_data_{data_neo_one_file[0]['Review']['name']}.json"
         try:
-            json_path = self.OP_DIR + 'user_input_temp_neo_data.json'
             with open(json_path, "w") as f:
                 json.dump(data_neo_one_file, f)
             my_print_and_log(f"\nUser input processed data successfully dumped to json file: {json_path}\n")
         except Exception as neo_data_save_error:
             my_print_and_log(f"\n\nERROR: User data not saved to json file after feature extraction.\nError message: {neo_data_save_error}\n")
-            self.status_msg = f"Error saving user input to json file."
+            return f"Error saving user input to json file.", None
         ## do actual upload to neo4j db
-        load_neo4j_from_json(json_path, _clear_graph=False)
-        self.status_msg.set(f"Processed input file and uploaded to Neo4j successfully.")
-        self.root.update_idletasks()
+        try:
+            load_neo4j_from_json(json_path, _clear_graph=False)
+        finally:
+            try:
+                os.remove(json_path)
+            except OSError as neo_data_remove_error:
+                my_print_and_log(f"\nWARNING: Could not delete the temporary json file: {json_path}\nError message: {neo_data_remove_error}\n", "warning")
+        ## keep the Query 2 snapshot and the Query 3 flavor index in step, also while they are still loading as the upload is
+        ##    never overwritten by the load
+        rev_rows, _, _ = build_neo_batch_params(data_neo_one_file)
+        self.review_snapshot.upsert(get_review_scalars_from_rows(rev_rows))
+        self.flavor_index.add_review(data_neo_one_file[0]['Review']['name'], data_neo_one_file[0]['Flavors'])
+        ## a typed text always gets a new review name, a file upload may replace a review loaded before
+        cnt_dropped = self.query_cache.invalidate(partial(is_query_affected_by_upload, data_neo_one_file[0], _fname is None))
+        my_print_and_log(f"\nUpload dropped {cnt_dropped} cached query results\n", _only_log=True)
+        return _success_msg, None
+
+def is_query_affected_by_upload(_neo_entry, _is_new_review, _cache_key):
+    """
+    Goal: Decide if uploading the review could change the cached result of a query
+    Accepts: neo entry of the uploaded review, flag if the review did not exist before, cache key of the query
+    Return: True if the cached result must be dropped
+    """
+    flavors = set(_neo_entry['Flavors'])
+    if _cache_key[0] == 'query_1':
+        ## Review always, Entity and Flavor only if the review brings any (new ones add nodes)
+        return _cache_key[1] == 'Review' or (_cache_key[1] == 'Entity' and bool(_neo_entry['Entities'])) or (_cache_key[1] == 'Flavor' and bool(flavors))
+    if _cache_key[0] == 'query_2':
+        ## the old values of a replaced review are not known, so every Query 2 result is dropped then
+        if not _is_new_review:
+            return True
+        cnt_words = _neo_entry['Review']['cnt_words']
+        senti_score = (_neo_entry['Review']['sentiment'] or dict()).get('polarity')
+        return cnt_words is not None and senti_score is not None and cnt_words > _cache_key[1] and senti_score > _cache_key[2]
+    if _cache_key[0] == 'query_3':
+        ## a result changes if the review now matches, or if it has one of the flavors (it could have matched before)
+        any_flavors, all_flavors, not_flavors = set(_cache_key[1]), set(_cache_key[2]), set(_cache_key[3])
+        if flavors & (any_flavors | all_flavors | not_flavors):
+            return True
+        return all_flavors <= flavors and (not any_flavors or bool(flavors & any_flavors)) and not flavors & not_flavors
+    return True
 
-def run_gui(_nlp, _punctuations, _stopwords, _flag_ner, _flag_topic, _flag_sentiment, _op_dir):
-    o_wine_tool_window = c_wine_tool_window(_nlp, _punctuations, _stopwords, _flag_ner, _flag_topic, _flag_sentiment, _op_dir)
+def run_gui(_nlp, _punctuations, _stopwords, _flag_ner, _flag_topic, _flag_sentiment, _op_dir, _flavor_matcher=None):
+    o_wine_tool_window = c_wine_tool_window(_nlp, _punctuations, _stopwords, _flag_ner, _flag_topic, _flag_sentiment, _op_dir, _flavor_matcher)
     o_wine_tool_window.root.mainloop()
+    o_wine_tool_window.shutdown()
     return
 
 def main():
@@ -860,6 +1535,7 @@ def main():
     HOME = os.getcwd()
     print(f"HOME = {HOME}")
     IP_DIR = os.path.join(HOME, 'inData') + r'/' ## where the individual files have already been saved
+    IP_CORPUS_DIR = os.path.join(HOME, 'inCorpus') + r'/' ## where the packed corpus shards are saved, if used instead of the individual files
     OP_DIR = os.path.join(HOME, 'outData') + r'/' ## folder to store json
     TEMP_DIR = os.path.join(HOME, 'tempDir') + r'/' ## log files and any temporary files
 
@@ -877,18 +1553,8 @@ def main():
     flag_topic=False
     flag_sentiment=True
 
-    ## for docker using only small model as to limit size
-    in_docker_flag = os.environ.get('AM_I_IN_A_DOCKER_CONTAINER', "no")
-    if in_docker_flag == "yes":
-        nlp = spacy.load("en_core_web_sm")
-        my_print_and_log(f"\nIn docker environment....loaded spacy small model.\n")
-    else:
-        nlp = spacy.load("en_core_web_lg")
-        my_print_and_log(f"\nNot in docker environment....loaded spacy large model.\n")
-    nlp.add_pipe('spacytextblob')
-
     punctuations = string.punctuation
-    stopwords = list(STOP_WORDS)
+    stopwords = frozenset(STOP_WORDS)
 
     ## create output directory if does not exist
     if not os.path.exists(OP_DIR):
@@ -904,24 +1570,203 @@ def main():
         '-reloadNeo',
         '--reload_and_clear_neo',
         default='N',
-        choices=['Y', 'N', 'y', 'n'],
-        help='Flag to first reload data to Neo4j from input files. Note: If yes, will also clear the graph first.')
+        choices=['Y', 'N', 'I', 'y', 'n', 'i'],
+        help='Flag to first reload data to Neo4j from input files. Note: If yes, will also clear the graph first. I for incremental: keep the graph and only process input files that are new, changed or removed since the last reload.')
     argparser.add_argument(
         '-uploadLimit',
         '--upload_neo_limit',
         type=int,
         default=100,
         help='Number of input files to process and upload data to Neo4j. Enter a number from 1 to the number of input files available.')
+    argparser.add_argument(
+        '-neoBatchSize',
+        '--neo_load_batch_size',
+        type=int,
+        default=500,
+        help='Number of entries sent to Neo4j per UNWIND transaction during reload. Enter 0 to send one transaction per entry.')
+    argparser.add_argument(
+        '-nlpBatchSize',
+        '--nlp_pipe_batch_size',
+        type=int,
+        default=50,
+        help='Number of texts per nlp.pipe batch during feature extraction. Enter 0 to process one document at a time.')
+    argparser.add_argument(
+        '-nlpProcesses',
+        '--nlp_pipe_processes',
+        type=int,
+        default=1,
+        help='Number of processes used by nlp.pipe during feature extraction.')
+    argparser.add_argument(
+        '-featureCache',
+        '--use_feature_cache',
+        default='Y',
+        choices=['Y', 'N', 'y', 'n'],
+        help='Flag to reuse features extracted in earlier runs from the on-disk cache in the output folder.')
+    argparser.add_argument(
+        '-featureCacheMaxMB',
+        '--feature_cache_max_mb',
+        type=int,
+        default=512,
+        help='Size limit of the feature cache in MB. Least recently used entries are evicted above it.')
+    argparser.add_argument(
+        '-inputFormat',
+        '--input_format',
+        default='files',
+        choices=['files', 'shards'],
+        help='Read the reviews from the individual .txt files in inData or from the packed corpus shards in inCorpus.')
+    argparser.add_argument(
+        '-clearMode',
+        '--clear_graph_mode',
+        default='batched',
+        choices=['single', 'batched', 'drop'],
+        help='How the graph is cleared before a full reload: one transaction, bounded batches, or drop and recreate the database (falls back to batched).')
+    argparser.add_argument(
+        '-clearBatchSize',
+        '--clear_graph_batch_size',
+        type=int,
+        default=10000,
+        help='Number of relationships or nodes deleted per transaction when clearing the graph in batches.')
+    argparser.add_argument(
+        '-flavorLexicon',
+        '--flavor_lexicon_file',
+        default=os.path.join(HOME, 'flavor_lexicon.txt'),
+        help='File with one flavor name per line, multi-word flavors allowed. If not found the built-in flavor list is used.')
+    argparser.add_argument(
+        '-nlpProfile',
+        '--nlp_profile',
+        default='full',
+        choices=NLP_PROFILES,
+        help='Spacy components used for extraction: full = whole model, fast = no parser (senter for sentences), stats-only = also no NER or sentiment.')
+    argparser.add_argument(
+        '-loadPipeline',
+        '--overlap_extract_and_load',
+        default='N',
+        choices=['Y', 'N', 'y', 'n'],
+        help='Flag to load batches of entries to Neo4j on a graph writer thread while the remaining inputs are still being extracted.')
+    argparser.add_argument(
+        '-extractWorkers',
+        '--extract_workers',
+        type=int,
+        default=0,
+        help='Number of worker processes for sharded extraction with checkpoints, 0 to extract without shards.')
+    argparser.add_argument(
+        '-extractShardSize',
+        '--extract_shard_size',
+        type=int,
+        default=1000,
+        help='Number of input files per shard for sharded extraction.')
+    argparser.add_argument(
+        '-graphBackend',
+        '--graph_backend',
+        default='neo4j',
+        choices=GRAPH_BACKENDS,
+        help='Graph store for loading and queries: neo4j, or memory = in-process store without a database (starts empty on every run).')
+    argparser.add_argument(
+        '-profileStages',
+        '--profile_stages',
+        default='N',
+        choices=['Y', 'N', 'y', 'n'],
+        help='Flag to time every extraction and load stage: summary table in the log at the end, per document times in tempDir/stage_trace.jsonl.')
+    argparser.add_argument(
+        '-rebuildStats',
+        '--rebuild_graph_stats',
+        default='N',
+        choices=['Y', 'N', 'y', 'n'],
+        help='Flag to count the graph again and rebuild the graph statistics used by Query 1 and the Top Flavors view.')
     args = argparser.parse_args()
 
     ## extract cla args
     RELOAD_TO_NEO = args.reload_and_clear_neo
     LIMIT_UPLOAD_TO_NEO = args.upload_neo_limit
+    NEO_BATCH_SIZE = args.neo_load_batch_size
+    NLP_BATCH_SIZE = args.nlp_pipe_batch_size
+    NLP_PROCESSES = args.nlp_pipe_processes
+    USE_FEATURE_CACHE = args.use_feature_cache
+    FEATURE_CACHE_MAX_MB = args.feature_cache_max_mb
+    INPUT_FORMAT = args.input_format
+    CLEAR_MODE = args.clear_graph_mode
+    CLEAR_BATCH_SIZE = args.clear_graph_batch_size
+    FLAVOR_LEXICON_FILE = args.flavor_lexicon_file
+    NLP_PROFILE = args.nlp_profile
+    LOAD_PIPELINE = args.overlap_extract_and_load
+    EXTRACT_WORKERS = args.extract_workers
+    EXTRACT_SHARD_SIZE = args.extract_shard_size
+    GRAPH_BACKEND = args.graph_backend
+    PROFILE_STAGES = args.profile_stages
+    REBUILD_STATS = args.rebuild_graph_stats
+
+    ## check batch size parameter
+    if NEO_BATCH_SIZE < 0:
+        myStr = "\n".join([
+            f"\nFATAL ERROR: Invalid value for 'neo_load_batch_size' parameter:: {NEO_BATCH_SIZE}",
+            f"enter 0 or a positive number",
+            f"EXITING with error code 42\n",
+            ])
+        my_print_and_log(myStr, "error")
+        exit(42)
+    ## the pipeline hands entries to the graph writer in batches
+    if LOAD_PIPELINE.lower() == 'y' and NEO_BATCH_SIZE == 0:
+        myStr = "\n".join([
+            f"\nFATAL ERROR: Invalid value for 'neo_load_batch_size' parameter:: {NEO_BATCH_SIZE}",
+            f"enter a positive number when 'overlap_extract_and_load' is Y",
+            f"EXITING with error code 45\n",
+            ])
+        my_print_and_log(myStr, "error")
+        exit(45)
+    ## check sharded extraction parameters
+    if EXTRACT_WORKERS < 0 or EXTRACT_SHARD_SIZE < 1:
+        myStr = "\n".join([
+            f"\nFATAL ERROR: Invalid value for 'extract_workers' or 'extract_shard_size' parameter:: {EXTRACT_WORKERS}, {EXTRACT_SHARD_SIZE}",
+            f"enter 0 or a positive number for the workers and a positive number for the shard size",
+            f"EXITING with error code 46\n",
+            ])
+        my_print_and_log(myStr, "error")
+        exit(46)
+    ## check nlp pipe parameters
+    if CLEAR_BATCH_SIZE < 1:
+        myStr = "\n".join([
+            f"\nFATAL ERROR: Invalid value for 'clear_graph_batch_size' parameter:: {CLEAR_BATCH_SIZE}",
+            f"enter a positive number",
+            f"EXITING with error code 43\n",
+            ])
+        my_print_and_log(myStr, "error")
+        exit(43)
+    if NLP_BATCH_SIZE < 0 or NLP_PROCESSES < 1:
+        myStr = "\n".join([
+            f"\nFATAL ERROR: Invalid value for 'nlp_pipe_batch_size' or 'nlp_pipe_processes' parameter:: {NLP_BATCH_SIZE}, {NLP_PROCESSES}",
+            f"enter 0 or a positive number for the batch size and a positive number for the processes",
+            f"EXITING with error code 44\n",
+            ])
+        my_print_and_log(myStr, "error")
+        exit(44)
 
     ## if reloading is required, then check input folder exists, number of files present, upload limit paramter value is valid
-    if RELOAD_TO_NEO.lower() == 'y':
+    if RELOAD_TO_NEO.lower() in ['y', 'i']:
+        ## packed corpus input - open the index, the number of reviews in it plays the role of the number of files
+        if INPUT_FORMAT == 'shards':
+            try:
+                corpus_reader = c_corpus_shard_reader(IP_CORPUS_DIR)
+            except Exception as corpus_open_error:
+                myStr = "\n".join([
+                    f"\nFATAL ERROR: Could not open corpus shards in folder:: {IP_CORPUS_DIR}",
+                    f"Error message :: {corpus_open_error}",
+                    f"EXITING with error code 30\n",
+                    ])
+                my_print_and_log(myStr, "error")
+                exit(30)
+            num_inp_files = len(corpus_reader)
+            my_print_and_log(f"num_inp_files = {num_inp_files}")
+            if not (0 < LIMIT_UPLOAD_TO_NEO <= num_inp_files):
+                myStr = "\n".join([
+                    f"\nFATAL ERROR: Invalid value for 'upload_neo_limit' parameter:: {LIMIT_UPLOAD_TO_NEO}",
+                    f"Only {num_inp_files} reviews present in corpus folder {IP_CORPUS_DIR}",
+                    f"enter a number from 1 to {num_inp_files}",
+                    f"EXITING with error code 40\n",
+                    ])
+                my_print_and_log(myStr, "error")
+                exit(40)
         ## check input files directory exists and count number of files is more than 0
-        if not os.path.exists(IP_DIR):
+        elif not os.path.exists(IP_DIR):
             myStr = "\n".join([
                 f"\nFATAL ERROR: Input folder not found:: {IP_DIR}",
                 f"EXITING with error code 30\n",
@@ -955,60 +1800,225 @@ def main():
         f"\nCommand line arguments checked. Proceeding with these values:",
         f"reloadNeo: {RELOAD_TO_NEO}",
         f"uploadLimit: {LIMIT_UPLOAD_TO_NEO}",
+        f"neoBatchSize: {NEO_BATCH_SIZE}",
+        f"nlpBatchSize: {NLP_BATCH_SIZE}",
+        f"nlpProcesses: {NLP_PROCESSES}",
+        f"featureCache: {USE_FEATURE_CACHE}",
+        f"featureCacheMaxMB: {FEATURE_CACHE_MAX_MB}",
+        f"inputFormat: {INPUT_FORMAT}",
+        f"clearMode: {CLEAR_MODE}",
+        f"clearBatchSize: {CLEAR_BATCH_SIZE}",
+        f"flavorLexicon: {FLAVOR_LEXICON_FILE}",
+        f"nlpProfile: {NLP_PROFILE}",
+        f"loadPipeline: {LOAD_PIPELINE}",
+        f"extractWorkers: {EXTRACT_WORKERS}",
+        f"extractShardSize: {EXTRACT_SHARD_SIZE}",
+        f"graphBackend: {GRAPH_BACKEND}",
+        f"profileStages: {PROFILE_STAGES}",
+        f"rebuildStats: {REBUILD_STATS}",
         ])
     my_print_and_log(myStr, "info")
+
+    ## load the spacy model with only the components the extraction profile needs
+    ##    for docker using only small model as to limit size
+    flag_ner, flag_sentiment = get_profile_flags(NLP_PROFILE, flag_ner, flag_sentiment)
+    in_docker_flag = os.environ.get('AM_I_IN_A_DOCKER_CONTAINER', "no")
+    if in_docker_flag == "yes":
+        nlp = load_nlp_for_profile("en_core_web_sm", NLP_PROFILE, flag_ner, flag_sentiment)
+        my_print_and_log(f"\nIn docker environment....loaded spacy small model.\n")
+    else:
+        nlp = load_nlp_for_profile("en_core_web_lg", NLP_PROFILE, flag_ner, flag_sentiment)
+        my_print_and_log(f"\nNot in docker environment....loaded spacy large model.\n")
+    my_print_and_log(f"\nExtraction profile '{NLP_PROFILE}' :: components = {nlp.pipe_names}, ner = {flag_ner}, sentiment = {flag_sentiment}\n")
+
+    ## time every extraction and load stage if asked
+    if PROFILE_STAGES.lower() == 'y':
+        stage_profiler.enable(TEMP_DIR + 'stage_trace.jsonl')
+
+    ## compile the flavor lexicon once for the whole run
+    if os.path.exists(FLAVOR_LEXICON_FILE):
+        flavor_matcher = c_flavor_matcher.from_file(FLAVOR_LEXICON_FILE)
+        my_print_and_log(f"\nLoaded {len(flavor_matcher)} flavors from lexicon file: {FLAVOR_LEXICON_FILE}\n")
+    else:
+        flavor_matcher = DEFAULT_FLAVOR_MATCHER
+        my_print_and_log(f"\nWARNING: Flavor lexicon file not found: {FLAVOR_LEXICON_FILE}, using the built-in list of {len(flavor_matcher)} flavors\n", "warning")
+
+    ## create the constraints and indexes before any load or query - done by the first connection made
+    set_graph_backend(GRAPH_BACKEND)
+    store, gph_msg = get_graph_store(_on_fail_return=True)
+    if store is None:
+        my_print_and_log(f"\nWARNING: Could not connect to Neo4j to check the schema.\nError message :: {gph_msg}\n", "warning")
     
     ## load data to neo after clearing whole graph - only if flag is true
-    if RELOAD_TO_NEO.lower() == 'y':
+    ##    for an incremental reload the graph is kept and only new, changed or removed inputs are processed
+    if RELOAD_TO_NEO.lower() in ['y', 'i']:
         my_print_and_log(f"\nProcessing only {LIMIT_UPLOAD_TO_NEO} files....\n")
 
-        extracted_text = list() # list to hold the review text
-        idx = 0
-        for fname in glob.glob(IP_DIR + r'f*.txt'):
-            idx += 1
-            if idx > LIMIT_UPLOAD_TO_NEO:
-                break
-            with open(fname, 'r') as f:
-                extracted_text.append([os.path.basename(fname), f.read()])
-        my_print_and_log(f"\nExtracted data from {idx} input files....\n")
-        
-        df_ext = pd.DataFrame(extracted_text, columns=['fname', 'review'])
-        df_ext['proc_review'] = ""
-        my_print_and_log(f"\nLoaded files to pandas dataframe. Total rows = {len(df_ext)}\n")
-
-        ## data structure to populate for neo4j flat files
-        data_neo = list()
-        ## get features
-        for idx, row in df_ext.iterrows():
-            fname, review_text = row[0], row[1]
-            #print(f"{fname}\n{review_text}\n{'----------------'}")
-            proc_text = get_features_set1(fname, review_text, data_neo, nlp, punctuations, stopwords, flag_ner, flag_topic, flag_sentiment)
-            df_ext.at[idx, 'proc_review'] = proc_text
-        
-        ## write intermediate json file
+        ## every input present is kept as well, so that inputs past the upload limit are not taken as removed
+        if INPUT_FORMAT == 'shards':
+            ## reviews read from the mmapped shards by name
+            all_input_files = corpus_reader.names()
+            read_input_text = corpus_reader.get
+        else:
+            all_input_files = sorted(glob.glob(IP_DIR + r'f*.txt'))
+            read_input_text = read_text_file
+        input_files = all_input_files[:LIMIT_UPLOAD_TO_NEO] # list of the input files to process
+        my_print_and_log(f"\nFound {len(input_files)} input files to process....\n")
+
+        ## manifest of name, size, mtime and content hash of every input - compared with the last run for incremental reloads
+        ##    a full reload compares nothing, so the hashes are taken from the texts as extraction reads them (only the
+        ##    sharded extraction of packed corpus input hashes up front, as its checkpoint key needs them)
+        manifest_path = OP_DIR + 'input_manifest.json'
+        old_manifest = load_manifest(manifest_path) if RELOAD_TO_NEO.lower() == 'i' else dict()
+        hash_inputs_first = RELOAD_TO_NEO.lower() == 'i' or (INPUT_FORMAT == 'shards' and EXTRACT_WORKERS)
+        new_manifest = dict()
+        for fname in input_files:
+            rev_name = get_input_name(fname)
+            if INPUT_FORMAT != 'shards':
+                new_manifest[rev_name] = manifest_entry_for_file(fname, old_manifest.get(rev_name), _hash_text=hash_inputs_first)
+            elif hash_inputs_first:
+                new_manifest[rev_name] = manifest_entry_for_text(read_input_text(fname))
+            else:
+                new_manifest[rev_name] = {'size': None, 'mtime_ns': None, 'sha256': None}
+        if RELOAD_TO_NEO.lower() == 'i':
+            all_input_names = set(get_input_name(fname) for fname in all_input_files)
+            new_or_changed, removed = compare_manifests(old_manifest, new_manifest, _present_names=all_input_names)
+            ## inputs of the last run past the upload limit stay in the graph, and in the manifest for the next run
+            cnt_past_limit = 0
+            for rev_name, entry in old_manifest.items():
+                if rev_name not in new_manifest and rev_name in all_input_names:
+                    new_manifest[rev_name] = entry
+                    cnt_past_limit += 1
+            my_print_and_log(f"\nIncremental reload: {len(new_or_changed)} new or changed inputs, {len(removed)} removed inputs, {len(input_files)-len(new_or_changed)} unchanged, {cnt_past_limit} past the upload limit kept as they are\n")
+            new_or_changed = set(new_or_changed)
+            input_files = [fname for fname in input_files if get_input_name(fname) in new_or_changed]
+
+        ## open the feature cache so that unchanged reviews are not extracted again
+        ##    not used by sharded extraction, where the checkpoint keeps the work already done
+        feature_cache = None
+        if USE_FEATURE_CACHE.lower() == 'y' and not EXTRACT_WORKERS:
+            cache_context = make_feature_cache_context(nlp, flag_ner, flag_topic, flag_sentiment,
+                _extra=f"spacy={spacy.__version__},flavors={flavor_matcher.fingerprint}")
+            feature_cache = c_feature_cache(OP_DIR + 'feature_cache.sqlite', cache_context, _max_bytes=FEATURE_CACHE_MAX_MB*1024*1024)
+
+        ## pipeline mode: clear the graph or delete the changed reviews up front, the entries are then loaded by a
+        ##    graph writer thread while the remaining inputs are still being extracted
+        if LOAD_PIPELINE.lower() == 'y':
+            if RELOAD_TO_NEO.lower() == 'i':
+                delete_review_nodes_from_neo4j(sorted(removed) + sorted(new_or_changed))
+            pipeline_store, _ = get_graph_store(_on_fail_return=False)
+            if RELOAD_TO_NEO.lower() != 'i':
+                try:
+                    pipeline_store.clear(CLEAR_MODE, CLEAR_BATCH_SIZE)
+                except Exception as neo_clear_error:
+                    myStr = "\n".join([
+                        f"\nFATAL ERROR: Problem clearing neo4j before the extract and load pipeline.",
+                        f"Error message :: {neo_clear_error}",
+                        f"EXITING with error code 120",
+                        ])
+                    my_print_and_log(myStr, "error")
+                    exit(120)
+
+        ## get features chunk by chunk and stream each neo entry to the intermediate jsonl file as soon as it is built,
+        ##    so that memory use does not grow with the number of input files
+        json_path = OP_DIR + 'temp_neo_data.jsonl'
+        EXTRACT_CHECKPOINT_DIR = OP_DIR + 'extract_checkpoint'
+        extract_chunk_size = EXTRACT_CHUNK_SIZE * NLP_PROCESSES
+        time_extract_start = time.perf_counter()
         try:
-            json_path = OP_DIR + 'temp_neo_data.json'
-            with open(json_path, "w") as f:
-                json.dump(data_neo, f)
-            print(f"\nData successfully dumped to json file: {json_path}\n")
-        except Exception as neo_data_save_error:
+            with c_neo_jsonl_writer(json_path) as data_neo_file:
+                data_neo = data_neo_file
+                if not hash_inputs_first:
+                    data_neo = c_manifest_text_recorder(data_neo_file, new_manifest)
+                if LOAD_PIPELINE.lower() == 'y':
+                    data_neo = c_neo_load_pipeline(pipeline_store, NEO_BATCH_SIZE, _also_write_to=data_neo)
+                if EXTRACT_WORKERS:
+                    ## checkpointed shards are only reused for the same inputs (names and content hashes, or size and mtime
+                    ##    of files not hashed yet) and extraction settings
+                    checkpoint_context = make_feature_cache_context(nlp, flag_ner, flag_topic, flag_sentiment, _extra=f"spacy={spacy.__version__},flavors={flavor_matcher.fingerprint}")
+                    input_fingerprints = [f"{os.path.basename(fname)}\t{make_input_fingerprint(new_manifest[get_input_name(fname)])}" for fname in input_files]
+                    checkpoint_key = hashlib.sha256("\n".join([checkpoint_context] + input_fingerprints).encode('utf-8')).hexdigest()
+                    extract_features_sharded(input_files, data_neo, EXTRACT_CHECKPOINT_DIR, checkpoint_key, EXTRACT_SHARD_SIZE, EXTRACT_WORKERS, {
+                        'read_input_text': read_input_text, 'nlp': nlp, 'punctuations': punctuations, 'stopwords': stopwords,
+                        'do_ner': flag_ner, 'do_topic': flag_topic, 'do_sentiment': flag_sentiment,
+                        'nlp_batch_size': NLP_BATCH_SIZE, 'flavor_matcher': flavor_matcher,
+                        })
+                else:
+                    for chunk_start in range(0, len(input_files), extract_chunk_size):
+                        chunk_files = input_files[chunk_start : chunk_start + extract_chunk_size]
+                        chunk_texts = [read_input_text(fname) for fname in chunk_files]
+                        chunk_fnames = [os.path.basename(fname) for fname in chunk_files]
+                        if NLP_BATCH_SIZE:
+                            get_features_batch(
+                                chunk_fnames, chunk_texts, data_neo,
+                                nlp, punctuations, stopwords, flag_ner, flag_topic, flag_sentiment,
+                                _batch_size=NLP_BATCH_SIZE, _n_process=NLP_PROCESSES, _cache=feature_cache, _flavor_matcher=flavor_matcher,
+                                )
+                        else:
+                            for fname, review_text in zip(chunk_fnames, chunk_texts):
+                                #print(f"{fname}\n{review_text}\n{'----------------'}")
+                                get_features_set1(fname, review_text, data_neo, nlp, punctuations, stopwords, flag_ner, flag_topic, flag_sentiment, _cache=feature_cache, _flavor_matcher=flavor_matcher)
+                        if feature_cache is not None:
+                            feature_cache.commit()
+                        my_print_and_log(f"Extracted features for {chunk_start+len(chunk_files)} of {len(input_files)} input files", _only_log=True)
+                if LOAD_PIPELINE.lower() == 'y':
+                    idx1, idx2, idx3 = data_neo.close()
+                    my_print_and_log(f"\nUpdated Neo4j: Review rows={idx1}, Entity rows={idx2}, Flavor rows={idx3}\n\n")
+            print(f"\nData successfully dumped to jsonl file: {json_path}\n")
+        except OSError as neo_data_save_error:
             myStr = "\n".join([
-                f"\nFATAL ERROR: Problem saving data to file for Neo4j loading stage.",
+                f"\nFATAL ERROR: Problem reading input files or saving data to file for Neo4j loading stage.",
                 f"Error message :: {neo_data_save_error}",
                 f"Tried saving here =\n{json_path}",
                 f"EXITING with error code 50",
                 ])
             my_print_and_log(myStr, "error")
             exit(50)
+        except c_graph_writer_error as neo_pipeline_error:
+            myStr = "\n".join([
+                f"\nFATAL ERROR: Problem updating neo4j in the extract and load pipeline.",
+                f"Error message :: {neo_pipeline_error}",
+                f"EXITING with error code 120",
+                ])
+            my_print_and_log(myStr, "error")
+            exit(120)
+        time_extract = time.perf_counter() - time_extract_start
+        my_print_and_log(f"\nFeature extraction took {time_extract:.2f} secs :: {len(input_files)/max(time_extract, 1e-9):.1f} docs/sec\n")
+        if feature_cache is not None:
+            feature_cache.close()
+        if INPUT_FORMAT == 'shards':
+            corpus_reader.close()
         
-        # load the files to neo4j from intermediate json file just created
-        load_neo4j_from_json(_data_file=json_path, _clear_graph=True)
+        # load the files to neo4j from intermediate jsonl file just created - already done if the pipeline was used
+        if LOAD_PIPELINE.lower() == 'y':
+            pass
+        elif RELOAD_TO_NEO.lower() == 'i':
+            ## changed reviews are deleted and loaded again, removed ones are only deleted
+            delete_review_nodes_from_neo4j(sorted(removed) + sorted(new_or_changed))
+            if input_files:
+                load_neo4j_from_json(_data_file=json_path, _clear_graph=False, _batch_size=NEO_BATCH_SIZE)
+        else:
+            load_neo4j_from_json(_data_file=json_path, _clear_graph=True, _batch_size=NEO_BATCH_SIZE,
+                _clear_mode=CLEAR_MODE, _clear_batch_size=CLEAR_BATCH_SIZE)
+        ## only saved once the graph is updated, so a failed run is fully redone next time
+        save_manifest(manifest_path, new_manifest)
+        my_print_and_log(f"\nSaved input manifest with {len(new_manifest)} entries: {manifest_path}\n")
+        ## the extraction checkpoint is only kept to resume a failed run
+        if os.path.exists(EXTRACT_CHECKPOINT_DIR):
+            shutil.rmtree(EXTRACT_CHECKPOINT_DIR)
     else:
         my_print_and_log(f"\nNo reloading to Neo required.\n\n")
 
+    ## the statistics are maintained by every load, rebuilding only checks them against the graph
+    if REBUILD_STATS.lower() == 'y':
+        rebuild_graph_stats()
+
     my_print_and_log(f"\nStarting GUI logic...\n")
-    run_gui(nlp, punctuations, stopwords, flag_ner, flag_topic, flag_sentiment, OP_DIR)
+    run_gui(nlp, punctuations, stopwords, flag_ner, flag_topic, flag_sentiment, OP_DIR, flavor_matcher)
 
+    log_neo4j_transaction_stats()
+    stage_profiler.log_summary()
+    stage_profiler.close()
     my_print_and_log(f"\n\n\tDone\n")
 
 if __name__ == "__main__":
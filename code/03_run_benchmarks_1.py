@@ -0,0 +1,405 @@
+## -------------------------------------------------------------------------------------------------------------------------------------------------
+## Goal: End-to-end benchmark suite. Generates synthetic wine reviews at the requested scales and measures every stage of the
+##       pipeline separately, so that the effect of a change can be compared between runs.
+## -------------------------------------------------------------------------------------------------------------------------------------------------
+## General logic flow, for every scale (number of reviews):
+## 1) Synthetic reviews generated from a bigram model of the bundled 'inData' reviews (utils/util_synthetic_reviews_1.py)
+##    and written to a CSV with the same 'description' column as the kaggle dataset.
+## 2) CSV split    :: write_review_files_streaming of 01_create_data_1.py into review files or corpus shards.
+## 3) Extraction   :: get_features_set1 of 02_load_neo_show_gui_3.py over a sample of the reviews, docs/sec.
+##                   Extracting a million reviews takes hours, so only the sample is extracted (all with extractSample 0).
+## 4) JSON write/read :: the neo entries for every review written to and read back from the jsonl intermediate file.
+##                   Entries beyond the extracted sample reuse the sample's features under new review names.
+## 5) Graph load   :: load_neo4j_from_json of the jsonl file into the selected graph store, rows/sec.
+## 6) Queries      :: Query 1, 2 and 3 run repeatedly with random inputs, latency p50/p95/p99 in milliseconds.
+##                   Query 2 and 3 are also run on the in-process review snapshot and flavor index used by the GUI.
+## Results of all scales are written as one JSON file to 'outData/benchmarks'. Log file is saved to the folder 'tempDir'.
+## -------------------------------------------------------------------------------------------------------------------------------------------------
+## Command line arguments:
+##    Compulsory:
+##    1) None
+##    Optional:
+##    1) scales :: comma separated numbers of reviews to benchmark, e.g. 1000,10000,130000,1000000
+##                       default value=1000,10000
+##    2) graphBackend :: graph store to load and query: memory = in-process store, neo4j = the database.
+##                       NOTE: with neo4j the graph is CLEARED before every load.
+##                       default value=memory
+##    3) extractSample :: number of reviews run through feature extraction at each scale, 0 means all of them
+##                       default value=2000
+##    4) splitFormat :: files = one .txt file per review, shards = packed corpus shards
+##                       default value=files
+##    5) nlpProfile :: spacy components used for extraction, as for 02_load_neo_show_gui_3.py
+##                       default value=full
+##    6) spacyModel :: spacy model used for extraction
+##                       default value=en_core_web_sm
+##    7) neoBatchSize :: number of entries per load transaction, 0 means one transaction per entry
+##                       default value=500
+##    8) queryRepeats :: number of times each query is run to get the latency percentiles
+##                       default value=200
+##    9) seed :: random seed for the synthetic reviews and query inputs
+##                       default value=0
+## Examples of running the script:
+##    python3 03_run_benchmarks_1.py -scales 1000,10000
+##    python3 03_run_benchmarks_1.py -scales 130000,1000000 -splitFormat shards -extractSample 5000
+## -------------------------------------------------------------------------------------------------------------------------------------------------
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import string
+import logging
+import argparse
+import platform
+import importlib
+import subprocess
+from datetime import datetime
+
+## custom packages
+from utils.util_functions_1 import my_print_and_log
+from utils.util_synthetic_reviews_1 import c_synthetic_review_generator, write_synthetic_csv
+from utils.util_corpus_shards_1 import c_corpus_shard_writer
+from utils.util_neo_data_io_1 import c_neo_jsonl_writer, iter_neo_entries
+from utils.util_graph_store_1 import GRAPH_BACKENDS, get_graph_store, set_graph_backend
+from utils.util_review_snapshot_1 import c_review_snapshot
+from utils.util_flavor_index_1 import c_flavor_index
+from utils.util_nlp_profiles_1 import NLP_PROFILES, load_nlp_for_profile, get_profile_flags
+
+## the pipeline scripts start with a number, so they are imported by name
+create_data = importlib.import_module('01_create_data_1')
+load_neo_show_gui = importlib.import_module('02_load_neo_show_gui_3')
+
+def get_percentiles(_samples_secs):
+    """
+    Goal: Latency percentiles by the nearest rank method
+    Accepts: list of latencies in seconds
+    Return: dict of p50, p95, p99, mean and max in milliseconds
+    """
+    samples = sorted(_samples_secs)
+    if not samples:
+        return dict()
+    def nearest_rank(_pct):
+        return samples[max(0, math.ceil(_pct / 100.0 * len(samples)) - 1)] * 1000.0
+    return {
+        'p50_ms': nearest_rank(50),
+        'p95_ms': nearest_rank(95),
+        'p99_ms': nearest_rank(99),
+        'mean_ms': 1000.0 * sum(samples) / len(samples),
+        'max_ms': samples[-1] * 1000.0,
+        'count': len(samples),
+    }
+
+def get_git_commit():
+    """
+    Goal: Commit of the code being benchmarked, so results can be matched to changes
+    Accepts: Nothing
+    Return: commit hash or None if not in a git checkout
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except Exception:
+        return None
+
+def bench_csv_split(_csv_path, _num_reviews, _scale_dir, _split_format):
+    """
+    Goal: Time the CSV split of 01_create_data_1.py
+    Accepts: synthetic CSV path, number of rows, folder for this scale, files or shards
+    Return: dict of stage results
+    """
+    op_dir = os.path.join(_scale_dir, 'inData') + r'/'
+    op_dir_extra = os.path.join(_scale_dir, 'inDataExtra') + r'/'
+    for folder in [op_dir, op_dir_extra]:
+        os.makedirs(folder, exist_ok=True)
+    time_start = time.perf_counter()
+    if _split_format == 'shards':
+        with c_corpus_shard_writer(os.path.join(_scale_dir, 'inCorpus')) as corpus_writer:
+            cnt_op_dir, cnt_op_dir_extra = create_data.write_review_files_streaming(
+                _csv_path, _num_reviews, op_dir, op_dir_extra, 10000, _write_files=False, _corpus_writer=corpus_writer)
+    else:
+        cnt_op_dir, cnt_op_dir_extra = create_data.write_review_files_streaming(
+            _csv_path, _num_reviews, op_dir, op_dir_extra, 10000)
+    secs = time.perf_counter() - time_start
+    return {
+        'format': _split_format,
+        'rows': cnt_op_dir + cnt_op_dir_extra,
+        'secs': secs,
+        'rows_per_sec': (cnt_op_dir + cnt_op_dir_extra) / max(secs, 1e-9),
+    }
+
+def bench_extraction(_texts, _nlp, _flag_ner, _flag_sentiment):
+    """
+    Goal: Time get_features_set1 one document at a time, as used by the GUI uploads and the unbatched reload
+    Accepts: review texts, nlp object, ner and sentiment flags
+    Return: dict of stage results, list of the neo entries extracted
+    """
+    punctuations = string.punctuation
+    stopwords = frozenset(load_neo_show_gui.STOP_WORDS)
+    sample_neo = list()
+    time_start = time.perf_counter()
+    for idx, text in enumerate(_texts):
+        load_neo_show_gui.get_features_set1(f"s{idx:07d}.txt", text, sample_neo, _nlp, punctuations, stopwords,
+            _flag_ner, False, _flag_sentiment)
+    secs = time.perf_counter() - time_start
+    return {
+        'docs': len(_texts),
+        'secs': secs,
+        'docs_per_sec': len(_texts) / max(secs, 1e-9),
+    }, sample_neo
+
+def iter_scaled_entries(_sample_neo, _num_reviews):
+    """
+    Goal: Neo entries for every review at the scale, cycling through the extracted sample under new review names
+    Accepts: extracted sample entries, number of entries wanted
+    Return: generator of neo entries
+    """
+    for idx in range(_num_reviews):
+        neo_entry = dict(_sample_neo[idx % len(_sample_neo)])
+        neo_entry['Review'] = dict(neo_entry['Review'], name='f' + str(idx + 1).zfill(7))
+        yield neo_entry
+
+def bench_json_io(_sample_neo, _num_reviews, _json_path):
+    """
+    Goal: Time writing and reading back the jsonl intermediate file
+    Accepts: extracted sample entries, number of entries, jsonl file path
+    Return: dict of stage results
+    """
+    time_start = time.perf_counter()
+    with c_neo_jsonl_writer(_json_path) as writer:
+        writer.extend(iter_scaled_entries(_sample_neo, _num_reviews))
+    secs_write = time.perf_counter() - time_start
+    file_mb = os.path.getsize(_json_path) / (1024 * 1024)
+    time_start = time.perf_counter()
+    cnt_read = sum(1 for _ in iter_neo_entries(_json_path))
+    secs_read = time.perf_counter() - time_start
+    return {
+        'entries': cnt_read,
+        'file_mb': file_mb,
+        'write_secs': secs_write,
+        'write_entries_per_sec': _num_reviews / max(secs_write, 1e-9),
+        'write_mb_per_sec': file_mb / max(secs_write, 1e-9),
+        'read_secs': secs_read,
+        'read_entries_per_sec': cnt_read / max(secs_read, 1e-9),
+        'read_mb_per_sec': file_mb / max(secs_read, 1e-9),
+    }
+
+def bench_graph_load(_json_path, _num_reviews, _batch_size):
+    """
+    Goal: Time load_neo4j_from_json into the selected graph store, after clearing it
+    Accepts: jsonl file path, number of entries in it, number of entries per transaction
+    Return: dict of stage results
+    """
+    time_start = time.perf_counter()
+    load_neo_show_gui.load_neo4j_from_json(_data_file=_json_path, _clear_graph=True, _batch_size=_batch_size)
+    secs = time.perf_counter() - time_start
+    return {
+        'entries': _num_reviews,
+        'batch_size': _batch_size,
+        'secs': secs,
+        'rows_per_sec': _num_reviews / max(secs, 1e-9),
+    }
+
+def bench_queries(_flavor_names, _repeats, _rng):
+    """
+    Goal: Latency of the three GUI queries run with random inputs through the graph store, and of Query 2 and 3 answered from
+          the review snapshot and flavor index the GUI uses (the time to read them from the store is reported separately)
+    Accepts: flavor names to pick from for Query 3, number of runs of each query, random generator
+    Return: dict of query name -> latency percentiles
+    """
+    store, _ = get_graph_store(_on_fail_return=False)
+    review_snapshot = c_review_snapshot()
+    time_start = time.perf_counter()
+    review_snapshot.load_from_store(store)
+    secs_snapshot_load = time.perf_counter() - time_start
+    flavor_index = c_flavor_index()
+    time_start = time.perf_counter()
+    flavor_index.load_from_store(store)
+    secs_flavor_index_load = time.perf_counter() - time_start
+    queries = {
+        'query_1': lambda: store.count_nodes(_rng.choice(['Review', 'Entity', 'Flavor'])),
+        'query_2': lambda: store.count_reviews_min_words_senti(_rng.randint(10, 60), round(_rng.uniform(-0.2, 0.5), 2)),
+        'query_2_snapshot': lambda: review_snapshot.count_min_words_senti(_rng.randint(10, 60), round(_rng.uniform(-0.2, 0.5), 2)),
+        'query_3': lambda: store.get_flavor_review_pairs(_rng.sample(_flavor_names, _rng.randint(1, min(3, len(_flavor_names))))),
+        'query_3_index': lambda: flavor_index.get_review_names(flavor_index.match(_any_flavors=_rng.sample(_flavor_names, _rng.randint(1, min(3, len(_flavor_names)))))),
+    }
+    results = dict()
+    for query_name, run_query in queries.items():
+        latencies = list()
+        for _ in range(_repeats):
+            time_start = time.perf_counter()
+            run_query()
+            latencies.append(time.perf_counter() - time_start)
+        results[query_name] = get_percentiles(latencies)
+    results['query_2_snapshot']['load_secs'] = secs_snapshot_load
+    results['query_3_index']['load_secs'] = secs_flavor_index_load
+    return results
+
+def run_scale(_num_reviews, _generator, _nlp, _args, _flag_ner, _flag_sentiment, _bench_dir, _rng):
+    """
+    Goal: Run every stage for one scale
+    Accepts: number of reviews, synthetic review generator, nlp object, parsed arguments, ner and sentiment flags,
+             benchmark work folder, random generator for the query inputs
+    Return: dict of stage name -> stage results
+    """
+    scale_dir = os.path.join(_bench_dir, f"scale_{_num_reviews}")
+    if os.path.exists(scale_dir):
+        shutil.rmtree(scale_dir)
+    os.makedirs(scale_dir)
+    results = {'num_reviews': _num_reviews}
+
+    my_print_and_log(f"\n[{_num_reviews}] Generating synthetic reviews...\n")
+    csv_path = os.path.join(scale_dir, 'synthetic_reviews.csv')
+    time_start = time.perf_counter()
+    write_synthetic_csv(csv_path, _num_reviews, _generator)
+    results['generate'] = {'secs': time.perf_counter() - time_start, 'csv_mb': os.path.getsize(csv_path) / (1024 * 1024)}
+
+    my_print_and_log(f"\n[{_num_reviews}] CSV split...\n")
+    results['csv_split'] = bench_csv_split(csv_path, _num_reviews, scale_dir, _args.split_format)
+
+    my_print_and_log(f"\n[{_num_reviews}] Feature extraction...\n")
+    num_sample = _num_reviews if _args.extract_sample == 0 else min(_args.extract_sample, _num_reviews)
+    sample_texts = list(_generator.iter_reviews(num_sample))
+    results['extraction'], sample_neo = bench_extraction(sample_texts, _nlp, _flag_ner, _flag_sentiment)
+
+    my_print_and_log(f"\n[{_num_reviews}] JSON write and read...\n")
+    json_path = os.path.join(scale_dir, 'temp_neo_data.jsonl')
+    results['json_io'] = bench_json_io(sample_neo, _num_reviews, json_path)
+
+    my_print_and_log(f"\n[{_num_reviews}] Graph load...\n")
+    results['graph_load'] = bench_graph_load(json_path, _num_reviews, _args.neo_load_batch_size)
+
+    my_print_and_log(f"\n[{_num_reviews}] Queries...\n")
+    flavor_names = sorted({flav for neo_entry in sample_neo for flav in neo_entry['Flavors']}) or ['cherry']
+    results['queries'] = bench_queries(flavor_names, _args.query_repeats, _rng)
+
+    ## the generated data is only needed during the run
+    shutil.rmtree(scale_dir)
+    return results
+
+def main():
+    HOME = os.path.dirname(os.path.abspath(__file__))
+    IP_DIR = os.path.join(HOME, 'inData') ## bundled reviews the synthetic reviews are modelled on
+    OP_DIR = os.path.join(HOME, 'outData', 'benchmarks') + r'/'
+    TEMP_DIR = os.path.join(HOME, 'tempDir') + r'/'
+    for folder in [OP_DIR, TEMP_DIR]:
+        os.makedirs(folder, exist_ok=True)
+
+    ## setup logging file -   levels are DEBUG , INFO , WARNING , ERROR , CRITICAL
+    logging.basicConfig(level=logging.INFO, filename=TEMP_DIR + 'LOG_run_benchmarks.log',                       \
+        filemode='w', format='LOG_LEVEL %(levelname)s : %(asctime)s :: %(message)s')
+
+    ## setup cla
+    argparser = argparse.ArgumentParser(
+        description='Benchmark every stage of the pipeline on synthetic reviews.')
+    argparser.add_argument(
+        '-scales',
+        '--scales',
+        default='1000,10000',
+        help='Comma separated numbers of reviews to benchmark, e.g. 1000,10000,130000,1000000.')
+    argparser.add_argument(
+        '-graphBackend',
+        '--graph_backend',
+        default='memory',
+        choices=GRAPH_BACKENDS,
+        help='Graph store to load and query. NOTE: with neo4j the graph is cleared before every load.')
+    argparser.add_argument(
+        '-extractSample',
+        '--extract_sample',
+        type=int,
+        default=2000,
+        help='Number of reviews run through feature extraction at each scale, 0 for all.')
+    argparser.add_argument(
+        '-splitFormat',
+        '--split_format',
+        default='files',
+        choices=['files', 'shards'],
+        help='Write the split reviews as one file each or as packed corpus shards.')
+    argparser.add_argument(
+        '-nlpProfile',
+        '--nlp_profile',
+        default='full',
+        choices=NLP_PROFILES,
+        help='Spacy components used for extraction.')
+    argparser.add_argument(
+        '-spacyModel',
+        '--spacy_model',
+        default='en_core_web_sm',
+        help='Spacy model used for extraction.')
+    argparser.add_argument(
+        '-neoBatchSize',
+        '--neo_load_batch_size',
+        type=int,
+        default=500,
+        help='Number of entries per load transaction, 0 for one transaction per entry.')
+    argparser.add_argument(
+        '-queryRepeats',
+        '--query_repeats',
+        type=int,
+        default=200,
+        help='Number of runs of each query for the latency percentiles.')
+    argparser.add_argument(
+        '-seed',
+        '--seed',
+        type=int,
+        default=0,
+        help='Random seed for the synthetic reviews and query inputs.')
+    args = argparser.parse_args()
+
+    try:
+        scales = [int(scale) for scale in args.scales.split(',')]
+        if not scales or min(scales) < 1 or args.extract_sample < 0 or args.query_repeats < 1 or args.neo_load_batch_size < 0:
+            raise ValueError("scales and queryRepeats must be positive, extractSample and neoBatchSize 0 or more")
+    except ValueError as bench_args_error:
+        myStr = "\n".join([
+            f"\nFATAL ERROR: Invalid benchmark parameters:: {bench_args_error}",
+            f"EXITING with error code 20\n",
+            ])
+        my_print_and_log(myStr, "error")
+        exit(20)
+    if args.graph_backend == 'neo4j':
+        my_print_and_log(f"\nWARNING: Benchmarking against Neo4j, the graph will be cleared before every load.\n", "warning")
+
+    set_graph_backend(args.graph_backend)
+    flag_ner, flag_sentiment = get_profile_flags(args.nlp_profile, True, True)
+    nlp = load_nlp_for_profile(args.spacy_model, args.nlp_profile, flag_ner, flag_sentiment)
+    generator = c_synthetic_review_generator.from_folder(IP_DIR, _seed=args.seed)
+    rng = random.Random(args.seed)
+
+    results = {
+        'started': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': get_git_commit(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'spacy_version': load_neo_show_gui.spacy.__version__,
+        'settings': vars(args),
+        'pipe_names': nlp.pipe_names,
+        'scales': list(),
+    }
+    for num_reviews in scales:
+        scale_results = run_scale(num_reviews, generator, nlp, args, flag_ner, flag_sentiment, OP_DIR + 'work', rng)
+        results['scales'].append(scale_results)
+        myStr = "\n".join([
+            f"\nScale {num_reviews} reviews:",
+            f"  csv split   : {scale_results['csv_split']['rows_per_sec']:.1f} rows/sec",
+            f"  extraction  : {scale_results['extraction']['docs_per_sec']:.1f} docs/sec ({scale_results['extraction']['docs']} docs)",
+            f"  json write  : {scale_results['json_io']['write_entries_per_sec']:.1f} entries/sec, read: {scale_results['json_io']['read_entries_per_sec']:.1f} entries/sec",
+            f"  graph load  : {scale_results['graph_load']['rows_per_sec']:.1f} rows/sec ({args.graph_backend})",
+            ] + [
+            f"  {query_name:<11} : p50={lat['p50_ms']:.3f} ms, p95={lat['p95_ms']:.3f} ms, p99={lat['p99_ms']:.3f} ms"
+                for query_name, lat in scale_results['queries'].items()
+            ])
+        my_print_and_log(myStr)
+        ## saved after every scale so that the results of the finished scales survive a failure at a larger one
+        results_path = OP_DIR + f"bench_{results['started'].replace(':', '')}.json"
+        with open(results_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if os.path.exists(OP_DIR + 'work'):
+        shutil.rmtree(OP_DIR + 'work')
+    my_print_and_log(f"\nBenchmark results saved to: {results_path}\n\n\tDone\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+## Check of the shipped flavor lexicon, run from the code folder with either of:
+##    python3 test_flavor_lexicon.py
+##    python3 -m pytest test_flavor_lexicon.py
+
+import os
+
+from utils.util_flavor_matcher_1 import c_flavor_matcher
+
+FLAVOR_LEXICON_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'flavor_lexicon.txt')
+
+def test_shipped_lexicon_matches_multi_word_flavors():
+    flavor_matcher = c_flavor_matcher.from_file(FLAVOR_LEXICON_FILE)
+    ## processed text is lowercased and lemmatized without stop words
+    words = "ripe black cherry green apple cherry hint citrus zest finish".split()
+    assert flavor_matcher.find_flavors(words) == ['black cherry', 'green apple', 'cherry', 'citrus zest']
+
+def main():
+    test_shipped_lexicon_matches_multi_word_flavors()
+    print(f"\nShipped flavor lexicon matches multi-word flavors....OK\n")
+
+if __name__ == '__main__':
+    main()
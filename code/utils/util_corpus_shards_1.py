@@ -0,0 +1,154 @@
+## -------------------------------------------------------------------------------------------------------------------------------------------------
+## Packed corpus format: instead of one small .txt file per review, the review texts are appended to a few large shard files
+##    and a compact offset index records where each review is. Shards are read through mmap.
+## Folder layout:
+##    shard_00000.bin, shard_00001.bin, ... :: utf-8 review texts written back to back
+##    index.tsv                             :: one line per review: name <tab> shard number <tab> byte offset <tab> byte length
+## Converter from an existing folder of .txt files:
+##    python3 -m utils.util_corpus_shards_1 -inDir ./inData -outDir ./inCorpus
+## -------------------------------------------------------------------------------------------------------------------------------------------------
+
+import argparse
+import glob
+import mmap
+import os
+
+CORPUS_INDEX_FILE = 'index.tsv'
+CORPUS_INDEX_HEADER = '#corpus_shards_v1'
+
+class c_corpus_shard_writer:
+    """
+    Append review texts to shard files, starting a new shard once the current one reaches the size limit.
+    The index is written on close.
+    """
+    def __init__(self, _out_dir, _shard_max_bytes=64*1024*1024):
+        self.out_dir = _out_dir
+        self.shard_max_bytes = _shard_max_bytes
+        self.index = list()
+        self.shard_no = -1
+        self.shard_f = None
+        self.shard_offset = 0
+        os.makedirs(self.out_dir, exist_ok=True)
+        ## remove any earlier shards so that a smaller corpus does not leave stale shards behind
+        for existing_f in glob.glob(os.path.join(self.out_dir, 'shard_*.bin')):
+            os.remove(existing_f)
+
+    def open_next_shard(self):
+        if self.shard_f is not None:
+            self.shard_f.close()
+        self.shard_no += 1
+        self.shard_offset = 0
+        self.shard_f = open(os.path.join(self.out_dir, f"shard_{self.shard_no:05d}.bin"), 'wb', buffering=1024*1024)
+
+    def add(self, _name, _text):
+        data = _text.encode('utf-8')
+        if self.shard_f is None or (self.shard_offset > 0 and self.shard_offset + len(data) > self.shard_max_bytes):
+            self.open_next_shard()
+        self.shard_f.write(data)
+        self.index.append((_name, self.shard_no, self.shard_offset, len(data)))
+        self.shard_offset += len(data)
+
+    def close(self):
+        if self.shard_f is not None:
+            self.shard_f.close()
+            self.shard_f = None
+        with open(os.path.join(self.out_dir, CORPUS_INDEX_FILE), 'w', encoding='utf-8') as f:
+            f.write(CORPUS_INDEX_HEADER + "\n")
+            for name, shard_no, offset, length in self.index:
+                f.write(f"{name}\t{shard_no}\t{offset}\t{length}\n")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+class c_corpus_shard_reader:
+    """
+    Read review texts from a packed corpus folder.
+    Supports random access by review name with get, and a sequential scan in index order by iterating.
+    """
+    def __init__(self, _in_dir):
+        self.in_dir = _in_dir
+        self.index = dict()
+        self.order = list()
+        self.shards = dict()
+        with open(os.path.join(self.in_dir, CORPUS_INDEX_FILE), 'r', encoding='utf-8') as f:
+            header = f.readline().strip()
+            if header != CORPUS_INDEX_HEADER:
+                raise ValueError(f"Not a corpus index file, unexpected header: {header}")
+            for line in f:
+                name, shard_no, offset, length = line.rstrip("\n").split("\t")
+                self.index[name] = (int(shard_no), int(offset), int(length))
+                self.order.append(name)
+
+    def get_shard(self, _shard_no):
+        if _shard_no not in self.shards:
+            with open(os.path.join(self.in_dir, f"shard_{_shard_no:05d}.bin"), 'rb') as f:
+                ## mmap keeps its own handle so the file can be closed straight away
+                self.shards[_shard_no] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.shards[_shard_no]
+
+    def get(self, _name):
+        shard_no, offset, length = self.index[_name]
+        if length == 0:
+            return ""
+        return self.get_shard(shard_no)[offset : offset + length].decode('utf-8')
+
+    def names(self):
+        return list(self.order)
+
+    def __len__(self):
+        return len(self.order)
+
+    def __contains__(self, _name):
+        return _name in self.index
+
+    def __iter__(self):
+        for name in self.order:
+            yield name, self.get(name)
+
+    def close(self):
+        for shard in self.shards.values():
+            shard.close()
+        self.shards = dict()
+
+def convert_folder_to_corpus(_in_dir, _out_dir, _pattern='f*.txt', _shard_max_bytes=64*1024*1024):
+    """
+    Pack every matching .txt file in the input folder into a corpus folder. Reviews are named after the files without extension.
+    Returns:
+        Number of reviews packed
+    """
+    in_files = sorted(glob.glob(os.path.join(_in_dir, _pattern)))
+    with c_corpus_shard_writer(_out_dir, _shard_max_bytes) as writer:
+        for fname in in_files:
+            with open(fname, 'r') as f:
+                writer.add(os.path.basename(fname).split('.')[0], f.read())
+    return len(in_files)
+
+def main():
+    argparser = argparse.ArgumentParser(
+        description='Pack a folder of review .txt files into the corpus shard format.')
+    argparser.add_argument(
+        '-inDir',
+        '--input_folder',
+        required=True,
+        help='Folder with the review .txt files e.g. ./inData')
+    argparser.add_argument(
+        '-outDir',
+        '--output_folder',
+        required=True,
+        help='Folder to write the shards and index to e.g. ./inCorpus')
+    argparser.add_argument(
+        '-shardMaxMB',
+        '--shard_max_mb',
+        type=int,
+        default=64,
+        help='Size limit of one shard file in MB.')
+    args = argparser.parse_args()
+    cnt = convert_folder_to_corpus(args.input_folder, args.output_folder, _shard_max_bytes=args.shard_max_mb*1024*1024)
+    print(f"\nPacked {cnt} reviews from {args.input_folder} into {args.output_folder}\n")
+
+if __name__ == "__main__":
+    main()
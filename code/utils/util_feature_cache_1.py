@@ -0,0 +1,111 @@
+import hashlib
+import json
+import sqlite3
+import time
+
+from utils.util_functions_1 import my_print_and_log
+
+class c_feature_cache:
+    """
+    Persistent on-disk cache of extracted features, stored in a SQLite file.
+    Keyed by a hash of the review text plus a context string describing how the features were extracted
+    (spacy model name/version, extraction flags) so that any change there gives new keys.
+    The review node name is not part of the cached entry, it is set by the caller on every hit.
+    Least recently used entries are evicted as soon as the total size of cached entries goes above the limit, the total
+    is kept in memory so that every put can check it. The caller commits after each chunk of work (see commit).
+    """
+    def __init__(self, _db_path, _key_context, _max_bytes=512*1024*1024):
+        self.db_path = _db_path
+        self.key_context = _key_context
+        self.max_bytes = _max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute(r'CREATE TABLE IF NOT EXISTS feature_cache (key TEXT PRIMARY KEY, entry TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)')
+        self.conn.execute(r'CREATE INDEX IF NOT EXISTS feature_cache_last_used ON feature_cache (last_used)')
+        self.conn.commit()
+        self.total_bytes = self.conn.execute(r'SELECT COALESCE(SUM(size), 0) FROM feature_cache').fetchone()[0]
+
+    def make_key(self, _text):
+        return hashlib.sha256("\x00".join([self.key_context, _text]).encode('utf-8')).hexdigest()
+
+    def get(self, _text, _node_name):
+        """
+        Return the cached neo entry for the text with its review name set to the node name, or None on a miss.
+        """
+        key = self.make_key(_text)
+        row = self.conn.execute(r'SELECT entry FROM feature_cache WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.conn.execute(r'UPDATE feature_cache SET last_used = ? WHERE key = ?', (time.time(), key))
+        neo_entry = json.loads(row[0])
+        neo_entry['Review']['name'] = _node_name
+        return neo_entry
+
+    def put(self, _text, _neo_entry):
+        node_name = _neo_entry['Review']['name']
+        _neo_entry['Review']['name'] = None
+        try:
+            entry = json.dumps(_neo_entry)
+        finally:
+            _neo_entry['Review']['name'] = node_name
+        key = self.make_key(_text)
+        row = self.conn.execute(r'SELECT size FROM feature_cache WHERE key = ?', (key,)).fetchone()
+        self.conn.execute(r'INSERT OR REPLACE INTO feature_cache (key, entry, size, last_used) VALUES (?, ?, ?, ?)',
+            (key, entry, len(entry), time.time()))
+        self.total_bytes += len(entry) - (row[0] if row is not None else 0)
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def commit(self):
+        """
+        Make the entries and last used times written since the last commit durable - called once per extraction chunk,
+        so a run that ends early keeps all but the last chunk.
+        """
+        self.conn.commit()
+
+    def evict(self):
+        """
+        Delete least recently used entries until the total size is within the limit.
+        """
+        if self.total_bytes <= self.max_bytes:
+            return
+        to_free = self.total_bytes - self.max_bytes
+        freed = 0
+        evict_keys = list()
+        for key, size in self.conn.execute(r'SELECT key, size FROM feature_cache ORDER BY last_used ASC'):
+            if freed >= to_free:
+                break
+            evict_keys.append((key,))
+            freed += size
+        self.conn.executemany(r'DELETE FROM feature_cache WHERE key = ?', evict_keys)
+        self.total_bytes -= freed
+        self.evictions += len(evict_keys)
+        my_print_and_log(f"Feature cache evicted {len(evict_keys)} entries to free {freed} bytes", _only_log=True)
+
+    def log_stats(self):
+        lookups = self.hits + self.misses
+        hit_rate = (100.0 * self.hits / lookups) if lookups else 0.0
+        my_print_and_log(f"\nFeature cache :: hits={self.hits}, misses={self.misses}, hit rate={hit_rate:.1f}%, evictions={self.evictions}, file={self.db_path}\n")
+
+    def close(self):
+        self.evict()
+        self.commit()
+        self.log_stats()
+        self.conn.close()
+
+def make_feature_cache_context(_nlp, _do_ner, _do_topic, _do_sentiment, _extra=""):
+    """
+    Build the string describing how features are extracted, used as part of every cache key.
+    """
+    return "|".join([
+        f"{_nlp.meta.get('lang')}_{_nlp.meta.get('name')}-{_nlp.meta.get('version')}",
+        ",".join(_nlp.pipe_names),
+        f"ner={_do_ner}",
+        f"topic={_do_topic}",
+        f"sentiment={_do_sentiment}",
+        _extra,
+        ])
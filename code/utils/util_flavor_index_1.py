@@ -0,0 +1,108 @@
+## -------------------------------------------------------------------------------------------------------------------------------------------------
+## Inverted index of flavor -> reviews for Query 3, held in process.
+##    Every review gets a small integer id, and every flavor a bitmap of the ids of its reviews (a Python int used as a bit set).
+##    ALL, ANY and NOT combinations of flavors are then a few AND, OR and AND NOT operations on the bitmaps, and the exact
+##    count of a result is a population count, so no (flavor, review) rows are read or sent to get it.
+##    Review names are only decoded from the result bitmap when they are wanted.
+##    Read once from the graph store (see get_review_flavors) and then kept in step with the uploads through add_review.
+## -------------------------------------------------------------------------------------------------------------------------------------------------
+
+import threading
+
+import numpy as np
+
+def popcount(_bitmap):
+    return bin(_bitmap).count('1')
+
+class c_flavor_index:
+    """
+    Flavor -> bitmap of review ids, with a bitmap of all reviews for NOT-only queries.
+    Adding a review ORs its bit into the bitmaps of its flavors, so it is idempotent and the order of the initial read from
+    the graph and the uploads made while it runs does not matter. Ids of removed reviews are not reused.
+    Safe to use from the GUI worker threads, every operation holds the index lock.
+    """
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.ready = False
+        self.review_ids = dict() # review name -> id
+        self.review_names = list() # id -> review name, None once removed
+        self.all_reviews = 0
+        self.flavor_bitmaps = dict() # flavor name -> bitmap of review ids
+
+    def __len__(self):
+        return len(self.review_ids)
+
+    def add_review(self, _rev_name, _flavor_names):
+        with self.lock:
+            rev_id = self.review_ids.get(_rev_name)
+            if rev_id is None:
+                rev_id = len(self.review_names)
+                self.review_ids[_rev_name] = rev_id
+                self.review_names.append(_rev_name)
+            rev_bit = 1 << rev_id
+            self.all_reviews |= rev_bit
+            for flav_name in _flavor_names:
+                self.flavor_bitmaps[flav_name] = self.flavor_bitmaps.get(flav_name, 0) | rev_bit
+
+    def remove_reviews(self, _rev_names):
+        with self.lock:
+            removed = 0
+            for rev_name in _rev_names:
+                rev_id = self.review_ids.pop(rev_name, None)
+                if rev_id is not None:
+                    self.review_names[rev_id] = None
+                    removed |= 1 << rev_id
+            if not removed:
+                return
+            self.all_reviews &= ~removed
+            for flav_name in list(self.flavor_bitmaps):
+                self.flavor_bitmaps[flav_name] &= ~removed
+                if not self.flavor_bitmaps[flav_name]:
+                    del self.flavor_bitmaps[flav_name]
+
+    def load_from_store(self, _store):
+        """
+        Read the flavors of every Review node from the graph store and mark the index ready.
+        Returns:
+            number of reviews read
+        """
+        review_flavors = _store.get_review_flavors()
+        for rev_name, flavor_names in review_flavors:
+            self.add_review(rev_name, flavor_names)
+        self.ready = True
+        return len(review_flavors)
+
+    def match(self, _all_flavors=(), _any_flavors=(), _not_flavors=()):
+        """
+        Bitmap of the reviews that have every flavor of all, at least one flavor of any (if given) and no flavor of not.
+        With only not flavors given, the reviews without any of them.
+        """
+        with self.lock:
+            bitmap = self.all_reviews
+            for flav_name in _all_flavors:
+                bitmap &= self.flavor_bitmaps.get(flav_name, 0)
+            if _any_flavors:
+                any_bitmap = 0
+                for flav_name in _any_flavors:
+                    any_bitmap |= self.flavor_bitmaps.get(flav_name, 0)
+                bitmap &= any_bitmap
+            for flav_name in _not_flavors:
+                bitmap &= ~self.flavor_bitmaps.get(flav_name, 0)
+            return bitmap
+
+    def count(self, _all_flavors=(), _any_flavors=(), _not_flavors=()):
+        """
+        Exact number of reviews matching, see match.
+        """
+        return popcount(self.match(_all_flavors, _any_flavors, _not_flavors))
+
+    def get_review_names(self, _bitmap):
+        """
+        Returns:
+            names of the reviews in the bitmap, in id order
+        """
+        if not _bitmap:
+            return list()
+        bits = np.unpackbits(np.frombuffer(_bitmap.to_bytes((_bitmap.bit_length() + 7) // 8, 'little'), dtype=np.uint8), bitorder='little')
+        with self.lock:
+            return [self.review_names[rev_id] for rev_id in np.flatnonzero(bits)]
@@ -0,0 +1,57 @@
+import hashlib
+
+class c_flavor_matcher:
+    """
+    Flavor lexicon compiled once into hashed lookups, used to find flavor names in the processed review text.
+    Single word flavors are found with one set lookup per word. Multi-word flavors (e.g. "black cherry") are indexed by
+    their first word, so only the phrases starting with the current word are compared. The longest phrase wins and its
+    words are not matched again, so "black cherry" does not also give "cherry".
+    Entries are compared with the processed text, so they should be written lowercased and lemmatized
+    without stop words, e.g. "forest floor", "black cherry".
+    """
+    def __init__(self, _flavor_names):
+        self.flavor_names = list()
+        self.single_words = set()
+        self.phrases_by_first_word = dict() # first word -> list of phrases as tuples of words, longest first
+        for flavor_name in _flavor_names:
+            words = tuple(flavor_name.lower().split())
+            if not words or " ".join(words) in self.flavor_names:
+                continue
+            self.flavor_names.append(" ".join(words))
+            if len(words) == 1:
+                self.single_words.add(words[0])
+            else:
+                self.phrases_by_first_word.setdefault(words[0], list()).append(words)
+        for phrases in self.phrases_by_first_word.values():
+            phrases.sort(key=len, reverse=True)
+        self.fingerprint = hashlib.sha256("\n".join(self.flavor_names).encode('utf-8')).hexdigest()
+
+    @classmethod
+    def from_file(cls, _path):
+        """
+        Build the matcher from a lexicon file with one flavor per line. Blank lines and lines starting with # are skipped.
+        """
+        with open(_path, 'r', encoding='utf-8') as f:
+            return cls([line.strip() for line in f if line.strip() and not line.strip().startswith('#')])
+
+    def find_flavors(self, _words):
+        """
+        Return the flavors found in the list of words, once per occurrence, in the order they appear.
+        """
+        flavors = list()
+        idx, num_words = 0, len(_words)
+        while idx < num_words:
+            word = _words[idx]
+            for phrase in self.phrases_by_first_word.get(word, ()):
+                if tuple(_words[idx : idx + len(phrase)]) == phrase:
+                    flavors.append(" ".join(phrase))
+                    idx += len(phrase)
+                    break
+            else:
+                if word in self.single_words:
+                    flavors.append(word)
+                idx += 1
+        return flavors
+
+    def __len__(self):
+        return len(self.flavor_names)
@@ -0,0 +1,588 @@
+## -------------------------------------------------------------------------------------------------------------------------------------------------
+## Graph store: the load, delete and query operations used by the loader and the GUI, behind one interface with two backends.
+##    neo4j  :: c_neo4j_graph_store, runs the Cypher statements through run_neo4j_transaction on the shared connection
+##    memory :: c_memory_graph_store, in-process dicts and sets indexed the way the queries read them, no database needed.
+##              Used for offline testing and to compare the loader and query overhead against the database.
+##              Nothing is persisted, the graph only lives as long as the process.
+## Both backends take the same rows (see build_neo_batch_params) and give the same query results.
+## Graph statistics: node counts per label, number of reviews per flavor and number of Entity nodes per entity label.
+##    neo4j  :: kept on GraphStat nodes, updated with deltas in the same transaction as every load and delete, and created
+##              again by rebuild_stats (which runs automatically the first time they are read from a graph without them)
+##    memory :: read from the indexes the store keeps anyway
+## -------------------------------------------------------------------------------------------------------------------------------------------------
+
+import threading
+import time
+
+from tqdm import tqdm
+
+from utils.util_functions_1 import my_print_and_log, make_neo4j_connection, ensure_neo4j_schema, run_neo4j_transaction
+
+GRAPH_BACKENDS = ['neo4j', 'memory']
+
+## kinds of graph statistics, each is a count per key
+##    label        :: number of nodes per node label (Review, Entity, Flavor)
+##    flavor       :: number of Review nodes with a HAS_FLAVOR relationship to the flavor
+##    entity_label :: number of Entity nodes per entity label code e.g. DATE
+GRAPH_STAT_KINDS = ['label', 'flavor', 'entity_label']
+
+def build_neo_batch_params(_in_neo_entries):
+    """
+    Flatten a group of neo entries into the rows the graph stores load, also the parameter lists for the UNWIND statements.
+    Returns:
+        list of review rows, list of entity rows, list of flavor rows
+    """
+    rev_rows, ent_rows, flav_rows = list(), list(), list()
+    for neo_entry in _in_neo_entries:
+        rev_name = neo_entry['Review']['name']
+        ## sentiment is None when it was not extracted
+        sentiment = neo_entry['Review']['sentiment'] or dict()
+        rev_rows.append({
+            'name': rev_name,
+            'cnt_sents': neo_entry['Review']['cnt_sents'],
+            'cnt_words': neo_entry['Review']['cnt_words'],
+            'senti_polarity': sentiment.get('polarity'),
+            'raw_text': neo_entry['RevText']['raw'],
+            'proc_text': neo_entry['RevText']['processed'],
+            })
+        for ent in neo_entry['Entities']:
+            ent_rows.append({
+                'rev_name': rev_name,
+                'ent_text': ent['text'],
+                'ent_label': ent['label'],
+                'ent_label_': ent['label_'],
+                })
+        for flav in neo_entry['Flavors']:
+            flav_rows.append({
+                'rev_name': rev_name,
+                'flav_name': flav,
+                })
+    return rev_rows, ent_rows, flav_rows
+
+def build_load_stats_deltas(_rev_rows, _ent_rows, _flav_rows, _existing_reviews, _existing_entities, _existing_flavors, _existing_review_flavors):
+    """
+    Work out how a load changes the graph statistics from its rows and the nodes and relationships that already existed.
+    Loading MERGEs the nodes, so only the ones not there before count, and a review counts once per flavor.
+    Returns:
+        dict of (stat kind, key) -> change
+    """
+    deltas = dict()
+    def add(_kind, _key, _delta):
+        if _delta:
+            deltas[(_kind, _key)] = deltas.get((_kind, _key), 0) + _delta
+    add('label', 'Review', len(set(row['name'] for row in _rev_rows) - _existing_reviews))
+    new_entities = set((row['ent_text'], row['ent_label'], row['ent_label_']) for row in _ent_rows) - _existing_entities
+    add('label', 'Entity', len(new_entities))
+    for _, _, ent_label_ in new_entities:
+        add('entity_label', ent_label_, 1)
+    add('label', 'Flavor', len(set(row['flav_name'] for row in _flav_rows) - _existing_flavors))
+    for _, flav_name in set((row['rev_name'], row['flav_name']) for row in _flav_rows) - _existing_review_flavors:
+        add('flavor', flav_name, 1)
+    return deltas
+
+class c_neo4j_graph_store:
+    """
+    Graph store backed by Neo4j. Every operation runs as one transaction through run_neo4j_transaction.
+    """
+    backend = 'neo4j'
+
+    ## Review is merged on the name (unique constraint) and its properties set, so a missing sentiment score is not a null merge key
+    stmt1_rev_node_batch = r'UNWIND $_in_rows AS row MERGE (rn1:Review {name: row.name}) SET rn1.count_sent = row.cnt_sents, rn1.count_words = row.cnt_words, rn1.senti_score = row.senti_polarity, rn1.raw_text = row.raw_text, rn1.proc_text = row.proc_text'
+    stmt2_ent_node_batch = r'UNWIND $_in_rows AS row MERGE (:Entity {name: row.ent_text, label: row.ent_label, label_: row.ent_label_})'
+    stmt3_flav_node_batch = r'UNWIND $_in_rows AS row MERGE (:Flavor {name: row.flav_name})'
+    stmt10_batch = r'UNWIND $_in_rows AS row MATCH (rn1:Review{name: row.rev_name}) MATCH (e1:Entity{name: row.ent_text, label_: row.ent_label_}) CREATE (rn1)-[:RELATES_TO_ENTITY]->(e1)'
+    stmt11_batch = r'UNWIND $_in_rows AS row MATCH (rn1:Review{name: row.rev_name}) MATCH (f1:Flavor{name: row.flav_name}) CREATE (rn1)-[:HAS_FLAVOR]->(f1)'
+
+    stmt1_rev_node = r'MERGE (rn1:Review {name: $_in_rev_name}) SET rn1.count_sent = $_in_cnt_sents, rn1.count_words = $_in_cnt_words, rn1.senti_score = $_in_senti_polarity, rn1.raw_text = $_in_raw_text, rn1.proc_text = $_in_proc_text'
+    stmt2_ent_node = r'MERGE (:Entity {name: $_in_ent_text, label: $_in_ent_label, label_: $_in_ent_label_})'
+    stmt3_flav_node = r'MERGE (:Flavor {name: $_in_flav_name})'
+    stmt10 = r'MATCH (rn1:Review{name: $_in_rev_name}) MATCH (e1:Entity{name: $_in_ent_text, label_: $_in_ent_label_}) CREATE (rn1)-[:RELATES_TO_ENTITY]->(e1)'
+    stmt11 = r'MATCH (rn1:Review{name: $_in_rev_name}) MATCH (f1:Flavor{name: $_in_flav_name}) CREATE (rn1)-[:HAS_FLAVOR]->(f1)'
+
+    stmt0_clear_graph = r'MATCH (n) DETACH DELETE n'
+    stmt0a_count_rels = r'MATCH ()-[r]->() RETURN count(r) AS cnt'
+    stmt0b_count_nodes = r'MATCH (n) RETURN count(n) AS cnt'
+    stmt0c_delete_rels_batch = r'MATCH ()-[r]->() WITH r LIMIT $_in_batch_size DELETE r RETURN count(r) AS cnt'
+    stmt0d_delete_nodes_batch = r'MATCH (n) WITH n LIMIT $_in_batch_size DETACH DELETE n RETURN count(n) AS cnt'
+    stmt0e_recreate_db = r'CREATE OR REPLACE DATABASE $_in_db_name WAIT'
+
+    ## review name sequence: one Sequence node per name prefix holds the last number given out. SET takes the write lock
+    ##    on the node, so concurrent uploads are serialized on it and never get the same number. The node is created the
+    ##    first time from the highest existing number, the unique constraint on Sequence.name makes that MERGE safe too.
+    stmt15_next_review_number = r'MATCH (s1:Sequence {name: $_in_seq_name}) SET s1.value = s1.value + 1 RETURN s1.value'
+    stmt15a_max_review_number = r"MATCH (rn1:Review) WHERE rn1.name STARTS WITH $_in_prefix RETURN max(toInteger(substring(rn1.name, size($_in_prefix))))"
+    stmt15b_create_sequence = r'MERGE (s1:Sequence {name: $_in_seq_name}) ON CREATE SET s1.value = $_in_start ON MATCH SET s1.value = s1.value + 1 RETURN s1.value'
+    stmt16_get_linked_nodes = r'UNWIND $_in_rev_names AS rev_name MATCH (rn1:Review {name: rev_name})--(n1) RETURN DISTINCT id(n1) AS node_id'
+    stmt17_delete_rev_nodes = r'UNWIND $_in_rev_names AS rev_name MATCH (rn1:Review {name: rev_name}) DETACH DELETE rn1'
+    stmt18_delete_orphan_nodes = r'UNWIND $_in_node_ids AS node_id MATCH (n1) WHERE id(n1) = node_id AND NOT (n1)--() WITH n1, labels(n1) AS node_labels, n1.label_ AS ent_label_ DELETE n1 RETURN node_labels, ent_label_'
+    stmt19_count_rev_nodes = r'UNWIND $_in_rev_names AS rev_name MATCH (rn1:Review {name: rev_name}) RETURN count(DISTINCT rn1)'
+    stmt19a_count_rev_flavors = r'UNWIND $_in_rev_names AS rev_name MATCH (rn1:Review {name: rev_name})-[:HAS_FLAVOR]->(f1:Flavor) RETURN f1.name AS flav_name, count(DISTINCT rn1) AS cnt'
+
+    ## graph statistics, one GraphStat node per (kind, key) named 'kind:key', looked up through the unique constraint on the name.
+    ##    The 'meta:built' node marks a graph whose statistics are complete.
+    ##    The 'meta:lock' node serializes the transactions that change the statistics: each takes its write lock first (as
+    ##    the review name sequence does), so the existence reads that the deltas come from see every earlier commit and two
+    ##    concurrent uploads never both count the same new node or relationship.
+    stmt30_existing_reviews = r'UNWIND $_in_rows AS row MATCH (rn1:Review {name: row.name}) RETURN DISTINCT rn1.name'
+    stmt31_existing_entities = r'UNWIND $_in_rows AS row MATCH (e1:Entity {name: row.ent_text, label: row.ent_label, label_: row.ent_label_}) RETURN DISTINCT e1.name, e1.label, e1.label_'
+    stmt32_existing_flavors = r'UNWIND $_in_rows AS row MATCH (f1:Flavor {name: row.flav_name}) RETURN DISTINCT f1.name'
+    stmt33_existing_review_flavors = r'UNWIND $_in_rows AS row MATCH (rn1:Review {name: row.rev_name})-[:HAS_FLAVOR]->(f1:Flavor {name: row.flav_name}) RETURN DISTINCT rn1.name, f1.name'
+    stmt34_update_stats = r'UNWIND $_in_deltas AS d MERGE (s1:GraphStat {name: d.name}) ON CREATE SET s1.kind = d.kind, s1.key = d.key, s1.value = d.delta ON MATCH SET s1.value = s1.value + d.delta'
+    stmt35_delete_stats = r"MATCH (s1:GraphStat) WHERE s1.name <> 'meta:lock' DELETE s1"
+    stmt36_count_label = r'MATCH (n1:xxxxxxx) RETURN count(n1)'
+    stmt37_count_entity_labels = r'MATCH (e1:Entity) RETURN e1.label_ AS key, count(e1) AS value'
+    stmt38_count_flavor_reviews = r'MATCH (rn1:Review)-[:HAS_FLAVOR]->(f1:Flavor) RETURN f1.name AS key, count(DISTINCT rn1) AS value'
+    stmt39_mark_stats_built = r"MERGE (s1:GraphStat {name: 'meta:built'}) SET s1.kind = 'meta', s1.key = 'built', s1.value = 1"
+    stmt40_get_stat = r"OPTIONAL MATCH (m1:GraphStat {name: 'meta:built'}) OPTIONAL MATCH (s1:GraphStat {name: $_in_name}) RETURN m1 IS NOT NULL AS built, coalesce(s1.value, 0) AS value"
+    stmt41_get_stats_kind = r"OPTIONAL MATCH (m1:GraphStat {name: 'meta:built'}) OPTIONAL MATCH (s1:GraphStat {kind: $_in_kind}) WHERE s1.value > 0 RETURN m1 IS NOT NULL AS built, s1.key AS key, s1.value AS value"
+    stmt42_lock_stats = r"MERGE (s1:GraphStat {name: 'meta:lock'}) ON CREATE SET s1.kind = 'meta', s1.key = 'lock', s1.value = 0 SET s1.value = s1.value + 1"
+
+    stmt21_query_2 = r"MATCH (rv1:Review) WHERE rv1['count_words'] > $_in_min_words AND rv1['senti_score'] > $_in_min_senti_score WITH COUNT (rv1) AS review_node_count RETURN review_node_count"
+    stmt22_query_3 = r"MATCH (rv1:Review)-[rel1:HAS_FLAVOR]-(f1:Flavor) WHERE f1['name'] in $_in_flav_list RETURN f1['name'], rv1['name']"
+    stmt23_review_scalars = r'MATCH (rn1:Review) RETURN rn1.name AS name, rn1.count_words AS count_words, rn1.count_sent AS count_sent, rn1.senti_score AS senti_score'
+    stmt24_review_flavors = r'MATCH (rn1:Review) OPTIONAL MATCH (rn1)-[:HAS_FLAVOR]->(f1:Flavor) RETURN rn1.name AS name, collect(DISTINCT f1.name) AS flavors'
+
+    def __init__(self, _graph):
+        self.graph = _graph
+
+    def lock_stats(self, _tx):
+        """
+        Take the write lock on the statistics lock node, held until the transaction ends.
+        """
+        _tx.run(self.stmt42_lock_stats)
+
+    def get_load_stats_deltas(self, _tx, _rev_rows, _ent_rows, _flav_rows):
+        """
+        Read which of the nodes and relationships of the rows already exist, inside the load transaction before it writes.
+        The statistics lock is taken first, so no other load or delete can change the answer before this one commits.
+        Every lookup goes through a unique constraint or index, so the cost follows the size of the load, not of the graph.
+        Returns:
+            dict of (stat kind, key) -> change, see build_load_stats_deltas
+        """
+        self.lock_stats(_tx)
+        existing_reviews = set(rec[0] for rec in _tx.run(self.stmt30_existing_reviews, parameters={'_in_rows': _rev_rows}))
+        existing_entities, existing_flavors, existing_review_flavors = set(), set(), set()
+        if _ent_rows:
+            existing_entities = set(tuple(rec) for rec in _tx.run(self.stmt31_existing_entities, parameters={'_in_rows': _ent_rows}))
+        if _flav_rows:
+            existing_flavors = set(rec[0] for rec in _tx.run(self.stmt32_existing_flavors, parameters={'_in_rows': _flav_rows}))
+            existing_review_flavors = set(tuple(rec) for rec in _tx.run(self.stmt33_existing_review_flavors, parameters={'_in_rows': _flav_rows}))
+        return build_load_stats_deltas(_rev_rows, _ent_rows, _flav_rows, existing_reviews, existing_entities, existing_flavors, existing_review_flavors)
+
+    def update_stats(self, _tx, _deltas):
+        if _deltas:
+            _tx.run(self.stmt34_update_stats, parameters={'_in_deltas': [
+                {'name': f"{kind}:{key}", 'kind': kind, 'key': key, 'delta': delta} for (kind, key), delta in _deltas.items()]})
+
+    def load_batch(self, _rev_rows, _ent_rows, _flav_rows):
+        """
+        Load the rows of a group of entries in one transaction, each kind of row sent as one parameter list through UNWIND.
+        The graph statistics are updated in the same transaction.
+        """
+        def load_batch_work(tx):
+            stats_deltas = self.get_load_stats_deltas(tx, _rev_rows, _ent_rows, _flav_rows)
+            ## nodes first so that the relationship statements can match them
+            tx.run(self.stmt1_rev_node_batch, parameters={'_in_rows': _rev_rows})
+            if _ent_rows:
+                tx.run(self.stmt2_ent_node_batch, parameters={'_in_rows': _ent_rows})
+            if _flav_rows:
+                tx.run(self.stmt3_flav_node_batch, parameters={'_in_rows': _flav_rows})
+            if _ent_rows:
+                tx.run(self.stmt10_batch, parameters={'_in_rows': _ent_rows})
+            if _flav_rows:
+                tx.run(self.stmt11_batch, parameters={'_in_rows': _flav_rows})
+            self.update_stats(tx, stats_deltas)
+        run_neo4j_transaction(load_batch_work, "load batch", self.graph)
+
+    def load_entry(self, _neo_entry):
+        """
+        Load one entry in its own transaction with one statement per node and relationship.
+        The graph statistics are updated in the same transaction.
+        Returns:
+            number of entities, number of flavors
+        """
+        rev_rows, ent_rows, flav_rows = build_neo_batch_params([_neo_entry])
+        def load_entry_work(tx):
+            stats_deltas = self.get_load_stats_deltas(tx, rev_rows, ent_rows, flav_rows)
+            # create Review node if not already existing
+            tx.run(self.stmt1_rev_node, parameters={
+                '_in_rev_name': rev_rows[0]['name'],
+                '_in_cnt_sents': rev_rows[0]['cnt_sents'],
+                '_in_cnt_words': rev_rows[0]['cnt_words'],
+                '_in_senti_polarity': rev_rows[0]['senti_polarity'],
+                '_in_raw_text': rev_rows[0]['raw_text'],
+                '_in_proc_text': rev_rows[0]['proc_text'],
+                })
+            # create Enttity node and relationship if not already existing
+            for ent in _neo_entry['Entities']:
+                tx.run(self.stmt2_ent_node, parameters={
+                    '_in_ent_text': ent['text'],
+                    '_in_ent_label': ent['label'],
+                    '_in_ent_label_': ent['label_'],
+                    })
+                tx.run(self.stmt10, parameters={
+                    '_in_rev_name': _neo_entry['Review']['name'],
+                    '_in_ent_text': ent['text'],
+                    '_in_ent_label_': ent['label_'],
+                    })
+            # create flavor note and relationship if not already existing
+            for flav in _neo_entry['Flavors']:
+                tx.run(self.stmt3_flav_node, parameters={
+                    '_in_flav_name': flav,
+                    })
+                tx.run(self.stmt11, parameters={
+                    '_in_rev_name': _neo_entry['Review']['name'],
+                    '_in_flav_name': flav,
+                    })
+            self.update_stats(tx, stats_deltas)
+            return len(_neo_entry['Entities']), len(_neo_entry['Flavors'])
+        return run_neo4j_transaction(load_entry_work, "load entry", self.graph)
+
+    def delete_reviews(self, _rev_names):
+        """
+        Delete the named Review nodes with their relationships, and any Entity or Flavor nodes left without relationships.
+        The graph statistics are updated in the same transaction.
+        """
+        def delete_work(tx):
+            self.lock_stats(tx)
+            stats_deltas = {('label', 'Review'): -tx.run(self.stmt19_count_rev_nodes, parameters={'_in_rev_names': _rev_names}).evaluate()}
+            for rec in tx.run(self.stmt19a_count_rev_flavors, parameters={'_in_rev_names': _rev_names}):
+                stats_deltas[('flavor', rec['flav_name'])] = -rec['cnt']
+            node_ids = [rec['node_id'] for rec in tx.run(self.stmt16_get_linked_nodes, parameters={'_in_rev_names': _rev_names})]
+            tx.run(self.stmt17_delete_rev_nodes, parameters={'_in_rev_names': _rev_names})
+            for rec in tx.run(self.stmt18_delete_orphan_nodes, parameters={'_in_node_ids': node_ids}):
+                for node_label in rec['node_labels']:
+                    stats_deltas[('label', node_label)] = stats_deltas.get(('label', node_label), 0) - 1
+                if 'Entity' in rec['node_labels']:
+                    stats_deltas[('entity_label', rec['ent_label_'])] = stats_deltas.get(('entity_label', rec['ent_label_']), 0) - 1
+            self.update_stats(tx, stats_deltas)
+        run_neo4j_transaction(delete_work, "delete reviews", self.graph)
+
+    def clear(self, _clear_mode='batched', _batch_size=10000):
+        """
+        Delete everything in the graph
+            single  - one DETACH DELETE transaction, can exhaust the transaction memory on a big graph
+            batched - delete relationships and then nodes in transactions of at most batch size each, with progress reporting
+            drop    - drop and recreate the database from the system database (needs admin rights and an edition that
+                      supports it), falls back to batched if that fails. The schema is created again afterwards.
+        """
+        if _clear_mode == 'drop':
+            ## the Graph has no name when connected to the server default database (NEO4J_DATABASE not set)
+            db_name = self.graph.name or 'neo4j'
+            try:
+                self.graph.service.system_graph.run(self.stmt0e_recreate_db, parameters={'_in_db_name': db_name})
+                my_print_and_log(f"\nCleared the graph by recreating database {db_name}...\n")
+                ensure_neo4j_schema(self.graph, _force=True)
+                self.rebuild_stats()
+                return
+            except Exception as neo_drop_db_error:
+                my_print_and_log(f"\nWARNING: Could not recreate database {db_name}, clearing in batches instead.\nError message :: {neo_drop_db_error}\n", "warning")
+                _clear_mode = 'batched'
+
+        if _clear_mode == 'single':
+            run_neo4j_transaction(lambda tx: tx.run(self.stmt0_clear_graph, parameters={}), "clear graph", self.graph)
+            my_print_and_log(f"\nCleared the graph...\n")
+            self.rebuild_stats()
+            return
+
+        ## batched - relationships first so that each node batch has little left to detach
+        time_clear_start = time.perf_counter()
+        for what, stmt_count, stmt_delete in [
+            ('relationships', self.stmt0a_count_rels, self.stmt0c_delete_rels_batch),
+            ('nodes', self.stmt0b_count_nodes, self.stmt0d_delete_nodes_batch),
+            ]:
+            cnt_total = self.graph.run(stmt_count).evaluate()
+            cnt_deleted = 0
+            with tqdm(total=cnt_total) as pbar:
+                while True:
+                    cnt_batch = run_neo4j_transaction(
+                        lambda tx: tx.run(stmt_delete, parameters={'_in_batch_size': _batch_size}).evaluate(),
+                        f"clear graph {what} batch", self.graph)
+                    if not cnt_batch:
+                        break
+                    cnt_deleted += cnt_batch
+                    pbar.update(cnt_batch)
+                    my_print_and_log(f"Deleted {cnt_deleted} of {cnt_total} {what}", _only_log=True)
+            my_print_and_log(f"\nDeleted {cnt_deleted} {what} in batches of {_batch_size}\n")
+        my_print_and_log(f"\nCleared the graph in {time.perf_counter() - time_clear_start:.2f} secs...\n")
+        ## the graph is empty, so this only marks the statistics as complete
+        self.rebuild_stats()
+
+    def rebuild_stats(self):
+        """
+        Count everything again from the graph and replace the graph statistics, in one transaction.
+        Needed once for a graph loaded before the statistics existed, or to check them against the graph.
+        """
+        def rebuild_stats_work(tx):
+            self.lock_stats(tx)
+            tx.run(self.stmt35_delete_stats)
+            stats = dict()
+            for node_label in ['Review', 'Entity', 'Flavor']:
+                stats[('label', node_label)] = tx.run(self.stmt36_count_label.replace('xxxxxxx', node_label)).evaluate()
+            for kind, stmt_count in [('entity_label', self.stmt37_count_entity_labels), ('flavor', self.stmt38_count_flavor_reviews)]:
+                for rec in tx.run(stmt_count):
+                    stats[(kind, rec['key'])] = rec['value']
+            self.update_stats(tx, stats)
+            tx.run(self.stmt39_mark_stats_built)
+        run_neo4j_transaction(rebuild_stats_work, "rebuild graph stats", self.graph)
+
+    def allocate_review_number(self, _prefix):
+        """
+        Give out the next number for a Review node named with the prefix, in one transaction on the sequence node.
+        Only the first call for a prefix reads the existing Review nodes, every later call is one lookup on the unique constraint.
+        Returns:
+            the number, 0 if there are no such Review nodes yet
+        """
+        seq_name = 'review_' + _prefix
+        def allocate_work(tx):
+            number = tx.run(self.stmt15_next_review_number, parameters={'_in_seq_name': seq_name}).evaluate()
+            if number is None:
+                max_number = tx.run(self.stmt15a_max_review_number, parameters={'_in_prefix': _prefix}).evaluate()
+                number = tx.run(self.stmt15b_create_sequence, parameters={
+                    '_in_seq_name': seq_name,
+                    '_in_start': 0 if max_number is None else max_number + 1,
+                    }).evaluate()
+            return number
+        return run_neo4j_transaction(allocate_work, "allocate review number", self.graph)
+
+    def get_stat(self, _kind, _key):
+        """
+        One graph statistic, 0 if it was never counted. The statistics are rebuilt first if the graph has none yet.
+        """
+        res_stat = run_neo4j_transaction(lambda tx: tx.run(self.stmt40_get_stat, parameters={
+            '_in_name': f"{_kind}:{_key}",
+            }).data(), "get graph stat", self.graph)
+        if not res_stat[0]['built']:
+            self.rebuild_stats()
+            return self.get_stat(_kind, _key)
+        return res_stat[0]['value']
+
+    def get_stats(self, _kind):
+        """
+        Returns:
+            dict of key -> count of every non zero graph statistic of the kind
+        """
+        res_stats = run_neo4j_transaction(lambda tx: tx.run(self.stmt41_get_stats_kind, parameters={
+            '_in_kind': _kind,
+            }).data(), "get graph stats", self.graph)
+        if not res_stats[0]['built']:
+            self.rebuild_stats()
+            return self.get_stats(_kind)
+        return {rec['key']: rec['value'] for rec in res_stats if rec['key'] is not None}
+
+    def count_nodes(self, _node_label):
+        """
+        Query 1: number of nodes with the label, one of Review, Entity or Flavor, read from the graph statistics.
+        """
+        return self.get_stat('label', _node_label)
+
+    def count_reviews_min_words_senti(self, _min_words, _min_senti_score):
+        """
+        Query 2: number of Review nodes with more than the words and a sentiment score above the minimum.
+        """
+        res_q2 = run_neo4j_transaction(lambda tx: list(tx.run(self.stmt21_query_2, parameters={
+            '_in_min_words': _min_words,
+            '_in_min_senti_score': _min_senti_score,
+            })), "query 2", self.graph)
+        return res_q2[0]['review_node_count']
+
+    def get_flavor_review_pairs(self, _flavor_names):
+        """
+        Query 3: one (flavor name, review name) pair per HAS_FLAVOR relationship to any of the flavors.
+        """
+        res_q3 = run_neo4j_transaction(lambda tx: list(tx.run(self.stmt22_query_3, parameters={
+            '_in_flav_list': _flavor_names,
+            })), "query 3", self.graph)
+        return [(res[0], res[1]) for res in res_q3]
+
+    def get_review_scalars(self):
+        """
+        Scalar properties of every Review node, read in one pass for the in-process snapshot (utils/util_review_snapshot_1.py).
+        Returns:
+            list of dicts of name, count_words, count_sent, senti_score
+        """
+        return run_neo4j_transaction(lambda tx: tx.run(self.stmt23_review_scalars).data(), "review scalars", self.graph)
+
+    def get_review_flavors(self):
+        """
+        Flavors of every Review node, including the ones without any, read in one pass for the in-process flavor index
+        (utils/util_flavor_index_1.py).
+        Returns:
+            list of (review name, list of flavor names)
+        """
+        res_flavors = run_neo4j_transaction(lambda tx: tx.run(self.stmt24_review_flavors).data(), "review flavors", self.graph)
+        return [(rec['name'], rec['flavors']) for rec in res_flavors]
+
+class c_memory_graph_store:
+    """
+    In-process graph store with the same operations as c_neo4j_graph_store. Nodes are kept in dicts and sets, and the
+    relationships are indexed from both ends so the queries never scan every node. Relationships are counted, as the
+    Cypher CREATE makes one relationship per row, so the query results match the Neo4j backend.
+    Safe to use from the GUI worker threads, every operation holds the store lock.
+    """
+    backend = 'memory'
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.clear()
+
+    def clear(self, _clear_mode=None, _batch_size=None):
+        with self.lock:
+            self.reviews = dict()               # review name -> properties
+            self.entities = set()               # (name, label, label_) of every Entity node
+            self.flavors = set()                # Flavor node names
+            self.review_entities = dict()       # review name -> list of entity keys, one per relationship
+            self.review_flavors = dict()        # review name -> list of flavor names, one per relationship
+            self.entity_rel_counts = dict()     # entity key -> number of relationships
+            self.flavor_reviews = dict()        # flavor name -> dict of review name -> number of relationships
+            self.review_sequences = dict()      # review name prefix -> last number given out
+            self.entity_label_counts = dict()   # entity label code -> number of Entity nodes
+
+    def load_batch(self, _rev_rows, _ent_rows, _flav_rows):
+        with self.lock:
+            ## nodes first so that the relationships can match them, same order as the Cypher statements
+            for row in _rev_rows:
+                self.reviews[row['name']] = {
+                    'name': row['name'],
+                    'count_sent': row['cnt_sents'],
+                    'count_words': row['cnt_words'],
+                    'senti_score': row['senti_polarity'],
+                    'raw_text': row['raw_text'],
+                    'proc_text': row['proc_text'],
+                    }
+            for row in _ent_rows:
+                ent_key = (row['ent_text'], row['ent_label'], row['ent_label_'])
+                if ent_key not in self.entities:
+                    self.entity_label_counts[ent_key[2]] = self.entity_label_counts.get(ent_key[2], 0) + 1
+                self.entities.add(ent_key)
+            for row in _flav_rows:
+                self.flavors.add(row['flav_name'])
+            for row in _ent_rows:
+                if row['rev_name'] not in self.reviews:
+                    continue
+                ## relationships match the entity on its key (name, label_), label follows from label_
+                ent_key = (row['ent_text'], row['ent_label'], row['ent_label_'])
+                self.review_entities.setdefault(row['rev_name'], list()).append(ent_key)
+                self.entity_rel_counts[ent_key] = self.entity_rel_counts.get(ent_key, 0) + 1
+            for row in _flav_rows:
+                if row['rev_name'] not in self.reviews:
+                    continue
+                self.review_flavors.setdefault(row['rev_name'], list()).append(row['flav_name'])
+                flavor_revs = self.flavor_reviews.setdefault(row['flav_name'], dict())
+                flavor_revs[row['rev_name']] = flavor_revs.get(row['rev_name'], 0) + 1
+
+    def load_entry(self, _neo_entry):
+        self.load_batch(*build_neo_batch_params([_neo_entry]))
+        return len(_neo_entry['Entities']), len(_neo_entry['Flavors'])
+
+    def delete_reviews(self, _rev_names):
+        with self.lock:
+            for rev_name in _rev_names:
+                if self.reviews.pop(rev_name, None) is None:
+                    continue
+                for ent_key in self.review_entities.pop(rev_name, list()):
+                    self.entity_rel_counts[ent_key] -= 1
+                    ## orphaned entities are deleted, like the orphan delete after DETACH DELETE in Cypher
+                    if self.entity_rel_counts[ent_key] == 0:
+                        del self.entity_rel_counts[ent_key]
+                        self.entities.discard(ent_key)
+                        self.entity_label_counts[ent_key[2]] -= 1
+                        if not self.entity_label_counts[ent_key[2]]:
+                            del self.entity_label_counts[ent_key[2]]
+                for flav_name in set(self.review_flavors.pop(rev_name, list())):
+                    flavor_revs = self.flavor_reviews[flav_name]
+                    del flavor_revs[rev_name]
+                    if not flavor_revs:
+                        del self.flavor_reviews[flav_name]
+                        self.flavors.discard(flav_name)
+
+    def allocate_review_number(self, _prefix):
+        with self.lock:
+            if _prefix not in self.review_sequences:
+                self.review_sequences[_prefix] = max((int(rev_name[len(_prefix):]) for rev_name in self.reviews
+                    if rev_name.startswith(_prefix) and rev_name[len(_prefix):].isdigit()), default=-1)
+            self.review_sequences[_prefix] += 1
+            return self.review_sequences[_prefix]
+
+    def rebuild_stats(self):
+        with self.lock:
+            self.entity_label_counts = dict()
+            for _, _, ent_label_ in self.entities:
+                self.entity_label_counts[ent_label_] = self.entity_label_counts.get(ent_label_, 0) + 1
+
+    def get_stats(self, _kind):
+        with self.lock:
+            if _kind == 'label':
+                stats = {'Review': len(self.reviews), 'Entity': len(self.entities), 'Flavor': len(self.flavors)}
+            elif _kind == 'flavor':
+                stats = {flav_name: len(flavor_revs) for flav_name, flavor_revs in self.flavor_reviews.items()}
+            elif _kind == 'entity_label':
+                stats = dict(self.entity_label_counts)
+            else:
+                stats = dict()
+            return {key: value for key, value in stats.items() if value}
+
+    def get_stat(self, _kind, _key):
+        with self.lock:
+            if _kind == 'flavor':
+                return len(self.flavor_reviews.get(_key, dict()))
+            return self.get_stats(_kind).get(_key, 0)
+
+    def count_nodes(self, _node_label):
+        return self.get_stat('label', _node_label)
+
+    def count_reviews_min_words_senti(self, _min_words, _min_senti_score):
+        with self.lock:
+            ## a missing property never passes the comparison, as with null in Cypher
+            return sum(1 for props in self.reviews.values()
+                if props['count_words'] is not None and props['senti_score'] is not None
+                and props['count_words'] > _min_words and props['senti_score'] > _min_senti_score)
+
+    def get_flavor_review_pairs(self, _flavor_names):
+        with self.lock:
+            pairs = list()
+            for flav_name in set(_flavor_names):
+                for rev_name, cnt_rels in self.flavor_reviews.get(flav_name, dict()).items():
+                    pairs.extend([(flav_name, rev_name)] * cnt_rels)
+            return pairs
+
+    def get_review_scalars(self):
+        with self.lock:
+            return [{
+                'name': props['name'],
+                'count_words': props['count_words'],
+                'count_sent': props['count_sent'],
+                'senti_score': props['senti_score'],
+                } for props in self.reviews.values()]
+
+    def get_review_flavors(self):
+        with self.lock:
+            return [(rev_name, sorted(set(self.review_flavors.get(rev_name, list())))) for rev_name in self.reviews]
+
+## backend used by get_graph_store, set from the command line
+graph_store_settings = {'backend': 'neo4j'}
+memory_graph_store = None
+memory_graph_store_lock = threading.Lock()
+
+def set_graph_backend(_backend):
+    if _backend not in GRAPH_BACKENDS:
+        raise ValueError(f"Unknown graph backend: {_backend}, valid values: {GRAPH_BACKENDS}")
+    graph_store_settings['backend'] = _backend
+
+def get_graph_store(_on_fail_return=False):
+    """
+    Return the graph store of the selected backend. The in-memory store is one shared object for the whole process.
+    For Neo4j, call function with flag set to True to return None even on failure (see make_neo4j_connection).
+    Returns:
+        Graph store object, Error message
+    """
+    global memory_graph_store
+    if graph_store_settings['backend'] == 'memory':
+        with memory_graph_store_lock:
+            if memory_graph_store is None:
+                memory_graph_store = c_memory_graph_store()
+        return memory_graph_store, None
+    graph, gph_msg = make_neo4j_connection(_on_fail_return=_on_fail_return)
+    if graph is None:
+        return None, gph_msg
+    return c_neo4j_graph_store(graph), None
@@ -0,0 +1,100 @@
+## -------------------------------------------------------------------------------------------------------------------------------------------------
+## Manifest of the input reviews processed by the last reload, used for incremental reloads.
+##    Saved as json: { review name: {"size": bytes, "mtime_ns": modification time or None, "sha256": hash of the text} }
+##    For packed corpus input there is no per review file, so mtime_ns is None and the text is always hashed.
+##    The hash is of the review text as extraction reads it (utf-8 encoded), so it can also be taken from the extracted entries.
+##    A full reload needs no comparison, so it does not read the inputs up front: the entries start without a hash and
+##    c_manifest_text_recorder fills it in from the text of every entry as extraction passes it on.
+## -------------------------------------------------------------------------------------------------------------------------------------------------
+
+import hashlib
+import json
+import os
+
+def load_manifest(_path):
+    """
+    Load the manifest saved by the last run. Returns an empty manifest if there is none yet.
+    """
+    if not os.path.exists(_path):
+        return dict()
+    with open(_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_manifest(_path, _manifest):
+    """
+    Save the manifest, writing to a temporary file first so that a crash never leaves a half written manifest.
+    """
+    tmp_path = _path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(_manifest, f)
+    os.replace(tmp_path, _path)
+
+def manifest_entry_for_file(_path, _old_entry=None, _hash_text=True):
+    """
+    Build the manifest entry for an input file. If size and mtime match the old entry the file is not read again.
+    Without hash text the file is not read at all and the hash is left as None for c_manifest_text_recorder.
+    """
+    st = os.stat(_path)
+    if _old_entry is not None and _old_entry.get('size') == st.st_size and _old_entry.get('mtime_ns') == st.st_mtime_ns:
+        return _old_entry
+    if not _hash_text:
+        return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': None}
+    with open(_path, 'r') as f:
+        sha256 = hashlib.sha256(f.read().encode('utf-8')).hexdigest()
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': sha256}
+
+def manifest_entry_for_text(_text):
+    """
+    Build the manifest entry for a review text that is not stored in its own file.
+    """
+    data = _text.encode('utf-8')
+    return {'size': len(data), 'mtime_ns': None, 'sha256': hashlib.sha256(data).hexdigest()}
+
+class c_manifest_text_recorder:
+    """
+    Passes the neo entries on to another writer (append and extend), and fills in the missing hash of each entry's
+    manifest entry from the raw review text in it, so the inputs are not read a second time just for the manifest.
+    """
+    def __init__(self, _inner, _manifest):
+        self.inner = _inner
+        self.manifest = _manifest
+
+    def append(self, _neo_entry):
+        entry = self.manifest.get(_neo_entry['Review']['name'])
+        if entry is not None and entry['sha256'] is None:
+            text_entry = manifest_entry_for_text(_neo_entry['RevText']['raw'])
+            entry['sha256'] = text_entry['sha256']
+            if entry['mtime_ns'] is None:
+                entry['size'] = text_entry['size']
+        self.inner.append(_neo_entry)
+
+    def extend(self, _neo_entries):
+        for neo_entry in _neo_entries:
+            self.append(neo_entry)
+
+def get_input_name(_fname):
+    """
+    Review name of an input file or packed corpus entry: the file name without the folder and the extension.
+    """
+    return os.path.basename(_fname).split('.')[0]
+
+def make_input_fingerprint(_entry):
+    """
+    Identity of the content of an input: the hash of its text, or size and mtime for a file not hashed yet (full reload).
+    """
+    if _entry['sha256'] is not None:
+        return _entry['sha256']
+    return f"{_entry['size']}:{_entry['mtime_ns']}"
+
+def compare_manifests(_old_manifest, _new_manifest, _present_names=None):
+    """
+    Compare the manifest of the last run with the current inputs.
+    The new manifest may cover only part of the inputs (upload limit): names given as present are never taken as removed.
+    Returns:
+        list of names that are new or whose text changed, list of names no longer present
+    """
+    new_or_changed = [name for name, entry in _new_manifest.items()
+        if name not in _old_manifest or make_input_fingerprint(_old_manifest[name]) != make_input_fingerprint(entry)]
+    removed = [name for name in _old_manifest
+        if name not in _new_manifest and (_present_names is None or name not in _present_names)]
+    return new_or_changed, removed
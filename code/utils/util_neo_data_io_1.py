@@ -0,0 +1,63 @@
+import json
+
+class c_neo_jsonl_writer:
+    """
+    Write neo entries to a JSON-Lines file, one entry per line, as they are produced.
+    Has append and extend so it can be passed wherever a list of neo entries is built.
+    """
+    def __init__(self, _path):
+        self.path = _path
+        self.count = 0
+        self.f = open(self.path, "w", encoding="utf-8")
+
+    def append(self, _neo_entry):
+        self.f.write(json.dumps(_neo_entry))
+        self.f.write("\n")
+        self.count += 1
+
+    def extend(self, _neo_entries):
+        for neo_entry in _neo_entries:
+            self.append(neo_entry)
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+def iter_neo_entries(_path):
+    """
+    Yield the neo entries saved in a file one at a time.
+    Accepts the JSON-Lines format (one entry per line) and the older format of one JSON array with all the entries.
+    Only the older format needs the whole file in memory.
+    """
+    with open(_path, "r", encoding="utf-8") as f:
+        ## peek at the first non-whitespace character to decide the format
+        first_char = ""
+        while True:
+            first_char = f.read(1)
+            if first_char == "" or not first_char.isspace():
+                break
+        f.seek(0)
+        if first_char == "[":
+            for neo_entry in json.load(f):
+                yield neo_entry
+            return
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+def write_neo_jsonl(_path, _neo_entries):
+    """
+    Write all the neo entries to a JSON-Lines file.
+    Returns:
+        Number of entries written
+    """
+    with c_neo_jsonl_writer(_path) as writer:
+        writer.extend(_neo_entries)
+    return writer.count
@@ -0,0 +1,144 @@
+## -------------------------------------------------------------------------------------------------------------------------------------------------
+## Extraction profiles: which spacy pipeline components are loaded for feature extraction.
+##    full       :: every component of the model, sentences from the dependency parser (the original behaviour)
+##    fast       :: parser excluded, the statistical sentence recognizer (senter) gives the sentence boundaries,
+##                  NER only loaded if NER features are wanted
+##    stats-only :: as fast but NER and sentiment are always skipped - only word/sentence counts, processed text and flavors
+## The lemmatizer needs the tagger and attribute_ruler, so those are kept in every profile.
+## Benchmark of docs/sec per profile and how far each profile's features differ from full:
+##    python3 -m utils.util_nlp_profiles_1 -inDir ./inData -spacyModel en_core_web_sm
+## -------------------------------------------------------------------------------------------------------------------------------------------------
+
+import argparse
+import glob
+import os
+import string
+import time
+
+import spacy
+from spacy.lang.en.stop_words import STOP_WORDS
+from spacytextblob.spacytextblob import SpacyTextBlob
+
+from utils.util_text_preprocess_1 import preprocess_tokens
+
+NLP_PROFILES = ['full', 'fast', 'stats-only']
+
+def get_profile_flags(_profile, _do_ner, _do_sentiment):
+    """
+    Feature flags after applying the profile, the stats-only profile turns NER and sentiment off.
+    Returns:
+        ner flag, sentiment flag
+    """
+    if _profile == 'stats-only':
+        return False, False
+    return _do_ner, _do_sentiment
+
+def load_nlp_for_profile(_model_name, _profile, _do_ner=True, _do_sentiment=True):
+    """
+    Load the spacy model with only the components the profile needs. The spacytextblob component is added for sentiment.
+    Returns:
+        nlp object
+    """
+    if _profile not in NLP_PROFILES:
+        raise ValueError(f"Unknown extraction profile: {_profile}, valid values: {NLP_PROFILES}")
+    do_ner, do_sentiment = get_profile_flags(_profile, _do_ner, _do_sentiment)
+    if _profile == 'full':
+        nlp = spacy.load(_model_name)
+    else:
+        exclude = ['parser']
+        if not do_ner:
+            exclude.append('ner')
+        nlp = spacy.load(_model_name, exclude=exclude)
+        ## the trained models ship senter disabled, fall back to the rule based sentencizer if there is none
+        if 'senter' in nlp.disabled:
+            nlp.enable_pipe('senter')
+        elif 'senter' not in nlp.pipe_names:
+            nlp.add_pipe('sentencizer')
+    if _profile == 'full' or do_sentiment:
+        nlp.add_pipe('spacytextblob')
+    return nlp
+
+def get_doc_features(_doc, _punc, _stop_words, _do_ner, _do_sentiment):
+    """
+    The features read from a spacy doc for one review, in a form that can be compared between profiles.
+    """
+    return {
+        'cnt_words': len(_doc),
+        'cnt_sents': len(list(_doc.sents)),
+        'processed': preprocess_tokens(_doc, _punc, _stop_words),
+        'entities': [(ent.text, ent.label_) for ent in _doc.ents] if _do_ner else None,
+        'polarity': _doc._.polarity if _do_sentiment else None,
+    }
+
+def compare_features(_full_features, _profile_features):
+    """
+    Count the reviews where each feature differs from the full profile. Features the profile skips are not counted.
+    Returns:
+        dict of feature name -> number of reviews that differ
+    """
+    diffs = dict()
+    for feature in ['cnt_words', 'cnt_sents', 'processed', 'entities', 'polarity']:
+        diffs[feature] = sum(1 for full, prof in zip(_full_features, _profile_features)
+            if prof[feature] is not None and full[feature] != prof[feature])
+    return diffs
+
+def run_benchmark(_model_name, _texts, _batch_size=50):
+    """
+    Run every profile over the texts and measure docs/sec and the feature differences from full.
+    Returns:
+        dict of profile -> dict with docs_per_sec, pipe_names and diffs
+    """
+    stop_words = frozenset(STOP_WORDS)
+    results = dict()
+    full_features = None
+    for profile in NLP_PROFILES:
+        do_ner, do_sentiment = get_profile_flags(profile, True, True)
+        nlp = load_nlp_for_profile(_model_name, profile, do_ner, do_sentiment)
+        start = time.perf_counter()
+        features = [get_doc_features(doc, string.punctuation, stop_words, do_ner, do_sentiment)
+            for doc in nlp.pipe(_texts, batch_size=_batch_size)]
+        secs = time.perf_counter() - start
+        if profile == 'full':
+            full_features = features
+        results[profile] = {
+            'docs_per_sec': len(_texts) / secs if secs else float('inf'),
+            'pipe_names': nlp.pipe_names,
+            'diffs': compare_features(full_features, features),
+        }
+    return results
+
+def main():
+    argparser = argparse.ArgumentParser(
+        description='Benchmark of the extraction profiles: docs/sec and number of reviews whose features differ from full.')
+    argparser.add_argument(
+        '-inDir',
+        '--input_folder',
+        default='./inData',
+        help='Folder with the review .txt files.')
+    argparser.add_argument(
+        '-spacyModel',
+        '--spacy_model',
+        default='en_core_web_sm',
+        help='Spacy model to benchmark.')
+    argparser.add_argument(
+        '-nlpBatchSize',
+        '--nlp_pipe_batch_size',
+        type=int,
+        default=50,
+        help='Number of texts per nlp.pipe batch.')
+    args = argparser.parse_args()
+
+    texts = list()
+    for fname in sorted(glob.glob(os.path.join(args.input_folder, 'f*.txt'))):
+        with open(fname, 'r') as f:
+            texts.append(f.read())
+    results = run_benchmark(args.spacy_model, texts, args.nlp_pipe_batch_size)
+    print(f"\nReviews: {len(texts)}, model: {args.spacy_model}")
+    for profile, res in results.items():
+        diffs = ", ".join(f"{feature}={cnt}" for feature, cnt in res['diffs'].items())
+        print(f"{profile:<11} : {res['docs_per_sec']:8.1f} docs/sec :: reviews differing from full: {diffs}")
+        print(f"{'':<11}   components: {', '.join(res['pipe_names'])}")
+    print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import threading
+import time
+from collections import OrderedDict
+
+class c_query_result_cache:
+    """
+    LRU cache of query results with a time to live, for the GUI queries.
+    Keys are tuples of the query name and its normalized input. Entries are dropped by invalidate when an upload could
+    change their result. Every invalidate bumps the generation, and put ignores a result whose query started in an older
+    generation, so a query that ran while an upload was being applied can not put back a result from before the upload.
+    """
+    def __init__(self, _max_entries=256, _ttl_secs=300.0):
+        self.lock = threading.Lock()
+        self.max_entries = _max_entries
+        self.ttl_secs = _ttl_secs
+        self.entries = OrderedDict() # key -> (time stored, value), least recently used first
+        self.generation = 0
+        self.cnt_hits, self.cnt_misses = 0, 0
+
+    def get(self, _key):
+        """
+        Returns:
+            cached value or None, generation to pass to put
+        """
+        with self.lock:
+            entry = self.entries.get(_key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl_secs:
+                del self.entries[_key]
+                entry = None
+            if entry is None:
+                self.cnt_misses += 1
+                return None, self.generation
+            self.entries.move_to_end(_key)
+            self.cnt_hits += 1
+            return entry[1], self.generation
+
+    def put(self, _key, _value, _generation):
+        with self.lock:
+            if _generation != self.generation:
+                return
+            self.entries[_key] = (time.monotonic(), _value)
+            self.entries.move_to_end(_key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, _is_affected):
+        """
+        Drop the entries whose key the function says is affected.
+        Returns:
+            number of entries dropped
+        """
+        with self.lock:
+            self.generation += 1
+            affected_keys = [key for key in self.entries if _is_affected(key)]
+            for key in affected_keys:
+                del self.entries[key]
+            return len(affected_keys)
@@ -0,0 +1,145 @@
+## -------------------------------------------------------------------------------------------------------------------------------------------------
+## Columnar snapshot of the scalar properties of the Review nodes (name, count_words, count_sent, senti_score) in NumPy arrays,
+##    so that Query 2 and other range counts are answered in process without a scan of the graph.
+##    Read once from the graph store (see get_review_scalars) and then kept in step with the uploads through upsert and remove.
+##    A missing property is stored as NaN, which fails every comparison, as null does in Cypher.
+##    Two column filters (Query 2) use a vectorized mask, single column ranges a binary search on a sorted copy of the column
+##    that is sorted again only after the column changed.
+## -------------------------------------------------------------------------------------------------------------------------------------------------
+
+import threading
+
+import numpy as np
+
+REVIEW_SNAPSHOT_COLUMNS = ['count_words', 'count_sent', 'senti_score']
+
+def get_review_scalars_from_rows(_rev_rows):
+    """
+    Convert the review rows of build_neo_batch_params (utils/util_graph_store_1.py) to snapshot rows named as the properties.
+    """
+    return [{
+        'name': row['name'],
+        'count_words': row['cnt_words'],
+        'count_sent': row['cnt_sents'],
+        'senti_score': row['senti_polarity'],
+        } for row in _rev_rows]
+
+class c_review_snapshot:
+    """
+    Review scalar properties held as one float array per column, rows addressed through a dict of review name -> row.
+    The arrays grow by doubling so an upload is an in place write, a removed row is filled with the last row.
+    Safe to use from the GUI worker threads, every operation holds the snapshot lock.
+    """
+    def __init__(self, _capacity=1024):
+        self.lock = threading.RLock()
+        self.ready = False
+        self.size = 0
+        self.names = list()
+        self.rows = dict() # review name -> row in the arrays
+        self.columns = {column: np.full(_capacity, np.nan) for column in REVIEW_SNAPSHOT_COLUMNS}
+        self.sorted_columns = dict() # column -> sorted values without NaN, dropped when the column changes
+
+    def __len__(self):
+        return self.size
+
+    def grow(self, _min_capacity):
+        capacity = len(self.columns[REVIEW_SNAPSHOT_COLUMNS[0]])
+        if _min_capacity <= capacity:
+            return
+        while capacity < _min_capacity:
+            capacity *= 2
+        for column, values in self.columns.items():
+            grown = np.full(capacity, np.nan)
+            grown[:self.size] = values[:self.size]
+            self.columns[column] = grown
+
+    def upsert(self, _rows, _keep_existing=False):
+        """
+        Add or update reviews from rows with a name and the column values (None for a missing value).
+        With keep existing set, reviews already in the snapshot are left as they are - used for the initial read from
+        the graph, so that an upload applied while it was running is not overwritten by the older value.
+        Returns:
+            number of rows added or updated
+        """
+        cnt_rows = 0
+        with self.lock:
+            self.grow(self.size + len(_rows))
+            for row in _rows:
+                row_idx = self.rows.get(row['name'])
+                if row_idx is None:
+                    row_idx = self.size
+                    self.rows[row['name']] = row_idx
+                    self.names.append(row['name'])
+                    self.size += 1
+                elif _keep_existing:
+                    continue
+                for column in REVIEW_SNAPSHOT_COLUMNS:
+                    value = row.get(column)
+                    self.columns[column][row_idx] = np.nan if value is None else value
+                cnt_rows += 1
+            if cnt_rows:
+                self.sorted_columns = dict()
+        return cnt_rows
+
+    def remove(self, _names):
+        with self.lock:
+            for name in _names:
+                row_idx = self.rows.pop(name, None)
+                if row_idx is None:
+                    continue
+                last_idx = self.size - 1
+                if row_idx != last_idx:
+                    last_name = self.names[last_idx]
+                    self.names[row_idx] = last_name
+                    self.rows[last_name] = row_idx
+                    for values in self.columns.values():
+                        values[row_idx] = values[last_idx]
+                for values in self.columns.values():
+                    values[last_idx] = np.nan
+                self.names.pop()
+                self.size -= 1
+                self.sorted_columns = dict()
+
+    def load_from_store(self, _store):
+        """
+        Read the scalar properties of every Review node from the graph store and mark the snapshot ready.
+        Returns:
+            number of reviews read
+        """
+        rows = _store.get_review_scalars()
+        self.upsert(rows, _keep_existing=True)
+        self.ready = True
+        return len(rows)
+
+    def count_min_words_senti(self, _min_words, _min_senti_score):
+        """
+        Query 2: number of reviews with more than the words and a sentiment score above the minimum.
+        """
+        with self.lock:
+            count_words = self.columns['count_words'][:self.size]
+            senti_score = self.columns['senti_score'][:self.size]
+            return int(np.count_nonzero((count_words > _min_words) & (senti_score > _min_senti_score)))
+
+    def get_sorted_column(self, _column):
+        with self.lock:
+            if _column not in self.sorted_columns:
+                values = self.columns[_column][:self.size]
+                self.sorted_columns[_column] = np.sort(values[~np.isnan(values)])
+            return self.sorted_columns[_column]
+
+    def count_range(self, _column, _low=None, _high=None):
+        """
+        Number of reviews with low < value <= high for the column, either bound can be left out.
+        """
+        sorted_values = self.get_sorted_column(_column)
+        idx_low = 0 if _low is None else np.searchsorted(sorted_values, _low, side='right')
+        idx_high = len(sorted_values) if _high is None else np.searchsorted(sorted_values, _high, side='right')
+        return int(max(idx_high - idx_low, 0))
+
+    def histogram(self, _column, _bins=10, _value_range=None):
+        """
+        Returns:
+            list of counts per bin, list of the bin edges (one more than the counts)
+        """
+        counts, edges = np.histogram(self.get_sorted_column(_column), bins=_bins, range=_value_range)
+        return counts.tolist(), edges.tolist()
@@ -0,0 +1,120 @@
+import contextlib
+import json
+import os
+import threading
+import time
+
+from utils.util_functions_1 import my_print_and_log
+
+class c_stage_time:
+    """
+    Context manager timing one stage, created by c_stage_profiler.stage only while profiling is on.
+    """
+    def __init__(self, _profiler, _stage_name):
+        self.profiler = _profiler
+        self.stage_name = _stage_name
+
+    def __enter__(self):
+        self.time_start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler.record(self.stage_name, time.perf_counter() - self.time_start)
+        return False
+
+class c_stage_profiler:
+    """
+    Optional timing of the extraction and load stages.
+    Keeps the count, total and max time of every stage, and writes the stage times of every document to a JSON-Lines
+    trace file for outlier analysis. While off, stage returns a shared no-op context so the cost is one attribute check.
+    Stages timed inside other processes (nlp.pipe workers, sharded extraction workers) are written to the trace file,
+    which is opened per process in append mode, but they are not part of the summary of the main process.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.stage_stats = dict() # stage name -> {'count': , 'total_secs': , 'max_secs': }
+        self.trace_path = None
+        self.trace_f = None
+        self.trace_pid = None
+        self.current = threading.local()
+        self.null_stage = contextlib.nullcontext()
+
+    def enable(self, _trace_path):
+        self.enabled = True
+        self.trace_path = _trace_path
+        ## start a new trace file for the run
+        with open(self.trace_path, 'w', encoding='utf-8'):
+            pass
+
+    def stage(self, _stage_name):
+        if not self.enabled:
+            return self.null_stage
+        return c_stage_time(self, _stage_name)
+
+    def record(self, _stage_name, _secs):
+        with self.lock:
+            stats = self.stage_stats.setdefault(_stage_name, {'count': 0, 'total_secs': 0.0, 'max_secs': 0.0})
+            stats['count'] += 1
+            stats['total_secs'] += _secs
+            stats['max_secs'] = max(stats['max_secs'], _secs)
+        doc_stages = getattr(self.current, 'doc_stages', None)
+        if doc_stages is not None:
+            doc_stages[_stage_name] = doc_stages.get(_stage_name, 0.0) + _secs
+
+    def begin_document(self, _doc_name):
+        """
+        Start collecting the stage times of one document on this thread.
+        Returns:
+            True if a document was started, False if profiling is off or a document is already open on this thread
+        """
+        if not self.enabled or getattr(self.current, 'doc_stages', None) is not None:
+            return False
+        self.current.doc_name = _doc_name
+        self.current.doc_stages = dict()
+        self.current.doc_time_start = time.perf_counter()
+        return True
+
+    def end_document(self):
+        """
+        Write the stage times of the open document as one line of the trace file.
+        """
+        doc_stages = getattr(self.current, 'doc_stages', None)
+        if doc_stages is None:
+            return
+        trace = {
+            'doc': self.current.doc_name,
+            'total_ms': 1000.0 * (time.perf_counter() - self.current.doc_time_start),
+            'stages_ms': {stage_name: 1000.0 * secs for stage_name, secs in doc_stages.items()},
+            }
+        self.current.doc_stages = None
+        with self.lock:
+            ## forked workers open their own handle so their lines are not mixed into the parent's buffer
+            if self.trace_pid != os.getpid():
+                self.trace_f = open(self.trace_path, 'a', encoding='utf-8', buffering=1)
+                self.trace_pid = os.getpid()
+            self.trace_f.write(json.dumps(trace) + "\n")
+
+    def log_summary(self):
+        """
+        Write the table of stage times to the log.
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            rows = sorted(self.stage_stats.items(), key=lambda item: item[1]['total_secs'], reverse=True)
+        lines = [
+            f"\nStage timing summary (per document trace in {self.trace_path}):",
+            f"{'stage':<28}{'count':>10}{'total secs':>14}{'mean ms':>12}{'max ms':>12}",
+            ]
+        for stage_name, stats in rows:
+            lines.append(f"{stage_name:<28}{stats['count']:>10}{stats['total_secs']:>14.3f}{1000.0*stats['total_secs']/stats['count']:>12.3f}{1000.0*stats['max_secs']:>12.3f}")
+        my_print_and_log("\n".join(lines) + "\n")
+
+    def close(self):
+        if self.trace_f is not None:
+            self.trace_f.close()
+            self.trace_f = None
+
+## one profiler for the whole process, switched on from the command line
+stage_profiler = c_stage_profiler()
@@ -0,0 +1,104 @@
+## -------------------------------------------------------------------------------------------------------------------------------------------------
+## Synthetic wine reviews for benchmarks at sizes beyond the bundled data.
+##    A word bigram model is built from the bundled review files, and review lengths are drawn from the lengths of the
+##    real reviews, so the generated text has a similar vocabulary, flavor words and length profile.
+##    Generation is seeded, the same seed always gives the same reviews.
+## Standalone use, writes a CSV with the same 'description' column as the kaggle dataset:
+##    python3 -m utils.util_synthetic_reviews_1 -inDir ./inData -numReviews 10000 -outCsv ./synthetic_10k.csv
+## -------------------------------------------------------------------------------------------------------------------------------------------------
+
+import argparse
+import csv
+import glob
+import os
+import random
+
+class c_synthetic_review_generator:
+    """
+    Generate review texts from a word bigram model of the sample texts.
+    """
+    def __init__(self, _sample_texts, _seed=0):
+        self.rng = random.Random(_seed)
+        self.start_words = list()
+        self.next_words = dict() # word -> list of the words that followed it, repeats kept so frequent pairs are drawn more
+        self.lengths = list()
+        for text in _sample_texts:
+            words = text.split()
+            if not words:
+                continue
+            self.lengths.append(len(words))
+            self.start_words.append(words[0])
+            for word, next_word in zip(words, words[1:]):
+                self.next_words.setdefault(word, list()).append(next_word)
+                ## words after a full stop can also start a review
+                if word.endswith('.'):
+                    self.start_words.append(next_word)
+        if not self.lengths:
+            raise ValueError("No sample texts to build the synthetic review model from")
+
+    @classmethod
+    def from_folder(cls, _in_dir, _pattern='f*.txt', _seed=0):
+        texts = list()
+        for fname in sorted(glob.glob(os.path.join(_in_dir, _pattern))):
+            with open(fname, 'r') as f:
+                texts.append(f.read())
+        return cls(texts, _seed)
+
+    def make_review(self):
+        target_len = self.rng.choice(self.lengths)
+        words = [self.rng.choice(self.start_words)]
+        while len(words) < target_len:
+            followers = self.next_words.get(words[-1])
+            words.append(self.rng.choice(followers) if followers else self.rng.choice(self.start_words))
+        review = " ".join(words)
+        return review if review.endswith('.') else review + '.'
+
+    def iter_reviews(self, _num_reviews):
+        for _ in range(_num_reviews):
+            yield self.make_review()
+
+def write_synthetic_csv(_csv_path, _num_reviews, _generator):
+    """
+    Write the generated reviews to a CSV with an unnamed index column and a description column, like the kaggle file.
+    Returns:
+        Number of reviews written
+    """
+    with open(_csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['', 'description'])
+        for idx, review in enumerate(_generator.iter_reviews(_num_reviews)):
+            writer.writerow([idx, review])
+    return _num_reviews
+
+def main():
+    argparser = argparse.ArgumentParser(
+        description='Generate synthetic wine reviews modelled on the bundled review files.')
+    argparser.add_argument(
+        '-inDir',
+        '--input_folder',
+        default='./inData',
+        help='Folder with the sample review .txt files.')
+    argparser.add_argument(
+        '-numReviews',
+        '--num_reviews',
+        type=int,
+        required=True,
+        help='Number of reviews to generate.')
+    argparser.add_argument(
+        '-outCsv',
+        '--output_csv',
+        required=True,
+        help='CSV file to write.')
+    argparser.add_argument(
+        '-seed',
+        '--seed',
+        type=int,
+        default=0,
+        help='Random seed.')
+    args = argparser.parse_args()
+    generator = c_synthetic_review_generator.from_folder(args.input_folder, _seed=args.seed)
+    cnt = write_synthetic_csv(args.output_csv, args.num_reviews, generator)
+    print(f"\nWrote {cnt} synthetic reviews to {args.output_csv}\n")
+
+if __name__ == "__main__":
+    main()
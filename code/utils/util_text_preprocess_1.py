@@ -0,0 +1,120 @@
+## -------------------------------------------------------------------------------------------------------------------------------------------------
+## Token filtering used to build the processed review text: lemmatize, lowercase, drop stop words and punctuation.
+##    The stop words and punctuation are compiled once into one hashed set of excluded words, so every token costs one
+##    set lookup instead of a scan of the ~300 entry stop word list.
+##    The original check was "word not in punctuation string", which is a substring test. To give identical output the
+##    excluded set holds every substring of the punctuation string (including the empty string), not only single characters.
+## Microbenchmark on the bundled reviews, checks the output is identical and prints the speedup:
+##    python3 -m utils.util_text_preprocess_1 -inDir ./inData
+## -------------------------------------------------------------------------------------------------------------------------------------------------
+
+import argparse
+import functools
+import glob
+import os
+import string
+import time
+
+@functools.lru_cache(maxsize=8)
+def compile_excluded_words(_punc, _stop_words):
+    """
+    Build the set of processed words to drop. Cached, so pass the stop words as a frozenset to reuse the compiled set.
+    Returns:
+        frozenset of stop words plus every substring of the punctuation string
+    """
+    punc_substrings = {_punc[start:end] for start in range(len(_punc) + 1) for end in range(start, len(_punc) + 1)}
+    return frozenset(_stop_words) | frozenset(punc_substrings)
+
+def preprocess_tokens(_tokens, _punc, _stop_words):
+    """
+    Lemmatize and lowercase the tokens and drop stop words and punctuation, same output as preprocess_tokens_reference.
+    Returns:
+        processed string
+    """
+    if not isinstance(_stop_words, frozenset):
+        _stop_words = frozenset(_stop_words)
+    excluded = compile_excluded_words(_punc, _stop_words)
+    words = list()
+    for token in _tokens:
+        lemma = token.lemma_
+        word = lemma.lower().strip() if lemma != "-PRON-" else token.lower_
+        if word not in excluded:
+            words.append(word)
+    return " ".join(words)
+
+def preprocess_tokens_reference(_tokens, _punc, _stop_words):
+    """
+    Original list based filtering, kept to check the fast path gives identical output.
+    """
+    words = [ word.lemma_.lower().strip() if word.lemma_ != "-PRON-" else word.lower_ for word in _tokens ]
+    words = [ word for word in words if word not in _stop_words and word not in _punc ]
+    return " ".join(words)
+
+def run_benchmark(_docs, _punc, _stop_words, _repeats):
+    """
+    Time the reference and fast filtering over the docs and check the outputs match.
+    Returns:
+        seconds for reference, seconds for fast path, number of docs whose output differs
+    """
+    stop_words_list = list(_stop_words)
+    stop_words_set = frozenset(_stop_words)
+    ref_out = [preprocess_tokens_reference(doc, _punc, stop_words_list) for doc in _docs]
+    fast_out = [preprocess_tokens(doc, _punc, stop_words_set) for doc in _docs]
+    num_diff = sum(1 for ref, fast in zip(ref_out, fast_out) if ref != fast)
+
+    start = time.perf_counter()
+    for _ in range(_repeats):
+        for doc in _docs:
+            preprocess_tokens_reference(doc, _punc, stop_words_list)
+    ref_secs = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(_repeats):
+        for doc in _docs:
+            preprocess_tokens(doc, _punc, stop_words_set)
+    fast_secs = time.perf_counter() - start
+    return ref_secs, fast_secs, num_diff
+
+def main():
+    argparser = argparse.ArgumentParser(
+        description='Microbenchmark of the token filtering in preprocess_text on the bundled reviews.')
+    argparser.add_argument(
+        '-inDir',
+        '--input_folder',
+        default='./inData',
+        help='Folder with the review .txt files.')
+    argparser.add_argument(
+        '-spacyModel',
+        '--spacy_model',
+        default='en_core_web_sm',
+        help='Spacy model used to tokenize the reviews.')
+    argparser.add_argument(
+        '-repeats',
+        '--repeats',
+        type=int,
+        default=5,
+        help='Number of passes over all the reviews for each implementation.')
+    args = argparser.parse_args()
+
+    import spacy
+    from spacy.lang.en.stop_words import STOP_WORDS
+
+    nlp = spacy.load(args.spacy_model)
+    texts = list()
+    for fname in sorted(glob.glob(os.path.join(args.input_folder, 'f*.txt'))):
+        with open(fname, 'r') as f:
+            texts.append(f.read())
+    ## parse once up front, only the filtering is timed
+    docs = list(nlp.pipe(texts))
+    num_tokens = sum(len(doc) for doc in docs)
+
+    ref_secs, fast_secs, num_diff = run_benchmark(docs, string.punctuation, STOP_WORDS, args.repeats)
+    num_filtered = len(docs) * args.repeats
+    print(f"\nReviews: {len(docs)}, tokens: {num_tokens}, repeats: {args.repeats}")
+    print(f"Reference (list scan) : {ref_secs:.3f} secs, {1e6 * ref_secs / num_filtered:.1f} usecs per review")
+    print(f"Fast (hashed set)     : {fast_secs:.3f} secs, {1e6 * fast_secs / num_filtered:.1f} usecs per review")
+    print(f"Speedup               : {ref_secs / fast_secs if fast_secs else float('inf'):.2f}x")
+    print(f"Reviews with different output: {num_diff}\n")
+
+if __name__ == "__main__":
+    main()